@@ -0,0 +1,422 @@
+"""
+Benchmark przebiegu polityki na adresach pętli zwrotnej (127.0.0.0/8)
+lub - z --netns - w osobnej przestrzeni nazw sieci połączonej parą veth.
+
+Generuje syntetyczną politykę z N wierszami (z zadanym udziałem duplikatów
+i miksem protokołów), uruchamia lokalne cele zastępcze i mierzy przebieg klienta:
+
+    open    - instancja server.py (TCP, PING/PONG) + odbiornik UDP odpowiadający PONG
+    closed  - port, na którym nic nie nasłuchuje (RST / ICMP port unreachable)
+    drop    - "czarna dziura", klient czeka do limitu czasu
+
+Domyślnie cele są rozłożone na --hosts adresów 127.0.1.x, a "drop" jest tylko emulowany:
+gniazdo TCP z zapełnioną kolejką accept (jądro odrzuca kolejne SYN) oraz gniazdo UDP,
+które nigdy nie odpowiada. Ruch nie opuszcza pętli zwrotnej, więc nie ma opóźnień ani
+ARP prawdziwego interfejsu.
+
+Z --netns (Linux, root, iproute2) cele działają w przestrzeni nazw sieci npol_bench_<pid>
+na adresach 10.200.0.x za parą veth, a "drop" to osobne adresy 10.200.1.x, których pakiety
+są po cichu odrzucane przez trasę blackhole w tej przestrzeni - prawdziwa czarna dziura
+dla TCP, UDP i ICMP. Przestrzeń nazw jest usuwana po zakończeniu benchmarku.
+Wynik (wiersze/s, p50/p99 opóźnienia testu, szczytowe RSS i liczba deskryptorów
+dla klienta i serwera) trafia do pliku JSON w benchmarks/results/.
+
+Użycie:
+    python benchmarks/run_benchmark.py --rows 2000 --duplication 0.2 --mix tcp=70,udp=25,icmp=5
+    sudo python benchmarks/run_benchmark.py --rows 2000 --netns
+    python benchmarks/run_benchmark.py --compare benchmarks/results/A.json benchmarks/results/B.json
+"""
+import os
+import sys
+import csv
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(REPO_DIR, "src")
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+POLICY_COLUMNS = ["src_ip", "src_fqdn", "src_port", "protocol", "dst_ip", "dst_fqdn", "dst_port", "description"]
+
+# Sieć benchmarku --netns: host 10.200.0.1, cele 10.200.0.10+, czarna dziura 10.200.1.0/24
+NETNS_HOST_IP = "10.200.0.1"
+NETNS_TARGET_PREFIX = "10.200.0"
+NETNS_BLACKHOLE_PREFIX = "10.200.1"
+NETNS_FIRST_PORT = 20000
+
+
+def parse_mix(value):
+    """'tcp=70,udp=25,icmp=5' -> {'tcp': 70.0, 'udp': 25.0, 'icmp': 5.0}"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip().lower()] = float(weight)
+    return mix
+
+
+def weighted_choice(rng, mix):
+    return rng.choices(list(mix), weights=list(mix.values()))[0]
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def count_fds(pid="self"):
+    try:
+        return len(os.listdir(f"/proc/{pid}/fd"))
+    except OSError:
+        return None
+
+
+def peak_rss_kb(pid):
+    """VmHWM z /proc (szczytowe RSS procesu) w kB lub None poza Linuksem."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class FdSampler(threading.Thread):
+    """Próbkuje liczbę otwartych deskryptorów procesu i zapamiętuje maksimum."""
+
+    def __init__(self, pid="self", interval=0.005):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = count_fds(pid)
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            current = count_fds(self.pid)
+            if current is not None and (self.peak is None or current > self.peak):
+                self.peak = current
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        return self.peak
+
+
+def free_port(ip):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((ip, 0))
+        return sock.getsockname()[1]
+
+
+def plan_targets(hosts, netns=False):
+    """
+    Przydziela każdemu hostowi porty open/closed/drop (TCP i UDP).
+    Bez netns: hosty 127.0.1.x, wolne porty wybiera jądro.
+    Z netns: hosty 10.200.0.x w pustej przestrzeni nazw (porty kolejne od NETNS_FIRST_PORT),
+    a cele "drop" mają własny adres czarnej dziury (klucz "ip").
+    """
+    targets = {}
+    ports = iter(range(NETNS_FIRST_PORT, 65536))
+    for number in range(1, hosts + 1):
+        if netns:
+            ip = f"{NETNS_TARGET_PREFIX}.{number + 9}"
+            targets[ip] = {kind: {"tcp": next(ports), "udp": next(ports)} for kind in ("open", "closed", "drop")}
+            targets[ip]["drop"]["ip"] = f"{NETNS_BLACKHOLE_PREFIX}.{number}"
+        else:
+            ip = f"127.0.1.{number}"
+            targets[ip] = {kind: {"tcp": free_port(ip), "udp": free_port(ip)} for kind in ("open", "closed", "drop")}
+    return targets
+
+
+# --- Przestrzeń nazw sieci (--netns) -------------------------------------------
+
+def _ip(*args):
+    subprocess.run(["ip", *args], check=True, capture_output=True, text=True)
+
+
+def netns_setup(name, targets):
+    """
+    Tworzy przestrzeń nazw z parą veth: po stronie hosta NETNS_HOST_IP, w przestrzeni adresy celów.
+    Adresy "drop" są kierowane do przestrzeni nazw i tam odrzucane trasą blackhole (bez odpowiedzi ICMP).
+    """
+    host_link, target_link = f"{name[:11]}h", f"{name[:11]}t"
+    _ip("netns", "add", name)
+    try:
+        _ip("link", "add", host_link, "type", "veth", "peer", "name", target_link)
+        _ip("link", "set", target_link, "netns", name)
+        _ip("addr", "add", f"{NETNS_HOST_IP}/24", "dev", host_link)
+        _ip("link", "set", host_link, "up")
+        _ip("-n", name, "link", "set", "lo", "up")
+        _ip("-n", name, "link", "set", target_link, "up")
+        for ip in targets:
+            _ip("-n", name, "addr", "add", f"{ip}/24", "dev", target_link)
+        _ip("route", "add", f"{NETNS_BLACKHOLE_PREFIX}.0/24", "via", next(iter(targets)))
+        _ip("-n", name, "route", "add", "blackhole", f"{NETNS_BLACKHOLE_PREFIX}.0/24")
+    except subprocess.CalledProcessError:
+        netns_teardown(name)
+        raise
+
+
+def netns_teardown(name):
+    """Usuwa przestrzeń nazw - razem z nią znika para veth i trasa do czarnej dziury."""
+    subprocess.run(["ip", "netns", "delete", name], capture_output=True)
+
+
+def generate_policy(path, rows, duplication, protocol_mix, target_mix, targets, seed):
+    rng = random.Random(seed)
+    hosts = sorted(targets)
+    written = []
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(POLICY_COLUMNS)
+        for number in range(rows):
+            if written and rng.random() < duplication:
+                row = rng.choice(written)
+            else:
+                protocol = weighted_choice(rng, protocol_mix)
+                kind = weighted_choice(rng, target_mix)
+                ip = rng.choice(hosts)
+                port = "*" if protocol == "icmp" else str(targets[ip][kind][protocol])
+                dst_ip = targets[ip][kind].get("ip", ip)
+                row = ["*", "bench.local", "*", protocol, dst_ip, "", port, f"bench {kind} {protocol} #{number}"]
+            writer.writerow(row)
+            written.append(row)
+
+
+# --- Cele zastępcze (proces --serve) -----------------------------------------
+
+def serve(targets_path):
+    """Uruchamia cele zastępcze w bieżącym procesie; blokuje do zakończenia."""
+    sys.path.insert(0, SRC_DIR)
+    import server
+
+    with open(targets_path) as f:
+        targets = json.load(f)
+
+    keep_alive = []
+    open_entries = []
+    for ip, kinds in targets.items():
+        open_entries.append({"src_ip": ip, "dsc_port": kinds["open"]["tcp"]})
+
+        # UDP "open": odpowiada PONG na każdy datagram
+        udp_open = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        udp_open.bind((ip, kinds["open"]["udp"]))
+        threading.Thread(target=_udp_pong, args=(udp_open,), daemon=True).start()
+
+        if "ip" in kinds["drop"]:
+            # --netns: pakiety do adresu czarnej dziury nie docierają do żadnego gniazda
+            continue
+
+        # TCP "drop": kolejka accept zapełniona połączeniami, które nigdy nie są przyjmowane
+        tcp_drop = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        tcp_drop.bind((ip, kinds["drop"]["tcp"]))
+        tcp_drop.listen(0)
+        for _ in range(4):
+            filler = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            filler.setblocking(False)
+            filler.connect_ex((ip, kinds["drop"]["tcp"]))
+            keep_alive.append(filler)
+
+        # UDP "drop": gniazdo związane, ale nigdy nie odpowiada
+        udp_drop = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        udp_drop.bind((ip, kinds["drop"]["udp"]))
+        keep_alive.extend([tcp_drop, udp_drop])
+
+    print("READY", flush=True)
+    server.run_server(open_entries)
+
+
+def _udp_pong(sock):
+    while True:
+        data, address = sock.recvfrom(1024)
+        if data == b"PING":
+            sock.sendto(b"PONG", address)
+
+
+# --- Przebieg klienta (proces --child) ----------------------------------------
+
+def run_child(policy_path, timeout):
+    """Wykonuje przebieg klienta jak w client.py i wypisuje metryki JSON na stdout."""
+    sys.path.insert(0, SRC_DIR)
+    import resource
+    import client
+
+    sampler = FdSampler()
+    sampler.start()
+
+    latencies = []
+    original_probe_entry = client.probe_entry
+
+    def timed_probe_entry(entry, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return original_probe_entry(entry, *args, **kwargs)
+        finally:
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    client.probe_entry = timed_probe_entry
+
+    started = time.perf_counter()
+    client.setup_logger("bench_client")
+    local_fqdn = client.get_fqdn()
+    local_ips = client.get_all_local_ips()
+    client_data = client.load_client_data(policy_path)
+    results, stats = client.test_connections(client_data, local_ips, local_fqdn, timeout=timeout)
+    client.show_results(results, stats)
+    wall = time.perf_counter() - started
+
+    json.dump({
+        "rows": len(client_data),
+        "probed": len(latencies),
+        "wall_s": round(wall, 3),
+        "rows_per_s": round(len(client_data) / wall, 2) if wall else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50), 3) if latencies else None,
+            "p99": round(percentile(latencies, 0.99), 3) if latencies else None,
+            "max": round(max(latencies), 3) if latencies else None,
+        },
+        "stats": {key: stats[key] for key in ("success", "failed", "errors", "ignored")},
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "peak_fds": sampler.stop(),
+    }, sys.stdout)
+
+
+# --- Orkiestracja --------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmark(args):
+    workdir = tempfile.mkdtemp(prefix="npol_bench_")
+    targets = plan_targets(args.hosts, args.netns)
+    targets_path = os.path.join(workdir, "targets.json")
+    with open(targets_path, "w") as f:
+        json.dump(targets, f)
+    policy_path = os.path.join(workdir, "network_policy.csv")
+    generate_policy(policy_path, args.rows, args.duplication, parse_mix(args.mix),
+                    parse_mix(args.targets), targets, args.seed)
+
+    server_cmd = [sys.executable, os.path.abspath(__file__), "--serve", targets_path]
+    netns = None
+    if args.netns:
+        netns = f"npol_bench_{os.getpid()}"
+        netns_setup(netns, targets)
+        # ip netns exec podmienia się na proces Pythona (ten sam PID - pomiary RSS i deskryptorów bez zmian)
+        server_cmd = ["ip", "netns", "exec", netns] + server_cmd
+    server_process = subprocess.Popen(server_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                      text=True, cwd=workdir)
+    try:
+        if server_process.stdout.readline().strip() != "READY":
+            raise RuntimeError("Cele zastępcze nie wystartowały")
+        # server.py wypisuje linię na każde połączenie - opróżniamy potok, aby nie zablokował serwera
+        threading.Thread(target=server_process.stdout.read, daemon=True).start()
+        server_fds = FdSampler(server_process.pid, interval=0.02)
+        server_fds.start()
+
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", policy_path, "--timeout", str(args.timeout)],
+            capture_output=True, text=True, cwd=workdir
+        )
+        if child.returncode != 0:
+            raise RuntimeError(f"Przebieg klienta zakończony błędem:\n{child.stderr}")
+        client_metrics = json.loads(child.stdout)
+        server_metrics = {"peak_rss_kb": peak_rss_kb(server_process.pid), "peak_fds": server_fds.stop()}
+    finally:
+        server_process.kill()
+        server_process.wait()
+        if netns:
+            netns_teardown(netns)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "params": {key: getattr(args, key) for key in ("rows", "duplication", "mix", "targets", "hosts", "timeout", "seed", "netns")},
+        "client": client_metrics,
+        "server": server_metrics,
+    }
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(args.output_dir, f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{report['commit']}.json")
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(report, indent=2))
+    print(f"[INFO] Zapisano wynik benchmarku: {output_path}")
+
+
+def compare(old_path, new_path):
+    """Wypisuje zmianę kluczowych metryk między dwoma wynikami benchmarku."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    if old["params"] != new["params"]:
+        print("[WARNING] Parametry benchmarków różnią się - porównanie może być mylące")
+
+    metrics = [
+        ("client.rows_per_s", lambda r: r["client"]["rows_per_s"]),
+        ("client.wall_s", lambda r: r["client"]["wall_s"]),
+        ("client.latency_ms.p50", lambda r: r["client"]["latency_ms"]["p50"]),
+        ("client.latency_ms.p99", lambda r: r["client"]["latency_ms"]["p99"]),
+        ("client.peak_rss_kb", lambda r: r["client"]["peak_rss_kb"]),
+        ("client.peak_fds", lambda r: r["client"]["peak_fds"]),
+        ("server.peak_rss_kb", lambda r: r["server"]["peak_rss_kb"]),
+        ("server.peak_fds", lambda r: r["server"]["peak_fds"]),
+    ]
+    print(f"{'metryka':<24} {old['commit']:>12} {new['commit']:>12} {'zmiana':>9}")
+    for name, getter in metrics:
+        old_value, new_value = getter(old), getter(new)
+        if old_value in (None, 0) or new_value is None:
+            change = "-"
+        else:
+            change = f"{(new_value - old_value) / old_value * 100:+.1f}%"
+        print(f"{name:<24} {str(old_value):>12} {str(new_value):>12} {change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark przebiegu polityki na pętli zwrotnej lub w przestrzeni nazw sieci")
+    parser.add_argument("--rows", type=int, default=1000, help="Liczba wierszy syntetycznej polityki")
+    parser.add_argument("--duplication", type=float, default=0.1, help="Udział wierszy powtarzających wcześniejsze (0-1)")
+    parser.add_argument("--mix", default="tcp=70,udp=25,icmp=5", help="Miks protokołów, np. tcp=70,udp=25,icmp=5")
+    parser.add_argument("--targets", default="open=70,closed=25,drop=5", help="Miks celów: open/closed/drop")
+    parser.add_argument("--hosts", type=int, default=8, help="Liczba adresów docelowych (127.0.1.x lub 10.200.0.x)")
+    parser.add_argument("--netns", action="store_true",
+                        help="Cele w przestrzeni nazw sieci za parą veth, drop jako trasa blackhole (Linux, root)")
+    parser.add_argument("--timeout", type=float, default=0.5, help="Limit czasu testu przekazywany do klienta")
+    parser.add_argument("--seed", type=int, default=1, help="Ziarno generatora polityki")
+    parser.add_argument("--output-dir", default=RESULTS_DIR, help="Katalog na wyniki JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Porównaj dwa wyniki JSON")
+    parser.add_argument("--serve", metavar="TARGETS", help=argparse.SUPPRESS)
+    parser.add_argument("--child", metavar="POLICY", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.netns and not (sys.platform.startswith("linux") and os.geteuid() == 0 and shutil.which("ip")):
+        parser.error("--netns wymaga Linuksa, uprawnień root i polecenia ip (iproute2)")
+
+    if args.serve:
+        serve(args.serve)
+    elif args.child:
+        run_child(args.child, args.timeout)
+    elif args.compare:
+        compare(*args.compare)
+    else:
+        run_benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Testy warstwy aplikacji dla portów TLS/HTTP (opcje --app-probes, --app-probe-port).
+
+Samo połączenie TCP udaje się także wtedy, gdy proxy lub IPS zrywa sesję zaraz po
+nawiązaniu połączenia. Dla wybranych wierszy wykonywany jest więc test protokołu:
+- tls: uzgadnianie TLS (ClientHello ... Finished),
+- http: zapytanie HTTP HEAD,
+- https: uzgadnianie TLS i zapytanie HTTP HEAD.
+
+Rodzaj testu wynika ze znacznika w opisie wiersza ([tls], [http], [https], [tcp])
+albo z numeru portu docelowego. Wiersze z tym samym celem współdzielą stan:
+sesje TLS są wznawiane (pełne uzgadnianie raz na cel), a połączenia HTTP
+pozostają otwarte (keep-alive) dla kolejnych wierszy z tym samym celem i portem.
+Certyfikat serwera nie jest weryfikowany - test sprawdza przepuszczanie ruchu, nie PKI.
+"""
+import re
+import ssl
+import time
+import socket
+import threading
+
+PROBE_KINDS = ("tcp", "tls", "http", "https")
+
+# Domyślny rodzaj testu według portu docelowego
+DEFAULT_PORT_PROBES = {"80": "http", "8080": "http", "443": "tls", "8443": "tls"}
+
+# Znacznik rodzaju testu w opisie wiersza polityki, np. "Komunikacja HTTPS [https]"
+PROBE_TAG = re.compile(r"\[(tcp|tls|https?)\]", re.IGNORECASE)
+
+# Maksymalny rozmiar nagłówków odpowiedzi HTTP
+MAX_HEADER_BYTES = 64 * 1024
+
+
+def port_probes(specs=None):
+    """
+    Mapowanie port -> rodzaj testu: domyślne uzupełnione o specyfikacje "PORT=RODZAJ"
+    (np. "443=https", "8443=tcp"). Rzuca ValueError przy niepoprawnej specyfikacji.
+    """
+    probes = dict(DEFAULT_PORT_PROBES)
+    for spec in specs or []:
+        port, _, kind = spec.partition("=")
+        port, kind = port.strip(), kind.strip().lower()
+        if not port.isdigit() or kind not in PROBE_KINDS:
+            raise ValueError(f"Niepoprawny test portu: {spec} (oczekiwano PORT={'|'.join(PROBE_KINDS)})")
+        probes[port] = kind
+    return probes
+
+
+class AppProber:
+    def __init__(self, probes=None):
+        """probes: mapowanie port -> rodzaj testu (patrz port_probes)"""
+        self.probes = port_probes() if probes is None else probes
+        self.lock = threading.Lock()
+        self.sessions = {}   # (adres docelowy, nazwa serwera) -> ssl.SSLSession
+        self.idle = {}       # (adres, port, rodzaj, adres źródłowy) -> otwarte połączenie HTTP
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        self.context.check_hostname = False
+        self.context.verify_mode = ssl.CERT_NONE
+        self.context.set_alpn_protocols(["http/1.1"])
+
+    def probe_kind(self, entry):
+        """Rodzaj testu aplikacji dla wiersza TCP albo None dla samego połączenia TCP"""
+        tag = PROBE_TAG.search(entry.get("description") or "")
+        kind = tag.group(1).lower() if tag else self.probes.get(str(entry["dst_port"]))
+        return None if kind in (None, "tcp") else kind
+
+    def probe(self, ip, port, kind, timeout=5, timings=None, source_ip=None, server_name=None):
+        """
+        Test warstwy aplikacji. Zwraca (sukces, opis błędu). Do timings zapisuje connect_ms
+        (połączenie TCP), handshake_ms (uzgadnianie TLS), rtt_ms (odpowiedź HTTP) oraz
+        tls_version, tls_resumed, http_status i reused. Przy ponownym użyciu otwartego
+        połączenia (keep-alive) reused=True, a connect_ms=0 - bez nawiązywania połączenia.
+        """
+        timings = {} if timings is None else timings
+        key = (ip, str(port), kind, source_ip)
+        host = server_name or ip
+
+        sock = self._checkout(key)
+        if sock is not None:
+            try:
+                keep = self._http_head(sock, host, timeout, timings)
+                timings["connect_ms"] = 0.0
+                timings["reused"] = True
+                self._release(key, sock, keep)
+                return True, None
+            except (OSError, ValueError):
+                # Serwer mógł zamknąć bezczynne połączenie - test na nowym połączeniu
+                sock.close()
+                timings.pop("rtt_ms", None)
+
+        source_address = (source_ip, 0) if source_ip else None
+        started = time.perf_counter()
+        try:
+            sock = socket.create_connection((ip, int(port)), timeout=timeout, source_address=source_address)
+        except Exception as e:
+            timings["connect_ms"] = (time.perf_counter() - started) * 1000
+            return False, str(e)
+        timings["connect_ms"] = (time.perf_counter() - started) * 1000
+
+        stage = "TLS"
+        try:
+            if kind in ("tls", "https"):
+                sock = self._tls_handshake(sock, ip, server_name, timings)
+            stage = "HTTP"
+            keep = False
+            if kind in ("http", "https"):
+                keep = self._http_head(sock, host, timeout, timings)
+            elif not timings["tls_resumed"]:
+                self._await_session_ticket(sock, timings)
+            if kind in ("tls", "https"):
+                self._save_session(ip, server_name, sock)
+            self._release(key, sock, keep)
+            return True, None
+        except Exception as e:
+            sock.close()
+            return False, f"{stage}: {e}"
+
+    def _tls_handshake(self, sock, ip, server_name, timings):
+        with self.lock:
+            session = self.sessions.get((ip, server_name))
+        started = time.perf_counter()
+        tls = self.context.wrap_socket(sock, server_hostname=server_name, session=session)
+        timings["handshake_ms"] = (time.perf_counter() - started) * 1000
+        timings["tls_version"] = tls.version()
+        timings["tls_resumed"] = tls.session_reused
+        return tls
+
+    @staticmethod
+    def _await_session_ticket(tls, timings):
+        """
+        TLS 1.3: bilet sesji przychodzi po uzgadnianiu - krótki odczyt pozwala go odebrać,
+        aby kolejne wiersze z tym samym celem mogły wznowić sesję.
+        """
+        if tls.version() != "TLSv1.3":
+            return
+        tls.settimeout(max(0.05, 2 * timings["handshake_ms"] / 1000))
+        try:
+            tls.recv(1)
+        except (OSError, ssl.SSLError):
+            pass
+
+    def _save_session(self, ip, server_name, tls):
+        session = tls.session
+        if session is not None:
+            with self.lock:
+                self.sessions[(ip, server_name)] = session
+
+    @staticmethod
+    def _http_head(sock, host, timeout, timings):
+        """Wysyła HEAD / i czyta nagłówki odpowiedzi. Zwraca True, jeśli połączenie można użyć ponownie."""
+        request = (f"HEAD / HTTP/1.1\r\nHost: {host}\r\nUser-Agent: NetworkTester\r\n"
+                   f"Connection: keep-alive\r\n\r\n")
+        sock.settimeout(timeout)
+        started = time.perf_counter()
+        sock.sendall(request.encode("ascii", "replace"))
+        response = b""
+        while b"\r\n\r\n" not in response:
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("połączenie zamknięte przed odpowiedzią HTTP")
+            response += chunk
+            if len(response) > MAX_HEADER_BYTES:
+                raise ValueError("zbyt długie nagłówki odpowiedzi HTTP")
+        timings["rtt_ms"] = (time.perf_counter() - started) * 1000
+
+        head, _, rest = response.partition(b"\r\n\r\n")
+        status_line, *header_lines = head.decode("iso-8859-1").split("\r\n")
+        parts = status_line.split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+            raise ValueError(f"niepoprawna odpowiedź HTTP: {status_line[:80]}")
+        timings["http_status"] = int(parts[1])
+
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+        connection = headers.get("connection", "")
+        if parts[0] == "HTTP/1.0":
+            keep = connection == "keep-alive"
+        else:
+            keep = connection != "close"
+        # Dane po nagłówkach odpowiedzi na HEAD zaburzyłyby kolejną odpowiedź
+        return keep and not rest
+
+    def _checkout(self, key):
+        with self.lock:
+            return self.idle.pop(key, None)
+
+    def _release(self, key, sock, keep):
+        if keep:
+            with self.lock:
+                if key not in self.idle:
+                    self.idle[key] = sock
+                    return
+        sock.close()
+
+    def close(self):
+        """Zamyka bezczynne połączenia keep-alive (sesje TLS pozostają do wznowienia)"""
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for sock in idle.values():
+            sock.close()
@@ -1,19 +1,26 @@
+import time
+STARTUP_BEGIN = time.perf_counter()
 import csv
+import math
+import bisect
+import json
 import socket
 import os
-import psutil
-import subprocess
-import platform
-import argparse
 import sys
 import logging
+import threading
+import zlib
 from datetime import datetime
+from collections import namedtuple
+from event_log import NdjsonFormatter, BufferingHandler, start_background_handlers, log_event
+from local_addresses import get_local_addresses
 
-def setup_logger(script_name):
+def setup_logger(script_name, file_level=logging.DEBUG, event_log=None):
     """
     Konfiguruje logger z zapisem do pliku według wzoru nazwa_data.log
-    Plik: poziom DEBUG
+    Plik: poziom file_level (domyślnie DEBUG), zapis w wątku w tle
     Konsola: poziom INFO
+    event_log: opcjonalna ścieżka dziennika zdarzeń NDJSON (ten sam poziom co plik)
     """
     # Pobierz nazwę skryptu bez rozszerzenia
     base_name = os.path.splitext(os.path.basename(script_name))[0]
@@ -22,18 +29,27 @@ def setup_logger(script_name):
     timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
     log_filename = f"{base_name}_{timestamp}.log"
     
-    # Konfiguracja głównego loggera
+    # Konfiguracja głównego loggera - poziom najniższy z włączonych handlerów,
+    # dzięki czemu wyłączone zdarzenia kończą się na isEnabledFor
     logger = logging.getLogger('NetworkTester')
-    logger.setLevel(logging.DEBUG)  # Główny logger musi być na poziomie DEBUG
+    logger.setLevel(min(file_level, logging.INFO))
     
     # Wyczyść istniejące handlery (gdyby jakieś były)
     logger.handlers.clear()
     
-    # Handler do pliku - wszystkie logi (DEBUG i wyżej)
+    # Handler do pliku - zapis w wątku w tle, formatowanie komunikatów poza gorącą pętlą
     file_handler = logging.FileHandler(log_filename, encoding='utf-8')
-    file_handler.setLevel(logging.DEBUG)
+    file_handler.setLevel(file_level)
     file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
     file_handler.setFormatter(file_formatter)
+    background_handlers = [file_handler]
+
+    # Dziennik zdarzeń NDJSON (opcjonalny)
+    if event_log:
+        event_handler = logging.FileHandler(event_log, encoding='utf-8')
+        event_handler.setLevel(file_level)
+        event_handler.setFormatter(NdjsonFormatter())
+        background_handlers.append(event_handler)
     
     # Handler do konsoli - tylko INFO i wyżej
     console_handler = logging.StreamHandler()
@@ -42,12 +58,12 @@ def setup_logger(script_name):
     console_handler.setFormatter(console_formatter)
     
     # Dodaj handlery do loggera
-    logger.addHandler(file_handler)
+    start_background_handlers(logger, background_handlers, file_level)
     logger.addHandler(console_handler)
     
     # Log rozpoczęcia sesji
-    logger.debug(f"=== Rozpoczęcie nowej sesji logowania: {timestamp} ===")
-    logger.debug(f"Plik logu: {log_filename}")
+    logger.debug("=== Rozpoczęcie nowej sesji logowania: %s ===", timestamp)
+    logger.debug("Plik logu: %s", log_filename)
     
     return logger
 
@@ -65,11 +81,101 @@ def get_resource_path(relative_path):
     
     return os.path.join(base_path, relative_path)
 
+POLICY_INDEX_FILENAME = "policy_index.json"
+POLICY_SLICES_DIRNAME = "policy_slices"
+COMPILED_POLICY_SUFFIX = ".npol"
+RESULTS_SPOOL_DIR = "results_spool"
+FQDN_TIMEOUT = 2.0
+DAEMON_INTERVAL = 300
+METRICS_PORT = 9847
+# Status wierszy hosta, który nie odpowiedział w sprawdzeniu wstępnym (--precheck)
+HOST_UNREACHABLE = "HOST_UNREACHABLE"
+# Przesyłanie wyników z procesów roboczych: paczka co tyle wyników lub co tyle sekund
+WORKER_BATCH_SIZE = 256
+WORKER_BATCH_SECONDS = 0.25
+
 def setup_argument_parser():
+    import argparse
     parser = argparse.ArgumentParser(description='Network connection tester')
     parser.add_argument('--debug', action='store_true', help='Włącz tryb debugowania')
+    parser.add_argument('--log-level', type=str.upper, default='DEBUG', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                       help='Poziom logowania do pliku (DEBUG zapisuje zdarzenia z każdego wiersza)')
+    parser.add_argument('--event-log', type=str,
+                       help='Ścieżka dziennika zdarzeń NDJSON (jedno zdarzenie JSON w linii)')
     parser.add_argument('--config', type=str, help='Ścieżka do pliku konfiguracyjnego CSV', 
                        default='network_policy.csv')
+    parser.add_argument('--timeout', type=float, default=5,
+                       help='Limit czasu pojedynczego testu TCP/UDP w sekundach')
+    parser.add_argument('--tcp-ping', action='store_true',
+                       help='Po połączeniu TCP wysyłaj PING i mierz czas odpowiedzi PONG (cele z server.py)')
+    parser.add_argument('--happy-eyeballs', action='store_true',
+                       help='Wiersze TCP z dst_fqdn: wyścig połączeń do adresów IPv6 i IPv4 nazwy (RFC 8305) - '
+                            'wynik to pierwsze nawiązane połączenie')
+    parser.add_argument('--app-probes', action='store_true',
+                       help='Testy warstwy aplikacji: uzgadnianie TLS (porty 443, 8443) i HTTP HEAD (80, 8080) '
+                            'zamiast samego połączenia TCP; znacznik [tls], [http], [https] lub [tcp] w opisie wiersza '
+                            'wybiera rodzaj testu')
+    parser.add_argument('--app-probe-port', action='append', metavar='PORT=RODZAJ',
+                       help='Rodzaj testu warstwy aplikacji dla portu (tcp, tls, http, https), np. 443=https; '
+                            'można podać wielokrotnie, włącza --app-probes')
+    parser.add_argument('--slowest', type=int, default=10,
+                       help='Liczba najwolniejszych przepływów w podsumowaniu opóźnień')
+    parser.add_argument('--full-policy', action='store_true',
+                       help='Wczytaj pełną politykę CSV, nawet jeśli dostępne są fragmenty per host lub polityka *.npol')
+    parser.add_argument('--report-format', type=str, default='ndjson', choices=['ndjson', 'junit', 'csv'],
+                       help='Format raportu --report-file (domyślnie ndjson)')
+    parser.add_argument('--report-file', type=str,
+                       help='Plik raportu wyników do CI - każdy wynik jest zapisywany zaraz po teście')
+    parser.add_argument('--report-url', type=str,
+                       help='Adres endpointu aplikacji WEB do wysłania wyników, np. http://host:8945/results/')
+    parser.add_argument('--spool-dir', type=str, default=RESULTS_SPOOL_DIR,
+                       help='Katalog na wyniki, których nie udało się wysłać (ponawiane przy kolejnym uruchomieniu)')
+    parser.add_argument('--cache', type=str,
+                       help='Plik pamięci podręcznej wyników - pomija wiersze zweryfikowane niedawno')
+    parser.add_argument('--cache-ttl-success', type=int, default=600,
+                       help='Czas ważności udanych wyników w pamięci podręcznej w sekundach (0 = nie używaj)')
+    parser.add_argument('--cache-ttl-failed', type=int, default=0,
+                       help='Czas ważności nieudanych wyników w pamięci podręcznej w sekundach (0 = zawsze testuj ponownie)')
+    parser.add_argument('--fqdn-timeout', type=float, default=FQDN_TIMEOUT,
+                       help='Maksymalny czas ustalania FQDN hosta w sekundach (po jego upływie używana jest nazwa .local)')
+    parser.add_argument('--startup-profile', action='store_true',
+                       help='Wyświetl czasy poszczególnych etapów uruchamiania programu')
+    parser.add_argument('--concurrency', type=int, default=1,
+                       help='Liczba równoczesnych testów (wątków) w procesie')
+    parser.add_argument('--rate', type=float, default=0,
+                       help='Globalny limit tempa testów na sekundę (0 = bez limitu)')
+    parser.add_argument('--max-per-host', type=int, default=1,
+                       help='Limit równoczesnych testów jednego adresu docelowego (0 = bez limitu)')
+    parser.add_argument('--max-per-subnet', type=int, default=8,
+                       help='Limit równoczesnych testów jednej podsieci docelowej /24 (IPv6: /64) (0 = bez limitu)')
+    parser.add_argument('--precheck', action='store_true',
+                       help='Przed testami sprawdź osiągalność hostów docelowych (ping + TCP); '
+                            'wiersze nieosiągalnych hostów dostają status HOST_UNREACHABLE bez testowania portów')
+    parser.add_argument('--precheck-timeout', type=float, default=2.0,
+                       help='Limit czasu sprawdzenia wstępnego hosta w sekundach')
+    parser.add_argument('--force-full-check', action='store_true',
+                       help='Z --precheck: pomiń sprawdzenie wstępne i testuj wszystkie porty wszystkich hostów')
+    parser.add_argument('--trace-failed', action='store_true',
+                       help='Po testach śledź trasę nieudanych przepływów TCP/UDP (próby z ograniczonym TTL, tylko Linux)')
+    parser.add_argument('--trace-max-hops', type=int, default=30,
+                       help='Maksymalna liczba węzłów przy śledzeniu trasy')
+    parser.add_argument('--trace-timeout', type=float, default=3.0,
+                       help='Okno czasowe śledzenia trasy w sekundach (wspólne dla wszystkich przepływów)')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Liczba procesów testujących; wiersze są dzielone między procesy według adresu docelowego')
+    parser.add_argument('--daemon', action='store_true',
+                       help='Tryb ciągłego monitorowania: testy co --interval sekund i metryki na /metrics')
+    parser.add_argument('--interval', type=float, default=DAEMON_INTERVAL,
+                       help='Długość cyklu testów w trybie --daemon w sekundach (testy są rozłożone równomiernie)')
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                       help='Port endpointu /metrics w trybie --daemon (0 = wyłączony)')
+    parser.add_argument('--metrics-address', type=str, default='127.0.0.1',
+                       help='Adres, na którym nasłuchuje endpoint /metrics')
+    cache_mode = parser.add_mutually_exclusive_group()
+    cache_mode.add_argument('--fresh', action='store_true',
+                       help='Testuj wszystkie wiersze, ignorując pamięć podręczną (wyniki są nadal zapisywane)')
+    cache_mode.add_argument('--only-failed', action='store_true',
+                       help='Testuj tylko nowe wiersze i te, które ostatnio nie przeszły')
     return parser
 
 def get_fqdn():
@@ -80,7 +186,8 @@ def get_fqdn():
     logger = logging.getLogger('NetworkTester')
     
     try:
-        if platform.system() == "Darwin":  # macOS
+        if sys.platform == "darwin":  # macOS
+            import subprocess
             logger.debug("Wykryto system macOS - próba pobrania FQDN")
             try:
                 fqdn = subprocess.check_output(["hostname", "-f"], 
@@ -116,68 +223,196 @@ def get_fqdn():
     
     return fqdn
 
+class FqdnLookup:
+    """
+    Ustalanie FQDN hosta w wątku w tle (odwrotne DNS w socket.getfqdn() potrafi się zawiesić).
+    Wywołanie obiektu czeka na wynik najwyżej do upływu limitu czasu liczonego od startu,
+    a po nim zwraca domyślną nazwę hostname.local.
+    """
+
+    def __init__(self, timeout=FQDN_TIMEOUT):
+        self.deadline = time.monotonic() + timeout
+        self.fqdn = None
+        self.thread = threading.Thread(target=self._run, name="fqdn-lookup", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        self.fqdn = get_fqdn()
+
+    def __call__(self):
+        self.thread.join(max(0.0, self.deadline - time.monotonic()))
+        if self.fqdn is None:
+            self.fqdn = f"{socket.gethostname()}.local"
+            logging.getLogger('NetworkTester').warning(
+                "Przekroczono limit czasu ustalania FQDN - użyto nazwy %s", self.fqdn)
+        return self.fqdn
+
+class StartupProfile:
+    """Pomiar czasu etapów uruchamiania programu (opcja --startup-profile)"""
+
+    def __init__(self, begin=STARTUP_BEGIN):
+        self.begin = begin
+        self.last = begin
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self.last) * 1000))
+        self.last = now
+
+    def show(self):
+        print("\nCzasy uruchamiania:")
+        for phase, elapsed_ms in self.phases:
+            print(f"  {phase:<24} {elapsed_ms:8.1f} ms")
+        print(f"  {'razem':<24} {(self.last - self.begin) * 1000:8.1f} ms")
+
 def get_all_local_ips():
-    local_ips = []
-    for interface, snics in psutil.net_if_addrs().items():
-        for snic in snics:
-            if snic.family == socket.AF_INET:
-                local_ips.append(snic.address)
-    return local_ips
+    """Adresy IPv4 i IPv6 interfejsów lokalnych (postać kanoniczna, jak z normalize_ip)"""
+    return get_local_addresses(None)
 
-def resolve_hostname(hostname):
+def normalize_ip(value):
+    """Kanoniczny zapis adresu IP (np. IPv6 małymi literami i ze skróconymi zerami); inne wartości bez zmian"""
+    import ipaddress
+    try:
+        return ipaddress.ip_address(value).compressed
+    except ValueError:
+        return value
+
+def resolve_addresses(hostname):
     """
-    Próbuje rozwiązać nazwę hosta na adres IP
+    Rozwiązuje nazwę hosta na wszystkie adresy IPv4 i IPv6 (getaddrinfo, kolejność resolvera).
+    Zwraca pustą listę, jeśli nazwy nie da się rozwiązać.
     """
     try:
-        return socket.gethostbyname(hostname)
-    except socket.gaierror:
-        return None
+        infos = socket.getaddrinfo(hostname, None, socket.AF_UNSPEC, socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        return []
+    return list(dict.fromkeys(info[4][0].split("%")[0] for info in infos))
 
 def verify_dns_resolution(entry):
     """
-    Sprawdza czy dst_fqdn rozwiązuje się na dst_ip
+    Sprawdza czy dst_fqdn rozwiązuje się na dst_ip (bez wypisywania - patrz check_dns)
     Zwraca krotę (bool, str) gdzie:
     - bool to czy weryfikacja się powiodła
     - str to opis błędu (jeśli wystąpił)
     """
     if not entry["dst_fqdn"]:
         return True, None
-        
-    resolved_ip = resolve_hostname(entry["dst_fqdn"])
-    if resolved_ip is None:
-        warning = f"Nie można rozwiązać nazwy {entry['dst_fqdn']}"
-        print(f"\033[93m\033[1m[WARNING] {warning}\033[0m")
-        return False, warning
-    
-    if resolved_ip != entry["dst_ip"]:
-        warning = f"{entry['dst_fqdn']} rozwiązuje się na {resolved_ip}, oczekiwano {entry['dst_ip']}"
-        print(f"\033[93m\033[1m[WARNING] Niezgodność DNS: {warning}\033[0m")
-        return False, warning
+
+    # Wszystkie adresy A i AAAA - dst_ip wystarczy, że jest jednym z nich
+    resolved_ips = resolve_addresses(entry["dst_fqdn"])
+    if not resolved_ips:
+        return False, f"Nie można rozwiązać nazwy {entry['dst_fqdn']}"
+
+    if normalize_ip(entry["dst_ip"]) not in resolved_ips:
+        return False, f"{entry['dst_fqdn']} rozwiązuje się na {', '.join(resolved_ips)}, oczekiwano {entry['dst_ip']}"
     
     return True, None
 
-def load_client_data(csv_file):
+def find_policy_file(path):
     """
-    Wczytuje dane klienta z pliku CSV, obsługując zarówno ścieżkę względną jak i absolutną
+    Zwraca ścieżkę do istniejącego pliku polityki: podaną bezpośrednio
+    lub względną do zasobów PyInstallera. Zwraca None, jeśli plik nie istnieje.
     """
-    try:
-        # Najpierw próbujemy użyć podanej ścieżki bezpośrednio
-        with open(csv_file, mode="r") as file:
-            reader = csv.DictReader(file)
-            return list(reader)
-    except FileNotFoundError:
-        try:
-            # Jeśli nie znaleziono, próbujemy użyć ścieżki względnej do zasobów
-            resource_path = get_resource_path(csv_file)
-            with open(resource_path, mode="r") as file:
-                reader = csv.DictReader(file)
-                return list(reader)
-        except FileNotFoundError:
-            print(f"[ERROR] Nie można znaleźć pliku konfiguracyjnego: {csv_file}")
-            print("[ERROR] Sprawdzono ścieżki:")
-            print(f"        - {os.path.abspath(csv_file)}")
-            print(f"        - {os.path.abspath(resource_path)}")
-            sys.exit(1)
+    for candidate in (path, get_resource_path(path)):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+def load_policy_index(index_path):
+    with open(index_path, mode="r", encoding="utf-8") as file:
+        return json.load(file)
+
+def load_policy_slices(index_path, index, local_ips, local_fqdn):
+    """
+    Wczytuje tylko fragmenty polityki dotyczące lokalnego hosta (według indeksu
+    policy_index.json) oraz fragment z regułami wildcard. Wiersze są zwracane
+    w kolejności z pełnej polityki.
+    """
+    logger = logging.getLogger('NetworkTester')
+
+    slice_names = list(index.get("any", []))
+    for ip in local_ips:
+        slice_names.extend(index["by_ip"].get(ip, []))
+    slice_names.extend(index["by_fqdn"].get(local_fqdn.lower(), []))
+
+    slices_dir = os.path.join(os.path.dirname(index_path), POLICY_SLICES_DIRNAME)
+    rows = []
+    for slice_name in dict.fromkeys(slice_names):
+        with open(os.path.join(slices_dir, slice_name), mode="r", encoding="utf-8") as file:
+            rows.extend(csv.DictReader(file))
+    rows.sort(key=lambda row: int(row["row"]))
+
+    logger.debug(f"Wczytano {len(rows)} z {index['rows']} wierszy polityki "
+                 f"z fragmentów: {', '.join(dict.fromkeys(slice_names)) or 'brak'}")
+    return rows
+
+def load_compiled_policy(compiled_path, local_ips, local_fqdn):
+    """
+    Otwiera skompilowaną politykę (*.npol) przez mmap. Przy podanym lokalnym IP/FQDN
+    zwraca tylko rekordy z indeksu źródeł, w przeciwnym razie wszystkie rekordy.
+    """
+    from policy_format import CompiledPolicy
+    logger = logging.getLogger('NetworkTester')
+    policy = CompiledPolicy(compiled_path)
+    if local_ips is not None and local_fqdn is not None:
+        if callable(local_fqdn):
+            local_fqdn = local_fqdn()
+        rows = policy.select(local_ips, local_fqdn)
+    else:
+        rows = list(policy)
+    logger.debug(f"Wczytano {len(rows)} z {len(policy)} rekordów skompilowanej polityki {compiled_path}")
+    return rows
+
+def load_client_data(csv_file, local_ips=None, local_fqdn=None, full_policy=False):
+    """
+    Wczytuje dane klienta z pliku CSV, obsługując zarówno ścieżkę względną jak i absolutną.
+    Kolejność źródeł: skompilowana polityka *.npol (podana wprost lub obok pliku CSV),
+    indeks fragmentów per host (tylko przy podanym lokalnym IP/FQDN), pełny plik CSV.
+    Aplikacja WEB dołącza do klienta tylko jeden z formatów: fragmenty, gdy polityka
+    była dzielona per host, w przeciwnym razie *.npol.
+    local_fqdn może być funkcją (np. FqdnLookup) - jest wtedy wywoływana dopiero,
+    gdy wybór wierszy wymaga FQDN, więc ustalanie nazwy hosta trwa równolegle z wczytywaniem.
+    full_policy: pełny plik CSV, z pominięciem polityki *.npol obok niego i fragmentów
+    (plik *.npol podany wprost jest wczytywany w całości).
+    """
+    if full_policy:
+        local_ips = local_fqdn = None
+    if csv_file.endswith(COMPILED_POLICY_SUFFIX):
+        compiled_path = find_policy_file(csv_file)
+    elif full_policy:
+        compiled_path = None
+    else:
+        compiled_path = find_policy_file(os.path.splitext(csv_file)[0] + COMPILED_POLICY_SUFFIX)
+    if compiled_path is not None:
+        return load_compiled_policy(compiled_path, local_ips, local_fqdn)
+
+    csv_path = find_policy_file(csv_file)
+
+    if csv_path is not None and local_ips is not None and local_fqdn is not None:
+        index_path = os.path.join(os.path.dirname(csv_path), POLICY_INDEX_FILENAME)
+        if os.path.exists(index_path):
+            index = load_policy_index(index_path)
+            # Indeks dotyczy tylko pliku polityki, z którego został utworzony
+            if index.get("source") == os.path.basename(csv_path):
+                if callable(local_fqdn):
+                    local_fqdn = local_fqdn()
+                return load_policy_slices(index_path, index, local_ips, local_fqdn)
+
+    if csv_path is None:
+        print(f"[ERROR] Nie można znaleźć pliku konfiguracyjnego: {csv_file}")
+        print("[ERROR] Sprawdzono ścieżki:")
+        print(f"        - {os.path.abspath(csv_file)}")
+        print(f"        - {os.path.abspath(get_resource_path(csv_file))}")
+        sys.exit(1)
+
+    with open(csv_path, mode="r") as file:
+        reader = csv.DictReader(file)
+        rows = list(reader)
+    # Numer wiersza polityki (fragmenty i polityka skompilowana mają go zapisanego)
+    for number, row in enumerate(rows, 1):
+        row.setdefault("row", str(number))
+    return rows
 
 def should_test_connection(entry, local_ips, local_fqdn):
     """
@@ -188,190 +423,711 @@ def should_test_connection(entry, local_ips, local_fqdn):
     
     # Jeśli którekolwiek pole ma '*', to reguła pasuje
     if entry["src_ip"] == "*" or entry["src_fqdn"] == "*":
-        logger.debug(f"Znaleziono wildcard '*' w regule - src_ip: {entry['src_ip']}, src_fqdn: {entry['src_fqdn']}")
+        logger.debug("Znaleziono wildcard '*' w regule - src_ip: %s, src_fqdn: %s", entry["src_ip"], entry["src_fqdn"])
         return True
     
-    # Sprawdzanie dokładnego dopasowania IP
-    is_matching_ip = entry["src_ip"] in local_ips
+    # Sprawdzanie dokładnego dopasowania IP (adres IPv6 w postaci kanonicznej)
+    src_ip = entry["src_ip"]
+    is_matching_ip = (normalize_ip(src_ip) if ":" in src_ip else src_ip) in local_ips
     # Sprawdzanie dokładnego dopasowania FQDN (bez uwzględniania wielkości liter)
     is_matching_fqdn = entry["src_fqdn"].lower() == local_fqdn.lower()
     
     if is_matching_ip:
-        logger.debug(f"Dopasowano IP: {entry['src_ip']}")
+        logger.debug("Dopasowano IP: %s", entry["src_ip"])
     if is_matching_fqdn:
-        logger.debug(f"Dopasowano FQDN: {entry['src_fqdn']}")
+        logger.debug("Dopasowano FQDN: %s", entry["src_fqdn"])
     
     return is_matching_ip or is_matching_fqdn
 
-def test_tcp_connection(ip, port, timeout=5):
+def test_tcp_connection(ip, port, timeout=5, timings=None, ping=False, source_ip=None, addresses=None):
     """
-    Testuje połączenie TCP
+    Testuje połączenie TCP.
+    Do słownika timings (jeśli podany) zapisuje connect_ms, a przy ping=True
+    wysyła PING i zapisuje rtt_ms odpowiedzi PONG (serwer server.py).
+    source_ip: lokalny adres źródłowy, z którego ma wyjść połączenie (None = według routingu).
+    addresses: adresy IPv6/IPv4 do wyścigu połączeń (happy_eyeballs.race_connect) zamiast
+    samego ip - wygrany adres trafia do timings["connected_ip"].
     """
     logger = logging.getLogger('NetworkTester')
+    timings = {} if timings is None else timings
+    source_address = (source_ip, 0) if source_ip else None
+    started = time.perf_counter()
     try:
-        with socket.create_connection((ip, int(port)), timeout=timeout) as sock:
-            logger.debug(f"Nawiązano połączenie TCP z {ip}:{port}")
+        if addresses:
+            from happy_eyeballs import race_connect
+            sock, ip = race_connect(addresses, int(port), timeout, source_ip)
+            timings["connected_ip"] = ip
+        else:
+            sock = socket.create_connection((ip, int(port)), timeout=timeout, source_address=source_address)
+        with sock:
+            timings["connect_ms"] = (time.perf_counter() - started) * 1000
+            logger.debug("Nawiązano połączenie TCP z %s:%s", ip, port)
+            if ping:
+                sock.settimeout(max(timeout - timings["connect_ms"] / 1000, 0.001))
+                ping_started = time.perf_counter()
+                try:
+                    sock.sendall(b"PING")
+                    if sock.recv(4) == b"PONG":
+                        timings["rtt_ms"] = (time.perf_counter() - ping_started) * 1000
+                except OSError:
+                    logger.debug("Brak odpowiedzi PONG od %s:%s", ip, port)
             return True, None
     except Exception as e:
+        timings["connect_ms"] = (time.perf_counter() - started) * 1000
         return False, str(e)
 
-def test_udp_connection(ip, port, timeout=5):
+def test_udp_connection(ip, port, timeout=5, timings=None, source_ip=None):
     """
-    Testuje połączenie UDP
+    Testuje połączenie UDP.
+    Do słownika timings (jeśli podany) zapisuje rtt_ms, gdy nadejdzie odpowiedź.
+    source_ip: lokalny adres źródłowy datagramu (None = według routingu).
     """
     logger = logging.getLogger('NetworkTester')
+    timings = {} if timings is None else timings
+    sock = None
     try:
-        # Utworzenie gniazda UDP
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # Utworzenie gniazda UDP (rodzina według adresu docelowego)
+        sock = socket.socket(socket.AF_INET6 if ":" in ip else socket.AF_INET, socket.SOCK_DGRAM)
         sock.settimeout(timeout)
+        if source_ip:
+            sock.bind((source_ip, 0))
         
         # Próba wysłania danych
+        started = time.perf_counter()
         sock.sendto(b"PING", (ip, int(port)))
-        logger.debug(f"Wysłano datagram UDP do {ip}:{port}")
+        logger.debug("Wysłano datagram UDP do %s:%s", ip, port)
         
         # Próba odebrania odpowiedzi (opcjonalne)
         try:
             sock.recvfrom(1024)
-            logger.debug(f"Otrzymano odpowiedź UDP od {ip}:{port}")
+            timings["rtt_ms"] = (time.perf_counter() - started) * 1000
+            logger.debug("Otrzymano odpowiedź UDP od %s:%s", ip, port)
         except socket.timeout:
             # Brak odpowiedzi nie oznacza błędu dla UDP
-            logger.debug(f"Brak odpowiedzi UDP od {ip}:{port} (to normalne)")
+            logger.debug("Brak odpowiedzi UDP od %s:%s (to normalne)", ip, port)
         
         return True, None
     except Exception as e:
         return False, str(e)
     finally:
-        sock.close()
+        if sock is not None:
+            sock.close()
 
-def test_ping(ip):
+def test_ping(ip, source_ip=None, timeout=1):
     """
     Testuje połączenie ICMP (ping) w sposób kompatybilny z Windows i Linux
+    source_ip: lokalny adres źródłowy (Windows/macOS: -S, Linux: -I)
+    timeout: limit czasu odpowiedzi w sekundach (Linux/Unix: zaokrąglany w górę do pełnych sekund)
     """
     logger = logging.getLogger('NetworkTester')
     
     # Określenie parametrów ping w zależności od systemu
-    if platform.system().lower() == "windows":
-        command = f"ping -n 1 -w 1000 {ip} > nul 2>&1"  # Windows: -n liczba pakietów, -w timeout w ms
-        logger.debug(f"Używam komendy ping dla Windows: {command}")
+    if sys.platform == "win32":
+        source = f"-S {source_ip} " if source_ip else ""
+        command = f"ping -n 1 -w {max(1, round(timeout * 1000))} {source}{ip} > nul 2>&1"  # Windows: -n liczba pakietów, -w timeout w ms
+        logger.debug("Używam komendy ping dla Windows: %s", command)
     else:
-        command = f"ping -c 1 -W 1 {ip} > /dev/null 2>&1"  # Linux/Unix: -c liczba pakietów, -W timeout w s
-        logger.debug(f"Używam komendy ping dla Linux/Unix: {command}")
+        source = (f"-S {source_ip} " if sys.platform == "darwin" else f"-I {source_ip} ") if source_ip else ""
+        # macOS: adresy IPv6 tylko przez ping6 (bez -W); Linux: ping rozpoznaje rodzinę adresu sam
+        if sys.platform == "darwin" and ":" in ip:
+            command = f"ping6 -c 1 {source}{ip} > /dev/null 2>&1"
+        else:
+            command = f"ping -c 1 -W {max(1, math.ceil(timeout))} {source}{ip} > /dev/null 2>&1"  # Linux/Unix: -c liczba pakietów, -W timeout w s
+        logger.debug("Używam komendy ping dla Linux/Unix: %s", command)
     
     response = os.system(command)
-    logger.debug(f"Wynik polecenia ping dla {ip}: {response}")
+    logger.debug("Wynik polecenia ping dla %s: %s", ip, response)
     
     return response == 0
 
-def test_connections(client_data, local_ips, local_fqdn, debug=False):
+# Wynik testu jednego wiersza polityki; outcome: "success", "failed" lub "error",
+# cached: wynik pochodzi z pamięci podręcznej wyników, a nie z testu.
+# Czasy w ms (None, jeśli nie zmierzono): dns_ms - weryfikacja DNS, connect_ms - nawiązanie
+# połączenia TCP / wykonanie ping, rtt_ms - odpowiedź PONG; timeout - budżet czasu testu w s
+# source: lokalny adres źródłowy, do którego był przypisany test (None = według routingu)
+# handshake_ms: uzgadnianie TLS testu warstwy aplikacji (osobno od connect_ms), rtt_ms obejmuje też odpowiedź HTTP
+# connected_ip: adres, który wygrał wyścig połączeń IPv6/IPv4 (--happy-eyeballs)
+# reused: test warstwy aplikacji na ponownie użytym połączeniu keep-alive (connect_ms = 0, bez nawiązywania)
+ProbeResult = namedtuple('ProbeResult', ['ip', 'port', 'protocol', 'status', 'outcome', 'row', 'description', 'cached',
+                                         'dns_ms', 'connect_ms', 'rtt_ms', 'timeout', 'source', 'handshake_ms',
+                                         'connected_ip', 'reused'],
+                         defaults=(False, None, None, None, None, None, None, None, False))
+
+def make_result(entry, port, protocol, status, outcome, timings=None, timeout=None):
+    timings = timings or {}
+    return ProbeResult(entry["dst_ip"], port, protocol, status, outcome,
+                       int(entry["row"]), entry.get("description") or "",
+                       connect_ms=timings.get("connect_ms"), rtt_ms=timings.get("rtt_ms"), timeout=timeout,
+                       handshake_ms=timings.get("handshake_ms"), connected_ip=timings.get("connected_ip"),
+                       reused=timings.get("reused", False))
+
+def result_latency(result):
+    """
+    Opóźnienie używane w podsumowaniu: czas odpowiedzi dla UDP i ponownie użytych połączeń
+    keep-alive (bez nawiązywania połączenia), czas połączenia dla pozostałych
+    """
+    if result.protocol == "UDP" or result.reused:
+        return result.rtt_ms
+    return result.connect_ms
+
+def probe_source(entry, local_ips):
+    """Adres źródłowy testu: src_ip wiersza, jeśli jest adresem lokalnym, w przeciwnym razie None"""
+    src_ip = normalize_ip(entry["src_ip"]) if ":" in entry["src_ip"] else entry["src_ip"]
+    return src_ip if src_ip in local_ips else None
+
+# Szczegóły testu warstwy aplikacji zapisywane w zdarzeniu probe_result
+APP_PROBE_FIELDS = ("handshake_ms", "tls_version", "tls_resumed", "http_status", "reused")
+
+def create_app_prober(probes=None):
+    """AppProber dla mapowania port -> rodzaj testu albo None, gdy testy warstwy aplikacji są wyłączone"""
+    if probes is None:
+        return None
+    from app_probe import AppProber
+    return AppProber(probes)
+
+def probe_entry(entry, timeout=5, tcp_ping=False, source_ip=None, app_prober=None, happy_eyeballs=False):
+    """
+    Testuje połączenie dla jednego wiersza polityki i zwraca ProbeResult.
+    source_ip: lokalny adres, z którego ma wyjść test (patrz probe_source).
+    app_prober: opcjonalny AppProber - wiersze TCP na portach TLS/HTTP są wtedy testowane
+    w warstwie aplikacji (uzgadnianie TLS, HTTP HEAD) zamiast samym połączeniem TCP.
+    happy_eyeballs: wiersze TCP z dst_fqdn są testowane wyścigiem połączeń do wszystkich
+    adresów IPv6/IPv4 nazwy (i dst_ip) - wynik to pierwsze nawiązane połączenie.
+    """
+    return _probe_entry(entry, timeout, tcp_ping, source_ip, app_prober, happy_eyeballs)._replace(source=source_ip)
+
+def _probe_entry(entry, timeout, tcp_ping, source_ip, app_prober, happy_eyeballs):
+    logger = logging.getLogger('NetworkTester')
+    protocol = entry["protocol"].upper()
+    timings = {}
+
+    try:
+        if protocol == "ICMP":
+            log_event(logger, logging.INFO, "probe_start", "Testuję połączenie %s z %s", protocol, entry["dst_ip"],
+                      row=entry["row"], protocol=protocol, dst_ip=entry["dst_ip"])
+            started = time.perf_counter()
+            success = test_ping(entry["dst_ip"], source_ip)
+            timings["connect_ms"] = (time.perf_counter() - started) * 1000
+            if success:
+                log_event(logger, logging.DEBUG, "probe_result", "SUCCESS: ICMP ping do %s udany", entry["dst_ip"],
+                          row=entry["row"], protocol=protocol, dst_ip=entry["dst_ip"], outcome="success",
+                          connect_ms=timings["connect_ms"])
+                return make_result(entry, "*", protocol, "SUCCESS", "success", timings, 1)
+            log_event(logger, logging.DEBUG, "probe_result", "FAILED: ICMP ping do %s nieudany", entry["dst_ip"],
+                      row=entry["row"], protocol=protocol, dst_ip=entry["dst_ip"], outcome="failed",
+                      connect_ms=timings["connect_ms"])
+            return make_result(entry, "*", protocol, "FAILED", "failed", timings, 1)
+
+        elif protocol in ["TCP", "UDP"]:
+            if entry["dst_port"] == "*":
+                raise ValueError("Nie można użyć '*' jako portu dla TCP/UDP.")
+
+            log_event(logger, logging.INFO, "probe_start", "Testuję połączenie %s z %s:%s",
+                      protocol, entry["dst_ip"], entry["dst_port"],
+                      row=entry["row"], protocol=protocol, dst_ip=entry["dst_ip"], dst_port=entry["dst_port"])
+
+            app_kind = app_prober.probe_kind(entry) if app_prober is not None and protocol == "TCP" else None
+            if app_kind is not None:
+                success, error = app_prober.probe(entry["dst_ip"], entry["dst_port"], app_kind, timeout, timings,
+                                                  source_ip, entry["dst_fqdn"] or None)
+            elif protocol == "TCP":
+                addresses = None
+                if happy_eyeballs and entry["dst_fqdn"]:
+                    addresses = list(dict.fromkeys(resolve_addresses(entry["dst_fqdn"]) + [normalize_ip(entry["dst_ip"])]))
+                success, error = test_tcp_connection(entry["dst_ip"], entry["dst_port"], timeout, timings, tcp_ping,
+                                                     source_ip, addresses)
+            else:  # UDP
+                success, error = test_udp_connection(entry["dst_ip"], entry["dst_port"], timeout, timings, source_ip)
+
+            app_fields = {}
+            if app_kind is not None:
+                app_fields = {"app": app_kind, **{name: timings[name] for name in APP_PROBE_FIELDS if name in timings}}
+            if success:
+                log_event(logger, logging.DEBUG, "probe_result", "SUCCESS: Połączenie %s z %s:%s udane",
+                          protocol, entry["dst_ip"], entry["dst_port"],
+                          row=entry["row"], protocol=protocol, dst_ip=entry["dst_ip"], dst_port=entry["dst_port"],
+                          outcome="success", connect_ms=timings.get("connect_ms"), rtt_ms=timings.get("rtt_ms"),
+                          connected_ip=timings.get("connected_ip"), **app_fields)
+                return make_result(entry, entry["dst_port"], protocol, "SUCCESS", "success", timings, timeout)
+            error_msg = f"ERROR: {error}" if error else "FAILED"
+            log_event(logger, logging.DEBUG, "probe_result", "FAILED: Połączenie %s z %s:%s nieudane - %s",
+                      protocol, entry["dst_ip"], entry["dst_port"], error,
+                      row=entry["row"], protocol=protocol, dst_ip=entry["dst_ip"], dst_port=entry["dst_port"],
+                      outcome="failed", error=error, connect_ms=timings.get("connect_ms"), **app_fields)
+            return make_result(entry, entry["dst_port"], protocol, error_msg, "failed", timings, timeout)
+
+        else:
+            error_msg = f"ERROR: Nieobsługiwany protokół: {protocol}"
+            logger.error(error_msg)
+            return make_result(entry, entry["dst_port"], protocol, error_msg, "error")
+
+    except Exception as e:
+        error_msg = f"ERROR: {str(e)}"
+        log_event(logger, logging.DEBUG, "probe_result", "ERROR: Nieoczekiwany błąd podczas łączenia z %s:%s (%s): %s",
+                  entry["dst_ip"], entry["dst_port"], protocol, str(e),
+                  row=entry["row"], protocol=protocol, dst_ip=entry["dst_ip"], dst_port=entry["dst_port"],
+                  outcome="error", error=str(e))
+        return make_result(entry, entry["dst_port"], protocol, error_msg, "error")
+
+IGNORED_MSG = (
+    "IGNORED: Połączenie zignorowane - nie pasuje do lokalnego hosta\n"
+    "         Docelowe: %s:%s (%s)\n"
+    "         Źródłowe: IP=%s, FQDN=%s\n"
+    "         Lokalne: IP=%s, FQDN=%s"
+)
+
+def note_ignored(entry, local_ips_text, local_fqdn, debug=False):
+    """Loguje wiersz polityki, który nie dotyczy lokalnego hosta, i zwraca jego opis do statystyk"""
     logger = logging.getLogger('NetworkTester')
+    log_event(logger, logging.DEBUG, "row_ignored", IGNORED_MSG,
+              entry["dst_ip"], entry["dst_port"], entry["protocol"].upper(),
+              entry["src_ip"], entry["src_fqdn"], local_ips_text, local_fqdn,
+              row=entry["row"], src_ip=entry["src_ip"], src_fqdn=entry["src_fqdn"])
+    if debug:
+        ignored_msg = IGNORED_MSG % (entry["dst_ip"], entry["dst_port"], entry["protocol"].upper(),
+                                     entry["src_ip"], entry["src_fqdn"], local_ips_text, local_fqdn)
+        print(f"\033[93m{ignored_msg}\033[0m")  # Żółty kolor dla ignorowanych
+    return {
+        "ip": entry["dst_ip"],
+        "port": entry["dst_port"],
+        "protocol": entry["protocol"].upper(),
+        "src_ip": entry["src_ip"],
+        "src_fqdn": entry["src_fqdn"]
+    }
+
+def cached_result(entry, result_cache, cache_mode):
+    """Wynik z pamięci podręcznej zamiast testowania połączenia albo None"""
+    cached = result_cache.lookup(entry, cache_mode) if result_cache is not None else None
+    if cached is None:
+        return None
+    outcome, status = cached
+    protocol = entry["protocol"].upper()
+    port = "*" if protocol == "ICMP" else entry["dst_port"]
+    log_event(logging.getLogger('NetworkTester'), logging.DEBUG, "cache_hit", "CACHE: %s:%s (%s) -> %s",
+              entry["dst_ip"], port, protocol, status, row=entry["row"], outcome=outcome)
+    return make_result(entry, port, protocol, status, outcome)._replace(cached=True)
+
+def unreachable_result(entry):
+    """Wynik wiersza, którego host docelowy nie odpowiedział w sprawdzeniu wstępnym"""
+    protocol = entry["protocol"].upper()
+    port = "*" if protocol == "ICMP" else entry["dst_port"]
+    return make_result(entry, port, protocol, HOST_UNREACHABLE, "failed")
+
+def find_unreachable_hosts(client_data, local_ips, local_fqdn, timeout=2.0):
+    """
+    Sprawdzenie wstępne (--precheck) hostów docelowych z wierszy dotyczących lokalnego hosta.
+    Do testu TCP używane są porty TCP z polityki. Zwraca zbiór adresów nieosiągalnych.
+    """
+    from host_precheck import precheck_hosts
+    targets = {}
+    for entry in client_data:
+        if not should_test_connection(entry, local_ips, local_fqdn):
+            continue
+        ports = targets.setdefault(entry["dst_ip"], [])
+        if entry["protocol"].upper() == "TCP" and entry["dst_port"] != "*":
+            ports.append(entry["dst_port"])
+    verdicts = precheck_hosts(targets, timeout, ping=lambda ip: test_ping(ip, timeout=timeout))
+    return {ip for ip, (alive, _) in verdicts.items() if not alive}
+
+def precheck_unreachable_hosts(args, client_data, local_ips, local_fqdn):
+    """
+    Sprawdzenie wstępne według opcji: --precheck z --precheck-timeout, pomijane przy --force-full-check.
+    Zwraca zbiór adresów nieosiągalnych lub None, gdy sprawdzenia nie było.
+    """
+    if not args.precheck or args.force_full_check:
+        return None
+    return find_unreachable_hosts(client_data, local_ips, local_fqdn, args.precheck_timeout)
+
+def check_dns(entry, log_level=logging.DEBUG):
+    """
+    Weryfikacja DNS wiersza (tylko informacyjnie) - wspólna dla przebiegu jednorazowego i --daemon.
+    Ostrzeżenie trafia do dziennika (zdarzenie dns_warning z poziomem log_level), nie na konsolę.
+    Zwraca (czas w ms lub None, opis ostrzeżenia lub None)
+    """
+    dns_started = time.perf_counter()
+    dns_ok, dns_error = verify_dns_resolution(entry)
+    dns_ms = (time.perf_counter() - dns_started) * 1000 if entry["dst_fqdn"] else None
+    if not dns_ok and dns_error:
+        log_event(logging.getLogger('NetworkTester'), log_level, "dns_warning", "Ostrzeżenie DNS dla %s: %s",
+                  entry["dst_fqdn"], dns_error, row=entry["row"], fqdn=entry["dst_fqdn"], expected_ip=entry["dst_ip"])
+        return dns_ms, {"fqdn": entry["dst_fqdn"], "expected_ip": entry["dst_ip"], "error": dns_error}
+    return dns_ms, None
+
+def show_dns_warning(warning):
+    """Wypisuje ostrzeżenie DNS na konsolę w trakcie przebiegu jednorazowego"""
+    print(f"\033[93m\033[1m[WARNING] Ostrzeżenie DNS: {warning['error']}\033[0m")
+
+def test_connections(client_data, local_ips, local_fqdn, debug=False, result_cache=None, cache_mode="ttl", timeout=5,
+                     tcp_ping=False, on_result=None, scheduler=None, unreachable_hosts=None, app_prober=None,
+                     happy_eyeballs=False):
+    """
+    Testuje wszystkie pasujące wiersze polityki. Przy podanej pamięci podręcznej wyników
+    (result_cache) wiersze zweryfikowane niedawno nie są testowane ponownie - patrz ResultCache.
+    on_result: opcjonalna funkcja wywoływana z każdym wynikiem zaraz po teście.
+    scheduler: opcjonalny ProbeScheduler - testy (z weryfikacją DNS) są wtedy wykonywane
+    równolegle z limitami tempa; wyniki są zwracane w kolejności wierszy polityki.
+    unreachable_hosts: adresy docelowe ze sprawdzenia wstępnego - ich wiersze nie są testowane.
+    app_prober: opcjonalny AppProber do testów warstwy aplikacji (patrz probe_entry).
+    happy_eyeballs: wyścig połączeń IPv6/IPv4 dla wierszy TCP z dst_fqdn (patrz probe_entry).
+    """
+    logger = logging.getLogger('NetworkTester')
+    unreachable_hosts = unreachable_hosts or set()
+    unreachable_count = 0
     results = []
     success_count = 0
     failure_count = 0
     error_count = 0
     ignored_count = 0
+    cached_count = 0
     dns_warnings = []
     ignored_entries = []
+    local_ips_text = ", ".join(local_ips)
+    scheduled = []
+
+    local_ip_set = set(local_ips)
+
+    def check_and_probe(entry):
+        dns_ms, dns_warning = check_dns(entry)
+        if dns_warning is not None:
+            show_dns_warning(dns_warning)
+        result = probe_entry(entry, timeout, tcp_ping, probe_source(entry, local_ip_set), app_prober, happy_eyeballs)
+        return result._replace(dns_ms=dns_ms), dns_warning
+
+    def add_result(entry, result):
+        nonlocal success_count, failure_count, error_count
+        if result_cache is not None and not result.cached:
+            result_cache.record(entry, result)
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+        if result.outcome == "success":
+            success_count += 1
+        elif result.outcome == "failed":
+            failure_count += 1
+        else:
+            error_count += 1
 
     for entry in client_data:
-        # Weryfikacja DNS (tylko informacyjnie)
-        dns_ok, dns_error = verify_dns_resolution(entry)
-        if not dns_ok and dns_error:
-            dns_warnings.append({
-                "fqdn": entry["dst_fqdn"],
-                "expected_ip": entry["dst_ip"],
-                "error": dns_error
-            })
-            logger.debug(f"Ostrzeżenie DNS dla {entry['dst_fqdn']}: {dns_error}")
-        
         # Sprawdzamy czy powinniśmy testować to połączenie
-        if not should_test_connection(entry, local_ips, local_fqdn):
-            ignored_entries.append({
-                "ip": entry["dst_ip"],
-                "port": entry["dst_port"],
-                "protocol": entry["protocol"].upper(),
-                "src_ip": entry["src_ip"],
-                "src_fqdn": entry["src_fqdn"]
-            })
+        matches = should_test_connection(entry, local_ips, local_fqdn)
+        # Wynik z pamięci podręcznej zamiast testowania połączenia
+        cached = cached_result(entry, result_cache, cache_mode) if matches else None
+
+        # Wiersze do testu przez harmonogram - weryfikacja DNS odbywa się razem z testem
+        if scheduler is not None and matches and cached is None and entry["dst_ip"] not in unreachable_hosts:
+            scheduled.append(entry)
+            continue
+
+        # Weryfikacja DNS (tylko informacyjnie)
+        dns_ms, dns_warning = check_dns(entry)
+        if dns_warning is not None:
+            show_dns_warning(dns_warning)
+            dns_warnings.append(dns_warning)
+
+        if not matches:
+            ignored_entries.append(note_ignored(entry, local_ips_text, local_fqdn, debug))
             ignored_count += 1
-            ignored_msg = (
-                f"IGNORED: Połączenie zignorowane - nie pasuje do lokalnego hosta\n"
-                f"         Docelowe: {entry['dst_ip']}:{entry['dst_port']} ({entry['protocol'].upper()})\n"
-                f"         Źródłowe: IP={entry['src_ip']}, FQDN={entry['src_fqdn']}\n"
-                f"         Lokalne: IP={', '.join(local_ips)}, FQDN={local_fqdn}"
-            )
-            logger.debug(ignored_msg)
-            if debug:
-                print(f"\033[93m{ignored_msg}\033[0m")  # Żółty kolor dla ignorowanych
             continue
 
-        # Testowanie połączenia
-        try:
-            protocol = entry["protocol"].upper()
-            
-            if protocol == "ICMP":
-                logger.info(f"Testuję połączenie {protocol} z {entry['dst_ip']}")
-                if test_ping(entry["dst_ip"]):
-                    results.append((entry["dst_ip"], "*", protocol, "SUCCESS"))
-                    logger.debug(f"SUCCESS: ICMP ping do {entry['dst_ip']} udany")
-                    success_count += 1
-                else:
-                    results.append((entry["dst_ip"], "*", protocol, "FAILED"))
-                    logger.debug(f"FAILED: ICMP ping do {entry['dst_ip']} nieudany")
-                    failure_count += 1
-            
-            elif protocol in ["TCP", "UDP"]:
-                if entry["dst_port"] == "*":
-                    raise ValueError("Nie można użyć '*' jako portu dla TCP/UDP.")
-                
-                logger.info(f"Testuję połączenie {protocol} z {entry['dst_ip']}:{entry['dst_port']}")
-                
-                if protocol == "TCP":
-                    success, error = test_tcp_connection(entry["dst_ip"], entry["dst_port"])
-                else:  # UDP
-                    success, error = test_udp_connection(entry["dst_ip"], entry["dst_port"])
-                
-                if success:
-                    results.append((entry["dst_ip"], entry["dst_port"], protocol, "SUCCESS"))
-                    logger.debug(f"SUCCESS: Połączenie {protocol} z {entry['dst_ip']}:{entry['dst_port']} udane")
-                    success_count += 1
-                else:
-                    error_msg = f"ERROR: {error}" if error else "FAILED"
-                    results.append((entry["dst_ip"], entry["dst_port"], protocol, error_msg))
-                    logger.debug(f"FAILED: Połączenie {protocol} z {entry['dst_ip']}:{entry['dst_port']} nieudane - {error}")
-                    failure_count += 1
-            
-            else:
-                error_msg = f"ERROR: Nieobsługiwany protokół: {protocol}"
-                results.append((entry["dst_ip"], entry["dst_port"], protocol, error_msg))
-                logger.error(error_msg)
-                error_count += 1
+        if cached is not None:
+            cached_count += 1
+            result = cached
+        elif entry["dst_ip"] in unreachable_hosts:
+            unreachable_count += 1
+            result = unreachable_result(entry)
+        else:
+            result = probe_entry(entry, timeout, tcp_ping, probe_source(entry, local_ip_set),
+                                 app_prober, happy_eyeballs)._replace(dns_ms=dns_ms)
+        add_result(entry, result)
 
-        except Exception as e:
-            error_msg = f"ERROR: {str(e)}"
-            results.append((entry["dst_ip"], entry["dst_port"], protocol, error_msg))
-            logger.debug(f"ERROR: Nieoczekiwany błąd podczas łączenia z {entry['dst_ip']}:{entry['dst_port']} ({protocol}): {e}")
-            error_count += 1
+    if scheduled:
+        # Osobna pula testów dla każdego lokalnego adresu źródłowego
+        for entry, (result, dns_warning) in scheduler.run(scheduled, check_and_probe,
+                                                          group=lambda entry: probe_source(entry, local_ip_set)):
+            if dns_warning is not None:
+                dns_warnings.append(dns_warning)
+            add_result(entry, result)
+        results.sort(key=lambda result: result.row)
 
     return results, {
         "success": success_count, 
         "failed": failure_count, 
         "errors": error_count,
         "ignored": ignored_count,
+        "cached": cached_count,
+        "unreachable": unreachable_count,
+        "dns_warnings": dns_warnings,
+        "ignored_entries": ignored_entries
+    }
+
+def create_scheduler(concurrency=1, rate=0, per_host=1, per_subnet=8):
+    """
+    Harmonogram testów równoległych (ProbeScheduler) albo None, gdy testy mają być
+    wykonywane po kolei bez limitu tempa (domyślnie).
+    """
+    if concurrency <= 1 and rate <= 0:
+        return None
+    from scheduler import ProbeScheduler
+    return ProbeScheduler(concurrency, rate, per_host, per_subnet)
+
+def destination_shard(entry, workers):
+    """Numer procesu roboczego dla wiersza - ten sam adres docelowy zawsze trafia do tego samego procesu"""
+    return zlib.crc32(entry["dst_ip"].encode("utf-8")) % workers
+
+def run_worker(connection, rows, local_ips, local_fqdn, log_level, timeout, tcp_ping, scheduler_options=None,
+               app_probes=None, happy_eyeballs=False):
+    """
+    Proces roboczy trybu --workers: testuje swoją część wierszy i przesyła do procesu
+    nadrzędnego paczki ("results", wyniki jako krotki, rekordy logu), a na koniec
+    ("done", ostrzeżenia DNS). scheduler_options: argumenty create_scheduler dla tego procesu.
+    app_probes: mapowanie port -> rodzaj testu warstwy aplikacji (sesje TLS i połączenia keep-alive
+    są w każdym procesie osobne - ten sam cel trafia zawsze do jednego procesu).
+    """
+    logger = logging.getLogger('NetworkTester')
+    logger.handlers.clear()
+    logger.setLevel(log_level)
+    forward = BufferingHandler(log_level)
+    logger.addHandler(forward)
+
+    batch = []
+    last_sent = time.monotonic()
+
+    def send_batch():
+        nonlocal batch, last_sent
+        connection.send(("results", batch, forward.drain()))
+        batch = []
+        last_sent = time.monotonic()
+
+    def on_result(result):
+        batch.append(tuple(result))
+        if len(batch) >= WORKER_BATCH_SIZE or time.monotonic() - last_sent >= WORKER_BATCH_SECONDS:
+            send_batch()
+
+    scheduler = create_scheduler(*scheduler_options) if scheduler_options else None
+    app_prober = create_app_prober(app_probes)
+    _, stats = test_connections(rows, local_ips, local_fqdn, timeout=timeout, tcp_ping=tcp_ping, on_result=on_result,
+                                scheduler=scheduler, app_prober=app_prober, happy_eyeballs=happy_eyeballs)
+    if app_prober is not None:
+        app_prober.close()
+    send_batch()
+    connection.send(("done", stats["dns_warnings"], forward.drain()))
+    connection.close()
+
+def test_connections_parallel(client_data, local_ips, local_fqdn, workers, debug=False, result_cache=None,
+                              cache_mode="ttl", timeout=5, tcp_ping=False, scheduler_options=None,
+                              unreachable_hosts=None, app_probes=None, on_result=None, happy_eyeballs=False):
+    """
+    Odpowiednik test_connections dla --workers N. Dopasowanie wierszy i pamięć podręczna
+    są obsługiwane w procesie nadrzędnym, a pozostałe wiersze są dzielone między procesy
+    robocze według skrótu adresu docelowego. Wyniki napływają strumieniowo przez potoki
+    i są scalane w kolejności wierszy polityki.
+    scheduler_options: (concurrency, rate, per_host, per_subnet) - limit tempa jest dzielony
+    między procesy, a limit na adres docelowy obowiązuje w całości, bo adres trafia do jednego procesu.
+    unreachable_hosts: adresy docelowe ze sprawdzenia wstępnego - ich wiersze nie trafiają do procesów.
+    app_probes: mapowanie port -> rodzaj testu warstwy aplikacji (AppProber w każdym procesie).
+    on_result: opcjonalna funkcja wywoływana z każdym wynikiem zaraz po jego otrzymaniu.
+    """
+    import multiprocessing
+    import multiprocessing.connection
+
+    logger = logging.getLogger('NetworkTester')
+    local_ips_text = ", ".join(local_ips)
+    unreachable_hosts = unreachable_hosts or set()
+    ignored_entries = []
+    results = []
+    cached_count = 0
+    unreachable_count = 0
+    shards = [[] for _ in range(workers)]
+    for entry in client_data:
+        if not should_test_connection(entry, local_ips, local_fqdn):
+            ignored_entries.append(note_ignored(entry, local_ips_text, local_fqdn, debug))
+            continue
+        result = cached_result(entry, result_cache, cache_mode)
+        if result is not None:
+            results.append(result)
+            cached_count += 1
+            if on_result is not None:
+                on_result(result)
+            continue
+        if entry["dst_ip"] in unreachable_hosts:
+            result = unreachable_result(entry)
+            results.append(result)
+            unreachable_count += 1
+            if result_cache is not None:
+                result_cache.record(entry, result)
+            if on_result is not None:
+                on_result(result)
+            continue
+        # Wiersze *.npol są widokami na mmap - do innego procesu trafia kopia jako słownik
+        shards[destination_shard(entry, workers)].append(dict(entry))
+    rows_by_number = {int(entry["row"]): entry for shard in shards for entry in shard}
+
+    active_shards = sum(1 for shard in shards if shard)
+    worker_scheduler = None
+    if scheduler_options and active_shards:
+        concurrency, rate, per_host, per_subnet = scheduler_options
+        worker_scheduler = (concurrency, rate / active_shards, per_host, per_subnet)
+
+    # spawn na wszystkich systemach - proces nadrzędny ma już wątek logowania w tle
+    context = multiprocessing.get_context("spawn")
+    connections = []
+    processes = []
+    for shard in shards:
+        if not shard:
+            continue
+        parent_end, child_end = context.Pipe(duplex=False)
+        process = context.Process(target=run_worker, name="probe-worker",
+                                  args=(child_end, shard, local_ips, local_fqdn, logger.level, timeout, tcp_ping,
+                                        worker_scheduler, app_probes, happy_eyeballs))
+        process.start()
+        child_end.close()
+        connections.append(parent_end)
+        processes.append(process)
+    logger.debug("Uruchomiono %d procesów roboczych dla %d wierszy",
+                 len(processes), sum(len(shard) for shard in shards))
+
+    dns_warnings = []
+    pending = list(connections)
+    while pending:
+        for connection in multiprocessing.connection.wait(pending):
+            try:
+                kind, payload, records = connection.recv()
+            except EOFError:
+                pending.remove(connection)
+                logger.error("Proces roboczy zakończył się przed przesłaniem wszystkich wyników")
+                continue
+            for record in records:
+                logger.handle(record)
+            if kind == "results":
+                for fields in payload:
+                    result = ProbeResult(*fields)
+                    results.append(result)
+                    if result_cache is not None:
+                        result_cache.record(rows_by_number[result.row], result)
+                    if on_result is not None:
+                        on_result(result)
+            else:
+                dns_warnings.extend(payload)
+                pending.remove(connection)
+    for process in processes:
+        process.join()
+
+    results.sort(key=lambda result: result.row)
+    return results, {
+        "success": sum(1 for result in results if result.outcome == "success"),
+        "failed": sum(1 for result in results if result.outcome == "failed"),
+        "errors": sum(1 for result in results if result.outcome not in ("success", "failed")),
+        "ignored": len(ignored_entries),
+        "cached": cached_count,
+        "unreachable": unreachable_count,
         "dns_warnings": dns_warnings,
         "ignored_entries": ignored_entries
     }
 
-def show_results(results, stats, debug=False):
+# Granice przedziałów histogramu opóźnień w ms (ostatni przedział: powyżej 2000 ms)
+LATENCY_BUCKETS_MS = [1, 5, 10, 50, 100, 500, 1000, 2000]
+
+def latency_percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def latency_histogram(values):
+    counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    for value in values:
+        counts[bisect.bisect_left(LATENCY_BUCKETS_MS, value)] += 1
+    return counts
+
+def latency_subnet(ip):
+    """Podsieć docelowa do grupowania opóźnień: /24 dla IPv4, /64 dla IPv6"""
+    import ipaddress
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return ip
+    prefix = 24 if address.version == 4 else 64
+    return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+def format_percentiles(values):
+    return (f"n={len(values)} p50={latency_percentile(values, 0.5):.1f} p90={latency_percentile(values, 0.9):.1f} "
+            f"p99={latency_percentile(values, 0.99):.1f} max={max(values):.1f} ms")
+
+def show_latency_summary(results, slowest=10):
+    """
+    Wyświetla histogramy i percentyle opóźnień udanych testów per protokół i per podsieć
+    docelowa oraz najwolniejsze przepływy. Pomija wyniki z pamięci podręcznej i bez pomiaru.
+    Testy na ponownie użytych połączeniach keep-alive nie nawiązują połączenia - mają osobną
+    linię z czasem odpowiedzi i nie wchodzą do percentyli czasu połączenia.
+    """
+    logger = logging.getLogger('NetworkTester')
+    measured = [(result, result_latency(result)) for result in results
+                if result.outcome == "success" and not result.cached]
+    measured = [(result, latency) for result, latency in measured if latency is not None]
+    reused = [latency for result, latency in measured if result.reused]
+    connected = [(result, latency) for result, latency in measured if not result.reused]
+    if not measured:
+        return
+
+    labels = [f"<{LATENCY_BUCKETS_MS[0]}"]
+    labels += [f"{low}-{high}" for low, high in zip(LATENCY_BUCKETS_MS, LATENCY_BUCKETS_MS[1:])]
+    labels += [f">{LATENCY_BUCKETS_MS[-1]}"]
+
+    logger.info("OPÓŹNIENIA (połączenie TCP / ping ICMP / odpowiedź UDP)")
+    by_protocol = {}
+    for result, latency in connected:
+        by_protocol.setdefault(result.protocol, []).append(latency)
+    for protocol, values in sorted(by_protocol.items()):
+        logger.info(f"  {protocol}: {format_percentiles(values)}")
+        counts = latency_histogram(values)
+        width = max(counts)
+        for label, count in zip(labels, counts):
+            if count:
+                logger.info(f"    {label:>10} ms | {'#' * max(1, count * 40 // width)} {count}")
+
+    handshakes = [result.handshake_ms for result, _ in measured if result.handshake_ms is not None]
+    if handshakes:
+        logger.info(f"  Uzgadnianie TLS (bez połączenia TCP): {format_percentiles(handshakes)}")
+    if reused:
+        logger.info(f"  Połączenia keep-alive użyte ponownie (odpowiedź HTTP): {format_percentiles(reused)}")
+
+    logger.info("  Podsieci docelowe (liczności w przedziałach: " + " ".join(labels) + " ms):")
+    by_subnet = {}
+    for result, latency in connected:
+        by_subnet.setdefault(latency_subnet(result.ip), []).append(latency)
+    for subnet, values in sorted(by_subnet.items(), key=lambda item: -latency_percentile(item[1], 0.99)):
+        counts = " ".join(str(count) for count in latency_histogram(values))
+        logger.info(f"    {subnet:<20} {format_percentiles(values)} [{counts}]")
+
+    if slowest > 0:
+        logger.info(f"  Najwolniejsze przepływy (top {slowest}):")
+        for result, latency in sorted(measured, key=lambda item: -item[1])[:slowest]:
+            details = ["połączenie keep-alive użyte ponownie" if result.reused else
+                       f"połączenie {result.connect_ms:.1f} ms" if result.connect_ms is not None else None,
+                       f"TLS {result.handshake_ms:.1f} ms" if result.handshake_ms is not None else None,
+                       f"odpowiedź {result.rtt_ms:.1f} ms" if result.rtt_ms is not None else None,
+                       f"DNS {result.dns_ms:.1f} ms" if result.dns_ms is not None else None,
+                       f"limit {result.timeout} s" if result.timeout is not None else None,
+                       f"źródło {result.source}" if result.source else None]
+            logger.info(f"    {latency:8.1f} ms  {result.ip}:{result.port} ({result.protocol}) "
+                        f"wiersz {result.row} -> {result.status} [{', '.join(d for d in details if d)}]")
+
+def show_results(results, stats, debug=False, slowest=10):
     logger = logging.getLogger('NetworkTester')
     logger.info("Wyniki testów:")
     
     # Wyświetlamy tylko wyniki testów (bez ignorowanych)
-    for ip, port, protocol, status in results:
-        if status != "IGNORED":
-            status_msg = f"{ip}:{port} ({protocol}) -> {status}"
+    for result in results:
+        if result.status != "IGNORED":
+            status = result.status
+            status_msg = f"{result.ip}:{result.port} ({result.protocol}) -> {status}"
+            if result.source:
+                status_msg += f" [źródło {result.source}]"
+            if result.connected_ip:
+                status_msg += f" [połączono z {result.connected_ip}]"
+            if result.cached:
+                status_msg += " (z pamięci podręcznej)"
             if "SUCCESS" in status:
                 logger.info(status_msg)
-            elif "FAILED" in status:
+            elif "FAILED" in status or status == HOST_UNREACHABLE:
                 logger.error(status_msg)
             else:
                 logger.warning(status_msg)
@@ -387,9 +1143,12 @@ def show_results(results, stats, debug=False):
     Nieudane połączenia: {stats['failed']}
     Błędy połączeń: {stats['errors']}
     Zignorowane pozycje: {stats['ignored']}
+    Wyniki z pamięci podręcznej: {stats['cached']}
+    Pominięte (host nieosiągalny): {stats.get('unreachable', 0)}
     Łącznie pozycji: {stats['success'] + stats['failed'] + stats['errors'] + stats['ignored']}
     """
     logger.info(summary)
+    show_latency_summary(results, slowest)
 
     if debug and stats['ignored_entries']:
         logger.debug("Zignorowane pozycje:")
@@ -399,31 +1158,372 @@ def show_results(results, stats, debug=False):
                 f"[src_ip: {entry['src_ip']}, src_fqdn: {entry['src_fqdn']}]"
             )
 
+def trace_failed_flows(results, max_hops=30, timeout=3.0):
+    """
+    Śledzenie trasy nieudanych przepływów TCP/UDP (--trace-failed). Przepływy o tym samym
+    celu, porcie, protokole i adresie źródłowym są śledzone raz. Wyświetla dla każdego
+    ostatni odpowiadający węzeł przed celem - najbardziej prawdopodobne miejsce blokady.
+    """
+    import path_trace
+
+    logger = logging.getLogger('NetworkTester')
+    if not path_trace.is_supported():
+        logger.warning("Śledzenie trasy (--trace-failed) jest dostępne tylko na Linux")
+        return {}
+
+    flows = {}
+    for result in results:
+        if result.outcome != "success" and not result.cached and result.protocol in ("TCP", "UDP"):
+            flow = (result.protocol, result.ip, result.port, result.source)
+            flows.setdefault(flow, []).append(result.row)
+    if not flows:
+        return {}
+
+    logger.info(f"\nŚLEDZENIE TRASY NIEUDANYCH PRZEPŁYWÓW ({len(flows)}, do {max_hops} węzłów)")
+    traces = path_trace.trace_flows({flow: flow for flow in flows}, max_hops, timeout)
+    for flow, trace in traces.items():
+        protocol, ip, port, source = flow
+        rows = ", ".join(str(row) for row in flows[flow])
+        if trace.blocked_by:
+            verdict = f"zablokowane przez {trace.blocked_by} (ICMP: administracyjnie zabronione)"
+        elif trace.reached_ttl is not None:
+            verdict = f"cel odpowiada (TTL {trace.reached_ttl}) - blokada na hoście docelowym lub w usłudze"
+        elif trace.last_hop is not None:
+            verdict = f"ostatni odpowiadający węzeł {trace.last_hop} (TTL {trace.last_hop_ttl}) - prawdopodobne miejsce blokady"
+        else:
+            verdict = "brak odpowiedzi żadnego węzła"
+        path = " -> ".join(f"{ttl}:{address}" for ttl, address in trace.hops.items())
+        logger.info(f"  {ip}:{port} ({protocol}) wiersze {rows}: {verdict}")
+        if path:
+            logger.info(f"      trasa: {path}")
+        log_event(logger, logging.DEBUG, "trace_result", "Trasa %s:%s (%s): %s", ip, port, protocol, verdict,
+                  rows=flows[flow], protocol=protocol, dst_ip=ip, dst_port=port, source=source,
+                  reached_ttl=trace.reached_ttl, last_hop=trace.last_hop, last_hop_ttl=trace.last_hop_ttl,
+                  blocked_by=trace.blocked_by, hops=trace.hops)
+    return traces
+
+def get_policy_id(config_file):
+    """
+    Identyfikator polityki: początek skrótu SHA-256 pliku polityki CSV
+    (dla network_policy.csv taki sam, jaki wylicza aplikacja WEB). Dla polityki
+    skompilowanej (*.npol) - identyfikator CSV zapisany w jej nagłówku.
+    """
+    import hashlib
+    policy_path = find_policy_file(config_file)
+    if policy_path is None:
+        return "unknown"
+    if policy_path.endswith(COMPILED_POLICY_SUFFIX):
+        from policy_format import CompiledPolicy
+        policy = CompiledPolicy(policy_path)
+        try:
+            return policy.policy_id or "unknown"
+        finally:
+            policy.close()
+    with open(policy_path, mode="rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()[:16]
+
+def build_result_records(results, policy_id, local_fqdn):
+    """Zamienia wyniki testów na zwarte rekordy do wysłania (jeden słownik na wiersz polityki)"""
+    timestamp = round(time.time(), 3)
+    return [
+        {
+            "policy": policy_id,
+            "row": result.row,
+            "src_host": local_fqdn,
+            "dst_ip": result.ip,
+            "dst_port": str(result.port),
+            "protocol": result.protocol,
+            "src_ip": result.source or "",
+            "status": result.outcome.upper(),
+            "error": "" if result.outcome == "success" else result.status,
+            "connect_ms": None if result.connect_ms is None else round(result.connect_ms, 2),
+            "rtt_ms": None if result.rtt_ms is None else round(result.rtt_ms, 2),
+            "handshake_ms": None if result.handshake_ms is None else round(result.handshake_ms, 2),
+            "connected_ip": result.connected_ip or "",
+            "reused": result.reused,
+            "ts": timestamp,
+        }
+        for result in results
+    ]
+
+def post_results(url, payload, timeout=10):
+    """Wysyła paczkę NDJSON (skompresowaną gzip) metodą POST"""
+    # Import odroczony - urllib.request wydłuża start programu, a wysyłka jest opcjonalna
+    import gzip
+    import urllib.request
+    request = urllib.request.Request(
+        url,
+        data=gzip.compress(payload),
+        headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"},
+        method="POST"
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        response.read()
+
+def flush_results_spool(url, spool_dir):
+    """Wysyła wcześniej odłożone paczki wyników (od najstarszej), przerywa przy pierwszym błędzie"""
+    logger = logging.getLogger('NetworkTester')
+    if not os.path.isdir(spool_dir):
+        return
+    for spool_name in sorted(os.listdir(spool_dir)):
+        if not spool_name.endswith(".ndjson"):
+            continue
+        spool_path = os.path.join(spool_dir, spool_name)
+        with open(spool_path, mode="rb") as file:
+            payload = file.read()
+        try:
+            post_results(url, payload)
+        except Exception as e:
+            logger.debug(f"Nie udało się wysłać odłożonych wyników {spool_path}: {e}")
+            return
+        os.remove(spool_path)
+        logger.info(f"Wysłano odłożone wyniki: {spool_path}")
+
+def spool_results(payload, spool_dir):
+    """Zapisuje paczkę wyników na dysk (zapis atomowy przez plik tymczasowy)"""
+    os.makedirs(spool_dir, exist_ok=True)
+    spool_name = f"results_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S-%f')}_{os.getpid()}.ndjson"
+    spool_path = os.path.join(spool_dir, spool_name)
+    with open(spool_path + ".tmp", mode="wb") as file:
+        file.write(payload)
+    os.replace(spool_path + ".tmp", spool_path)
+    return spool_path
+
+def submit_results(url, records, spool_dir=RESULTS_SPOOL_DIR, attempts=3):
+    """
+    Wysyła wyniki do aplikacji WEB jako NDJSON. Przed wysłaniem ponawia odłożone paczki.
+    Jeśli wysyłka się nie powiedzie po kilku próbach, wyniki trafiają do katalogu spool.
+    """
+    logger = logging.getLogger('NetworkTester')
+    flush_results_spool(url, spool_dir)
+
+    payload = "\n".join(json.dumps(record, separators=(",", ":"), ensure_ascii=False)
+                        for record in records).encode("utf-8")
+    for attempt in range(attempts):
+        try:
+            post_results(url, payload)
+            logger.info(f"Wysłano {len(records)} wyników do {url}")
+            return True
+        except Exception as e:
+            logger.debug(f"Próba {attempt + 1}/{attempts} wysłania wyników nieudana: {e}")
+            if attempt + 1 < attempts:
+                time.sleep(2 ** attempt)
+
+    spool_path = spool_results(payload, spool_dir)
+    logger.warning(f"Nie udało się wysłać wyników do {url} - zapisano do {spool_path}")
+    return False
+
+def policy_signature(config_file):
+    """
+    Stan plików, z których może zostać wczytana polityka (skompilowana, CSV, indeks fragmentów).
+    Zmiana sygnatury oznacza, że politykę trzeba wczytać ponownie.
+    """
+    candidates = [os.path.splitext(config_file)[0] + COMPILED_POLICY_SUFFIX, config_file]
+    signature = []
+    for candidate in candidates:
+        path = find_policy_file(candidate)
+        if path is not None:
+            candidates.append(os.path.join(os.path.dirname(path), POLICY_INDEX_FILENAME))
+            break
+    for candidate in candidates:
+        path = find_policy_file(candidate)
+        if path is None:
+            signature.append(None)
+        else:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+def daemon_unsupported_options(args):
+    """
+    Opcje, których tryb --daemon nie obsługuje: testy w cyklu są wykonywane kolejno,
+    rozłożone równomiernie na --interval, bez procesów roboczych i sprawdzenia wstępnego.
+    """
+    options = (
+        ("--workers", args.workers > 1),
+        ("--concurrency", args.concurrency > 1),
+        ("--rate", args.rate > 0),
+        ("--precheck", args.precheck),
+        ("--force-full-check", args.force_full_check),
+        ("--trace-failed", args.trace_failed),
+    )
+    return [option for option, used in options if used]
+
+def run_daemon(args, client_data, local_ips, local_fqdn, result_cache=None, cache_mode="ttl", app_prober=None,
+               on_result=None):
+    """
+    Tryb ciągłego monitorowania. Polityka (client_data - już wczytana) jest trzymana w pamięci
+    i wczytywana ponownie tylko po zmianie pliku. Testy w cyklu są rozłożone równomiernie
+    na --interval sekund, a wyniki trafiają do metryk /metrics (i opcjonalnie do aplikacji WEB
+    po każdym cyklu).
+    """
+    from metrics import MetricsRegistry, start_metrics_server
+
+    logger = logging.getLogger('NetworkTester')
+    registry = MetricsRegistry()
+    if args.metrics_port:
+        start_metrics_server(registry, args.metrics_port, args.metrics_address)
+        logger.info(f"Metryki dostępne pod adresem http://{args.metrics_address}:{args.metrics_port}/metrics")
+
+    signature = policy_signature(args.config)
+    local_ip_set = set(local_ips)
+    policy_id = None
+    while True:
+        current_signature = policy_signature(args.config)
+        if current_signature != signature or policy_id is None:
+            if current_signature != signature:
+                logger.info("Wykryto zmianę polityki - wczytywanie ponowne")
+                client_data = load_client_data(args.config, local_ips, local_fqdn, args.full_policy)
+                signature = current_signature
+            # Tylko wiersze dotyczące tego hosta - dopasowanie wykonywane raz na wersję polityki
+            rows = [entry for entry in client_data if should_test_connection(entry, local_ips, local_fqdn)]
+            registry.set_policy(rows)
+            policy_id = get_policy_id(args.config)
+            logger.info(f"Polityka: {len(rows)} wierszy do testowania co {args.interval:g} s")
+
+        cycle_start = time.monotonic()
+        spacing = args.interval / len(rows) if rows else args.interval
+        results = []
+        for position, entry in enumerate(rows):
+            # Równomierne rozłożenie testów w cyklu; po opóźnieniu kolejny test nie nadrabia zaległości
+            delay = cycle_start + position * spacing - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            # Wynik z pamięci podręcznej odświeża stan wiersza w metrykach, raporcie i wysyłce
+            result = cached_result(entry, result_cache, cache_mode)
+            if result is not None:
+                registry.observe(result, time.time())
+                results.append(result)
+                if on_result is not None:
+                    on_result(result)
+                continue
+            dns_ms, dns_warning = check_dns(entry, logging.WARNING)
+            result = probe_entry(entry, args.timeout, args.tcp_ping, probe_source(entry, local_ip_set),
+                                 app_prober, args.happy_eyeballs)._replace(dns_ms=dns_ms)
+            if result_cache is not None:
+                result_cache.record(entry, result)
+            registry.observe(result, time.time(), dns_warning is None)
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+
+        duration = time.monotonic() - cycle_start
+        registry.end_cycle(duration, time.time())
+        if app_prober is not None:
+            # Połączenia keep-alive nie przetrwają przerwy między cyklami; sesje TLS są zachowywane
+            app_prober.close()
+        failed = sum(1 for result in results if result.outcome != "success")
+        cached_count = sum(1 for result in results if result.cached)
+        logger.info(f"Cykl zakończony w {duration:.1f} s: {len(results)} wyników "
+                    f"(z pamięci podręcznej: {cached_count}), nieudanych: {failed}")
+        if duration > args.interval:
+            logger.warning(f"Cykl trwał dłużej niż --interval ({duration:.1f} s > {args.interval:g} s)")
+
+        if args.report_url and results:
+            submit_results(args.report_url, build_result_records(results, policy_id, local_fqdn), args.spool_dir)
+
+        remaining = args.interval - (time.monotonic() - cycle_start)
+        if remaining > 0:
+            time.sleep(remaining)
+
 if __name__ == "__main__":
+    # Wymagane w programie z PyInstallera, aby procesy robocze (--workers) nie uruchamiały main
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()
+    report_writer = None
     try:
-        # Inicjalizacja loggera
-        logger = setup_logger(sys.argv[0])
-        logger.info("Uruchamianie programu...")
-        
+        startup = StartupProfile()
+        startup.mark("importy")
+
         # Parsowanie argumentów wiersza poleceń
         parser = setup_argument_parser()
         args = parser.parse_args()
-        logger.debug(f"Argumenty wiersza poleceń: {args}")
+        if args.daemon and daemon_unsupported_options(args):
+            parser.error(f"tryb --daemon testuje wiersze kolejno co --interval i nie obsługuje: "
+                         f"{', '.join(daemon_unsupported_options(args))}")
+
+        # Inicjalizacja loggera
+        logger = setup_logger(sys.argv[0], getattr(logging, args.log_level), args.event_log)
+        logger.info("Uruchamianie programu...")
+        logger.debug("Argumenty wiersza poleceń: %s", args)
+        startup.mark("argumenty i logger")
 
-        # Pobieranie informacji o hoście lokalnym
-        local_fqdn = get_fqdn()
+        # Pobieranie informacji o hoście lokalnym - FQDN ustalany w tle, równolegle z wczytywaniem polityki
+        fqdn_lookup = FqdnLookup(args.fqdn_timeout)
         local_ips = get_all_local_ips()
-        
+        startup.mark("adresy lokalne")
+
+        # Wczytywanie danych i testowanie połączeń
+        logger.info("Wczytywanie danych klienta...")
+        client_data = load_client_data(args.config, local_ips, fqdn_lookup, args.full_policy)
+        startup.mark("wczytanie polityki")
+        local_fqdn = fqdn_lookup()
+        startup.mark("oczekiwanie na FQDN")
+
         logger.info(f"Uruchamiany program na hoście:")
         logger.info(f"FQDN: {local_fqdn}")
         logger.info(f"IP: {', '.join(local_ips)}")
 
-        # Wczytywanie danych i testowanie połączeń
-        logger.info("Wczytywanie danych klienta...")
-        client_data = load_client_data(args.config)
+        # Pamięć podręczna wyników (opcjonalna)
+        result_cache = None
+        cache_mode = "ttl"
+        if args.cache:
+            from result_cache import ResultCache, MODE_TTL, MODE_FRESH, MODE_ONLY_FAILED
+            cache_mode = MODE_FRESH if args.fresh else MODE_ONLY_FAILED if args.only_failed else MODE_TTL
+            result_cache = ResultCache(args.cache, args.cache_ttl_success, args.cache_ttl_failed)
+            startup.mark("pamięć podręczna")
+        if args.startup_profile:
+            startup.show()
+
+        app_probes = None
+        if args.app_probes or args.app_probe_port:
+            from app_probe import port_probes
+            try:
+                app_probes = port_probes(args.app_probe_port)
+            except ValueError as e:
+                parser.error(str(e))
+        app_prober = create_app_prober(app_probes)
+
+        # Raport maszynowy (opcjonalny) - wyniki zapisywane strumieniowo, zaraz po każdym teście
+        on_result = None
+        if args.report_file:
+            from report_writer import open_report_writer
+            report_writer = open_report_writer(args.report_format, args.report_file)
+            on_result = report_writer.write
+
+        if args.daemon:
+            run_daemon(args, client_data, local_ips, local_fqdn, result_cache, cache_mode, app_prober, on_result)
+
         # Przekazujemy parametr debug do funkcji test_connections
-        results, stats = test_connections(client_data, local_ips, local_fqdn, args.debug)
-        show_results(results, stats, args.debug)
+        scheduler_options = (args.concurrency, args.rate, args.max_per_host, args.max_per_subnet)
+        unreachable_hosts = precheck_unreachable_hosts(args, client_data, local_ips, local_fqdn)
+        if args.workers > 1:
+            results, stats = test_connections_parallel(client_data, local_ips, local_fqdn, args.workers, args.debug,
+                                                       result_cache, cache_mode, args.timeout, args.tcp_ping,
+                                                       scheduler_options, unreachable_hosts, app_probes, on_result,
+                                                       args.happy_eyeballs)
+        else:
+            results, stats = test_connections(client_data, local_ips, local_fqdn, args.debug,
+                                              result_cache, cache_mode, args.timeout, args.tcp_ping,
+                                              scheduler=create_scheduler(*scheduler_options),
+                                              on_result=on_result, unreachable_hosts=unreachable_hosts,
+                                              app_prober=app_prober, happy_eyeballs=args.happy_eyeballs)
+        if app_prober is not None:
+            app_prober.close()
+        if result_cache is not None:
+            result_cache.close()
+        if report_writer is not None:
+            report_writer.close()
+            logger.info(f"Zapisano raport {args.report_format}: {args.report_file} ({report_writer.count} wyników)")
+        show_results(results, stats, args.debug, args.slowest)
+        if args.trace_failed:
+            trace_failed_flows(results, args.trace_max_hops, args.trace_timeout)
+
+        if args.report_url:
+            records = build_result_records(results, get_policy_id(args.config), local_fqdn)
+            submit_results(args.report_url, records, args.spool_dir)
 
     except KeyboardInterrupt:
         logger.info("Program zakończony przez użytkownika")
@@ -435,3 +1535,7 @@ if __name__ == "__main__":
             logger.error("Szczegóły błędu:")
             logger.error(traceback.format_exc())
         sys.exit(1)
+    finally:
+        # Przerwane uruchomienie: raport zawiera wyniki testów wykonanych do tej chwili
+        if report_writer is not None:
+            report_writer.close()
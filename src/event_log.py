@@ -0,0 +1,90 @@
+"""
+Logowanie zdarzeń klienta o niskim narzucie.
+
+Rekordy z gorącej pętli trafiają do kolejki bez formatowania - tekst komunikatu
+(szablon %-style + argumenty) i zapis do plików wykonuje wątek w tle (QueueListener).
+Zdarzenia strukturalne (log_event) niosą nazwę zdarzenia i pola, które NdjsonFormatter
+zapisuje jako jedną linię JSON. Gdy poziom zdarzenia nie jest włączony, log_event
+kończy się na jednym sprawdzeniu isEnabledFor.
+"""
+import json
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler, który nie formatuje rekordu w wątku wywołującym.
+    Argumenty komunikatów muszą być niemutowalne (napisy, liczby) - są formatowane później.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class NdjsonFormatter(logging.Formatter):
+    """Formatuje rekord jako jedną linię JSON: czas, poziom, zdarzenie, komunikat i pola zdarzenia."""
+
+    def format(self, record):
+        event = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "event": getattr(record, "event", "log"),
+            "msg": record.getMessage(),
+        }
+        event.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            event["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            event["exc"] = record.exc_text
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+class BufferingHandler(logging.Handler):
+    """
+    Zbiera rekordy przygotowane do przesłania do innego procesu (komunikat sformatowany,
+    bez exc_info). Proces nadrzędny przekazuje je do własnych handlerów przez logger.handle().
+    """
+
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(level)
+        self.records = []
+
+    def emit(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.msg = record.getMessage()
+        record.args = None
+        self.records.append(record)
+
+    def drain(self):
+        records, self.records = self.records, []
+        return records
+
+
+def start_background_handlers(logger, handlers, level):
+    """
+    Podłącza handlery do loggera przez kolejkę obsługiwaną w wątku w tle.
+    Kolejka jest opróżniana przy zakończeniu programu. Zwraca QueueListener.
+    """
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.setLevel(level)
+    logger.addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def log_event(logger, level, event, msg, *args, **fields):
+    """
+    Zapisuje zdarzenie strukturalne. Komunikat jest szablonem %-style formatowanym
+    dopiero przy zapisie; przy wyłączonym poziomie nic nie jest budowane.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, msg, *args, extra={"event": event, "fields": fields})
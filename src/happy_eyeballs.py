@@ -0,0 +1,108 @@
+"""
+Wyścig połączeń IPv6/IPv4 dla wierszy z dst_fqdn (opcja --happy-eyeballs, RFC 8305).
+
+Adresy nazwy są ustawiane naprzemiennie według rodziny, zaczynając od IPv6. Kolejne
+próby startują co CONNECTION_ATTEMPT_DELAY (albo od razu po błędzie poprzedniej),
+pierwsze nawiązane połączenie wygrywa, a pozostałe próby są przerywane (zamykane).
+Test nazwy dostępnej w obu rodzinach trwa więc tyle, ile najszybsze połączenie,
+a nie sumę testów IPv4 i IPv6.
+"""
+import os
+import time
+import errno
+import socket
+import selectors
+
+# Odstęp między startem kolejnych prób (RFC 8305, "Connection Attempt Delay")
+CONNECTION_ATTEMPT_DELAY = 0.25
+
+# connect_ex w toku: Linux/macOS EINPROGRESS, Windows WSAEWOULDBLOCK
+IN_PROGRESS = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN, getattr(errno, "WSAEWOULDBLOCK", 10035)}
+
+
+def address_family(ip):
+    return socket.AF_INET6 if ":" in ip else socket.AF_INET
+
+
+def interleave_families(addresses):
+    """Kolejność prób: IPv6 i IPv4 naprzemiennie, zaczynając od IPv6 (RFC 8305, sekcja 4)"""
+    v6 = [ip for ip in addresses if ":" in ip]
+    v4 = [ip for ip in addresses if ":" not in ip]
+    ordered = []
+    for pair in zip(v6, v4):
+        ordered.extend(pair)
+    shorter = min(len(v6), len(v4))
+    return ordered + v6[shorter:] + v4[shorter:]
+
+
+def _start_attempt(ip, port, source_ip):
+    sock = socket.socket(address_family(ip), socket.SOCK_STREAM)
+    try:
+        sock.setblocking(False)
+        if source_ip:
+            sock.bind((source_ip, 0))
+        error = sock.connect_ex((ip, port))
+        if error not in IN_PROGRESS and error != 0:
+            raise OSError(error, f"{ip}: {os.strerror(error)}")
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def race_connect(addresses, port, timeout=5, source_ip=None, attempt_delay=CONNECTION_ATTEMPT_DELAY):
+    """
+    Łączy się z pierwszym adresem, który odpowie. Zwraca (gniazdo, adres) zwycięzcy -
+    gniazdo jest połączone i w trybie blokującym - albo rzuca OSError z ostatnim błędem.
+    source_ip: adres źródłowy; próbowane są wtedy tylko adresy tej samej rodziny.
+    """
+    if source_ip:
+        addresses = [ip for ip in addresses if address_family(ip) == address_family(source_ip)]
+    pending = list(interleave_families(addresses))
+    if not pending:
+        raise OSError(errno.EADDRNOTAVAIL, "brak adresów docelowych dla tej rodziny adresów")
+
+    deadline = time.monotonic() + timeout
+    selector = selectors.DefaultSelector()
+    attempts = {}
+    last_error = None
+    try:
+        next_start = time.monotonic()
+        while pending or attempts:
+            now = time.monotonic()
+            if now >= deadline:
+                raise socket.timeout("timed out")
+            # Kolejna próba: po upływie odstępu albo od razu, gdy żadna nie jest w toku
+            if pending and (now >= next_start or not attempts):
+                ip = pending.pop(0)
+                try:
+                    sock = _start_attempt(ip, port, source_ip)
+                except OSError as e:
+                    last_error = e
+                    continue
+                attempts[sock] = ip
+                selector.register(sock, selectors.EVENT_WRITE)
+                next_start = now + attempt_delay
+                continue
+
+            wait = deadline - now
+            if pending:
+                wait = min(wait, max(0.0, next_start - now))
+            for key, _ in selector.select(wait):
+                sock = key.fileobj
+                ip = attempts.pop(sock)
+                selector.unregister(sock)
+                error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if error == 0:
+                    sock.setblocking(True)
+                    return sock, ip
+                sock.close()
+                last_error = OSError(error, f"{ip}: {os.strerror(error)}")
+                # Błąd próby - następna startuje od razu
+                next_start = time.monotonic()
+        raise last_error or OSError(errno.ECONNREFUSED, "wszystkie próby połączenia nieudane")
+    finally:
+        # Przegrane próby są przerywane
+        for sock in attempts:
+            sock.close()
+        selector.close()
@@ -0,0 +1,91 @@
+"""
+Wstępne sprawdzenie osiągalności hostów docelowych (opcja --precheck).
+
+Dla każdego adresu docelowego równolegle: ping ICMP i połączenie TCP do kilku portów
+z polityki (odpowiedź RST też oznacza, że host żyje). Tablica sąsiadów (ARP) jest
+używana jako podpowiedź: kompletny wpis oznacza, że host w lokalnej podsieci odpowiada,
+więc nie trzeba go sprawdzać. Host, dla którego żaden test nie dał odpowiedzi, jest
+uznawany za nieosiągalny, a wszystkie jego wiersze dostają od razu status HOST_UNREACHABLE
+zamiast czekać na limit czasu każdego portu osobno (patrz client.py).
+"""
+import socket
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+# Ile portów TCP z polityki sprawdzać na jeden host
+PORTS_PER_HOST = 3
+
+# Flagi wpisu w /proc/net/arp
+ATF_COMPLETE = 0x2
+
+
+def read_neighbor_table(path="/proc/net/arp"):
+    """
+    Zwraca {adres IP: True/False} - czy wpis ARP jest kompletny (host odpowiedział).
+    Na systemach bez /proc/net/arp zwraca pusty słownik (brak podpowiedzi).
+    """
+    neighbors = {}
+    try:
+        with open(path, mode="r", encoding="ascii") as file:
+            next(file, None)
+            for line in file:
+                fields = line.split()
+                if len(fields) >= 4:
+                    neighbors[fields[0]] = bool(int(fields[2], 16) & ATF_COMPLETE) and fields[3] != "00:00:00:00:00:00"
+    except (OSError, ValueError):
+        pass
+    return neighbors
+
+
+def tcp_alive(ip, port, timeout):
+    """True, jeśli host odpowiedział na SYN - połączeniem albo odmową (RST)"""
+    try:
+        with socket.create_connection((ip, int(port)), timeout=timeout):
+            return True
+    except ConnectionRefusedError:
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+def precheck_hosts(targets, timeout=2.0, ping=None, concurrency=64):
+    """
+    targets: {adres docelowy: lista portów TCP z polityki}.
+    ping: funkcja ping(ip) -> bool (np. test_ping klienta) lub None.
+    Zwraca {adres: (czy host żyje, uzasadnienie)}.
+    """
+    logger = logging.getLogger('NetworkTester')
+    neighbors = read_neighbor_table()
+    verdicts = {}
+    checks = {}
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="precheck") as executor:
+        for ip, ports in targets.items():
+            if neighbors.get(ip):
+                verdicts[ip] = (True, "ARP")
+                continue
+            host_checks = []
+            if ping is not None:
+                host_checks.append(("ICMP", executor.submit(ping, ip)))
+            for port in list(dict.fromkeys(ports))[:PORTS_PER_HOST]:
+                host_checks.append((f"TCP/{port}", executor.submit(tcp_alive, ip, port, timeout)))
+            checks[ip] = host_checks
+
+        for ip, host_checks in checks.items():
+            responded = [name for name, future in host_checks if future.result()]
+            if responded:
+                verdicts[ip] = (True, ", ".join(responded))
+            elif host_checks:
+                hint = ", ARP: brak odpowiedzi" if ip in neighbors else ""
+                verdicts[ip] = (False, f"brak odpowiedzi: {', '.join(name for name, _ in host_checks)}{hint}")
+            else:
+                verdicts[ip] = (True, "brak testów")
+
+    dead = sum(1 for alive, _ in verdicts.values() if not alive)
+    logger.info(f"Sprawdzenie wstępne: {len(verdicts)} hostów docelowych, nieosiągalnych: {dead}")
+    for ip, (alive, reason) in sorted(verdicts.items()):
+        if not alive:
+            logger.warning(f"Host {ip} nieosiągalny ({reason})")
+        else:
+            logger.debug("Host %s osiągalny (%s)", ip, reason)
+    return verdicts
@@ -0,0 +1,169 @@
+"""
+Szybkie wyznaczanie lokalnych adresów IP bez importu psutil.
+
+Linux/macOS: getifaddrs() z libc przez ctypes, Windows: GetAdaptersAddresses()
+z biblioteki IP Helper (iphlpapi). Jeśli wywołanie systemowe nie jest dostępne,
+używany jest psutil (o ile jest zainstalowany), a w ostateczności adresy
+nazwy hosta z resolvera.
+"""
+import sys
+import socket
+import struct
+import logging
+
+# Flagi GetAdaptersAddresses: pomiń adresy anycast, multicast i serwery DNS
+GAA_FLAG_SKIP_ANYCAST = 0x0002
+GAA_FLAG_SKIP_MULTICAST = 0x0004
+GAA_FLAG_SKIP_DNS_SERVER = 0x0008
+ERROR_BUFFER_OVERFLOW = 111
+
+
+def _sockaddr_to_ip(data, bsd_layout):
+    """
+    Zamienia bajty struktury sockaddr na (rodzina, adres). Zwraca None dla innych rodzin.
+    BSD/macOS: sa_len (1 bajt) + sa_family (1 bajt), Linux/Windows: sa_family (2 bajty).
+    """
+    if bsd_layout:
+        family = data[1]
+    else:
+        family = struct.unpack("=H", data[:2])[0]
+    if family == socket.AF_INET:
+        return socket.AF_INET, socket.inet_ntop(socket.AF_INET, data[4:8])
+    if family == socket.AF_INET6:
+        return socket.AF_INET6, socket.inet_ntop(socket.AF_INET6, data[8:24])
+    return None
+
+
+def _getifaddrs_addresses():
+    import ctypes
+
+    class ifaddrs(ctypes.Structure):
+        pass
+
+    # Wspólny początek struktury ifaddrs na Linux i BSD/macOS
+    ifaddrs._fields_ = [
+        ("ifa_next", ctypes.POINTER(ifaddrs)),
+        ("ifa_name", ctypes.c_char_p),
+        ("ifa_flags", ctypes.c_uint),
+        ("ifa_addr", ctypes.c_void_p),
+    ]
+
+    # Symbole libc z przestrzeni procesu - bez find_library(), które uruchamia ldconfig
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.getifaddrs.argtypes = [ctypes.POINTER(ctypes.POINTER(ifaddrs))]
+    libc.freeifaddrs.argtypes = [ctypes.POINTER(ifaddrs)]
+
+    head = ctypes.POINTER(ifaddrs)()
+    if libc.getifaddrs(ctypes.byref(head)) != 0:
+        raise OSError(ctypes.get_errno(), "getifaddrs() nie powiodło się")
+
+    bsd_layout = sys.platform != "linux"
+    addresses = []
+    try:
+        node = head
+        while node:
+            if node.contents.ifa_addr:
+                address = _sockaddr_to_ip(ctypes.string_at(node.contents.ifa_addr, 24), bsd_layout)
+                if address is not None:
+                    addresses.append(address)
+            node = node.contents.ifa_next
+    finally:
+        libc.freeifaddrs(head)
+    return addresses
+
+
+def _windows_adapter_addresses():
+    import ctypes
+    from ctypes import wintypes
+
+    class SOCKET_ADDRESS(ctypes.Structure):
+        _fields_ = [("lpSockaddr", ctypes.c_void_p), ("iSockaddrLength", ctypes.c_int)]
+
+    class IP_ADAPTER_UNICAST_ADDRESS(ctypes.Structure):
+        pass
+
+    # Tylko początkowe pola struktur - dalsze nie są potrzebne, a dostęp odbywa się przez wskaźniki
+    IP_ADAPTER_UNICAST_ADDRESS._fields_ = [
+        ("Length", wintypes.ULONG),
+        ("Flags", wintypes.DWORD),
+        ("Next", ctypes.POINTER(IP_ADAPTER_UNICAST_ADDRESS)),
+        ("Address", SOCKET_ADDRESS),
+    ]
+
+    class IP_ADAPTER_ADDRESSES(ctypes.Structure):
+        pass
+
+    IP_ADAPTER_ADDRESSES._fields_ = [
+        ("Length", wintypes.ULONG),
+        ("IfIndex", wintypes.DWORD),
+        ("Next", ctypes.POINTER(IP_ADAPTER_ADDRESSES)),
+        ("AdapterName", ctypes.c_char_p),
+        ("FirstUnicastAddress", ctypes.POINTER(IP_ADAPTER_UNICAST_ADDRESS)),
+    ]
+
+    iphlpapi = ctypes.windll.iphlpapi
+    flags = GAA_FLAG_SKIP_ANYCAST | GAA_FLAG_SKIP_MULTICAST | GAA_FLAG_SKIP_DNS_SERVER
+    size = wintypes.ULONG(16 * 1024)
+    for _ in range(3):
+        buffer = ctypes.create_string_buffer(size.value)
+        error = iphlpapi.GetAdaptersAddresses(socket.AF_UNSPEC, flags, None, buffer, ctypes.byref(size))
+        if error != ERROR_BUFFER_OVERFLOW:
+            break
+    if error != 0:
+        raise OSError(error, "GetAdaptersAddresses() nie powiodło się")
+
+    addresses = []
+    adapter = ctypes.cast(buffer, ctypes.POINTER(IP_ADAPTER_ADDRESSES))
+    while adapter:
+        unicast = adapter.contents.FirstUnicastAddress
+        while unicast:
+            sockaddr = unicast.contents.Address
+            if sockaddr.lpSockaddr:
+                length = max(sockaddr.iSockaddrLength, 24)
+                address = _sockaddr_to_ip(ctypes.string_at(sockaddr.lpSockaddr, length), False)
+                if address is not None:
+                    addresses.append(address)
+            unicast = unicast.contents.Next
+        adapter = adapter.contents.Next
+    return addresses
+
+
+def _psutil_addresses():
+    import psutil
+    return [
+        (snic.family, snic.address.split("%")[0])
+        for snics in psutil.net_if_addrs().values()
+        for snic in snics
+        if snic.family in (socket.AF_INET, socket.AF_INET6)
+    ]
+
+
+def _resolver_addresses():
+    addresses = [(socket.AF_INET, "127.0.0.1")]
+    try:
+        for ip in socket.gethostbyname_ex(socket.gethostname())[2]:
+            addresses.append((socket.AF_INET, ip))
+    except OSError:
+        pass
+    return addresses
+
+
+def get_local_addresses(family=socket.AF_INET):
+    """
+    Zwraca listę adresów IP interfejsów lokalnych danej rodziny (bez duplikatów,
+    w kolejności interfejsów). family=None zwraca adresy IPv4 i IPv6.
+    """
+    logger = logging.getLogger('NetworkTester')
+    if sys.platform == "win32":
+        sources = (_windows_adapter_addresses, _psutil_addresses, _resolver_addresses)
+    else:
+        sources = (_getifaddrs_addresses, _psutil_addresses, _resolver_addresses)
+
+    for source in sources:
+        try:
+            addresses = source()
+        except Exception as e:
+            logger.debug("Nie udało się pobrać adresów lokalnych (%s): %s", source.__name__, e)
+            continue
+        return list(dict.fromkeys(ip for ip_family, ip in addresses if family is None or ip_family == family))
+    return []
@@ -0,0 +1,172 @@
+"""
+Metryki trybu ciągłego monitorowania w formacie tekstowym Prometheus.
+
+MetricsRegistry przechowuje bieżący stan każdego wiersza polityki, liczniki testów
+i histogramy czasów połączeń. Aktualizacje są tanie (słowniki pod blokadą),
+a tekst metryk jest budowany dopiero przy odczycie /metrics.
+Serwer HTTP (http.server) działa w wątku w tle.
+"""
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Granice przedziałów histogramu czasu połączenia w sekundach
+LATENCY_BUCKETS_SECONDS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2, 5]
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.row_state = {}      # row -> (etykiety, 1/0, czas ostatniego testu, opóźnienie w s)
+        self.probes = {}         # (protokół, outcome) -> liczba testów
+        self.cached = {}         # (protokół, outcome) -> liczba wyników z pamięci podręcznej
+        self.histograms = {}     # protokół -> [liczności przedziałów..., suma, liczba]
+        self.dns_mismatches = 0
+        self.cycles = 0
+        self.reloads = 0
+        self.policy_rows = 0
+        self.last_cycle_seconds = 0.0
+        self.last_cycle_end = 0.0
+
+    def observe(self, result, timestamp, dns_ok=True):
+        """
+        Zapisuje wynik testu jednego wiersza polityki (ProbeResult). Wynik z pamięci podręcznej
+        odświeża stan wiersza (z ostatnim znanym opóźnieniem), ale nie jest liczony jako wykonany test.
+        Test na ponownie użytym połączeniu keep-alive ma w stanie wiersza czas odpowiedzi
+        i nie trafia do histogramu czasów połączenia.
+        """
+        latency_ms = result.rtt_ms if result.protocol == "UDP" or result.reused else result.connect_ms
+        labels = {"row": result.row, "protocol": result.protocol, "dst_ip": result.ip, "dst_port": result.port}
+        key = (result.protocol, result.outcome)
+        with self.lock:
+            latency = None if latency_ms is None else latency_ms / 1000
+            if result.cached:
+                previous = self.row_state.get(result.row)
+                if latency is None and previous is not None:
+                    latency = previous[3]
+                self.cached[key] = self.cached.get(key, 0) + 1
+            self.row_state[result.row] = (labels, 1 if result.outcome == "success" else 0, timestamp, latency)
+            if result.cached:
+                return
+            self.probes[key] = self.probes.get(key, 0) + 1
+            if not dns_ok:
+                self.dns_mismatches += 1
+            if latency_ms is not None and result.outcome == "success" and not result.reused:
+                histogram = self.histograms.setdefault(result.protocol, [0] * (len(LATENCY_BUCKETS_SECONDS) + 3))
+                histogram[bisect.bisect_left(LATENCY_BUCKETS_SECONDS, latency_ms / 1000)] += 1
+                histogram[-2] += latency_ms / 1000
+                histogram[-1] += 1
+
+    def set_policy(self, rows):
+        """Nowa wersja polityki: zapamiętuje liczbę wierszy i usuwa stan wierszy, których już nie ma"""
+        with self.lock:
+            self.reloads += 1
+            self.policy_rows = len(rows)
+            keep = {int(entry["row"]) for entry in rows}
+            self.row_state = {row: state for row, state in self.row_state.items() if row in keep}
+
+    def end_cycle(self, duration, timestamp):
+        with self.lock:
+            self.cycles += 1
+            self.last_cycle_seconds = duration
+            self.last_cycle_end = timestamp
+
+    def render(self):
+        with self.lock:
+            lines = [
+                "# HELP network_policy_up Wynik ostatniego testu wiersza polityki (1 = połączenie udane).",
+                "# TYPE network_policy_up gauge",
+            ]
+            for row in sorted(self.row_state):
+                labels, up, _, _ = self.row_state[row]
+                lines.append(f"network_policy_up{_labels(**labels)} {up}")
+
+            lines += ["# HELP network_policy_last_probe_timestamp_seconds Czas ostatniego testu wiersza polityki.",
+                      "# TYPE network_policy_last_probe_timestamp_seconds gauge"]
+            for row in sorted(self.row_state):
+                labels, _, timestamp, _ = self.row_state[row]
+                lines.append(f"network_policy_last_probe_timestamp_seconds{_labels(**labels)} {timestamp:.3f}")
+
+            lines += ["# HELP network_policy_latency_seconds Opóźnienie ostatniego testu wiersza polityki.",
+                      "# TYPE network_policy_latency_seconds gauge"]
+            for row in sorted(self.row_state):
+                labels, _, _, latency = self.row_state[row]
+                if latency is not None:
+                    lines.append(f"network_policy_latency_seconds{_labels(**labels)} {latency:.6f}")
+
+            lines += ["# HELP network_policy_probes_total Liczba wykonanych testów.",
+                      "# TYPE network_policy_probes_total counter"]
+            for (protocol, outcome), count in sorted(self.probes.items()):
+                lines.append(f"network_policy_probes_total{_labels(protocol=protocol, outcome=outcome)} {count}")
+
+            lines += ["# HELP network_policy_cached_results_total Liczba wyników wziętych z pamięci podręcznej zamiast testu.",
+                      "# TYPE network_policy_cached_results_total counter"]
+            for (protocol, outcome), count in sorted(self.cached.items()):
+                lines.append(f"network_policy_cached_results_total{_labels(protocol=protocol, outcome=outcome)} {count}")
+
+            lines += ["# HELP network_policy_probe_latency_seconds Czas połączenia (TCP/ICMP) lub odpowiedzi (UDP) udanych testów.",
+                      "# TYPE network_policy_probe_latency_seconds histogram"]
+            for protocol, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS_SECONDS, histogram):
+                    cumulative += count
+                    lines.append(f"network_policy_probe_latency_seconds_bucket{_labels(protocol=protocol, le=bound)} {cumulative}")
+                lines.append(f"network_policy_probe_latency_seconds_bucket{_labels(protocol=protocol, le='+Inf')} {histogram[-1]}")
+                lines.append(f"network_policy_probe_latency_seconds_sum{_labels(protocol=protocol)} {histogram[-2]:.6f}")
+                lines.append(f"network_policy_probe_latency_seconds_count{_labels(protocol=protocol)} {histogram[-1]}")
+
+            lines += [
+                "# HELP network_policy_dns_mismatches_total Liczba niezgodności DNS (dst_fqdn nie wskazuje na dst_ip).",
+                "# TYPE network_policy_dns_mismatches_total counter",
+                f"network_policy_dns_mismatches_total {self.dns_mismatches}",
+                "# HELP network_policy_cycles_total Liczba zakończonych cykli testów.",
+                "# TYPE network_policy_cycles_total counter",
+                f"network_policy_cycles_total {self.cycles}",
+                "# HELP network_policy_reloads_total Liczba wczytań polityki.",
+                "# TYPE network_policy_reloads_total counter",
+                f"network_policy_reloads_total {self.reloads}",
+                "# HELP network_policy_rows Liczba wierszy polityki testowanych przez tego hosta.",
+                "# TYPE network_policy_rows gauge",
+                f"network_policy_rows {self.policy_rows}",
+                "# HELP network_policy_cycle_duration_seconds Czas trwania ostatniego cyklu testów.",
+                "# TYPE network_policy_cycle_duration_seconds gauge",
+                f"network_policy_cycle_duration_seconds {self.last_cycle_seconds:.3f}",
+                "# HELP network_policy_last_cycle_timestamp_seconds Czas zakończenia ostatniego cyklu testów.",
+                "# TYPE network_policy_last_cycle_timestamp_seconds gauge",
+                f"network_policy_last_cycle_timestamp_seconds {self.last_cycle_end:.3f}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(registry, port, address="127.0.0.1"):
+    """Uruchamia endpoint /metrics w wątku w tle i zwraca serwer HTTP"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -0,0 +1,222 @@
+"""
+Śledzenie trasy nieudanych przepływów (opcja --trace-failed, tylko Linux).
+
+Dla każdego nieudanego wiersza TCP/UDP wysyłane są próby tym samym protokołem i na ten
+sam port z ograniczonym TTL (1..max_hops; dla IPv6 limit skoków). Wszystkie próby wszystkich
+przepływów są wysyłane naraz (przy limicie gniazd - kolejnymi rundami w tym samym oknie),
+a komunikaty ICMP (Time Exceeded / Destination Unreachable) odbierane z kolejki błędów gniazd (IP_RECVERR + MSG_ERRQUEUE) - bez surowych gniazd i uprawnień
+administratora. Całość trwa jedno okno czasowe (timeout) niezależnie od liczby przepływów.
+Obsługiwane są cele IPv4 (ICMP) i IPv6 (ICMPv6).
+
+Ostatni odpowiadający węzeł przed celem to najbardziej prawdopodobne miejsce blokady.
+"""
+import sys
+import math
+import time
+import errno
+import select
+import socket
+import struct
+from collections import deque, namedtuple
+
+# Stałe Linux (moduł socket nie zawsze je udostępnia)
+IP_RECVERR = getattr(socket, "IP_RECVERR", 11)
+IPV6_RECVERR = getattr(socket, "IPV6_RECVERR", 25)
+MSG_ERRQUEUE = getattr(socket, "MSG_ERRQUEUE", 0x2000)
+SO_EE_ORIGIN_ICMP = 2
+SO_EE_ORIGIN_ICMP6 = 3
+
+# Maksymalna liczba gniazd otwartych jednocześnie (domyślny limit deskryptorów to zwykle 1024)
+MAX_SOCKETS = 900
+
+ICMP_DEST_UNREACH = 3
+ICMP_TIME_EXCEEDED = 11
+ICMP_PORT_UNREACH = 3
+# Kody "administracyjnie zabronione" (filtr na zaporze)
+ICMP_ADMIN_PROHIBITED = (9, 10, 13)
+
+ICMP6_DEST_UNREACH = 1
+ICMP6_TIME_EXCEEDED = 3
+ICMP6_PORT_UNREACH = 4
+# Kody ICMPv6: zabronione administracyjnie, niezgodne z polityką źródła, trasa odrzucająca
+ICMP6_ADMIN_PROHIBITED = (1, 5, 6)
+
+# struct sock_extended_err + sockaddr_in / sockaddr_in6 nadawcy komunikatu ICMP
+SOCK_EXTENDED_ERR = struct.Struct("=IBBBBII")
+
+# Rodzaje odpowiedzi ICMP/ICMPv6 ujednolicone dla obu rodzin adresów
+HOP = "hop"
+PORT_UNREACHABLE = "port_unreachable"
+PROHIBITED = "prohibited"
+UNREACHABLE = "unreachable"
+
+# Wynik śledzenia jednego przepływu:
+# reached_ttl - TTL, przy którym odpowiedział cel (połączenie, RST lub ICMP port unreachable), None gdy nie odpowiedział,
+# last_hop / last_hop_ttl - ostatni węzeł pośredni, który odpowiedział (Time Exceeded),
+# blocked_by - węzeł, który odesłał ICMP "administracyjnie zabronione",
+# hops - {ttl: adres węzła}
+TraceResult = namedtuple("TraceResult", ["reached_ttl", "last_hop", "last_hop_ttl", "blocked_by", "hops"])
+
+
+def is_supported():
+    return sys.platform == "linux"
+
+
+def _open_probe(protocol, dst_ip, port, ttl, source_ip):
+    sock_type = socket.SOCK_STREAM if protocol == "TCP" else socket.SOCK_DGRAM
+    ipv6 = ":" in dst_ip
+    sock = socket.socket(socket.AF_INET6 if ipv6 else socket.AF_INET, sock_type)
+    try:
+        sock.setblocking(False)
+        if ipv6:
+            sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_UNICAST_HOPS, ttl)
+            sock.setsockopt(socket.IPPROTO_IPV6, IPV6_RECVERR, 1)
+        else:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+            sock.setsockopt(socket.IPPROTO_IP, IP_RECVERR, 1)
+        if source_ip:
+            sock.bind((source_ip, 0))
+        if protocol == "TCP":
+            error = sock.connect_ex((dst_ip, port))
+            if error not in (0, errno.EINPROGRESS):
+                raise OSError(error, errno.errorcode.get(error, str(error)))
+        else:
+            sock.sendto(b"PING", (dst_ip, port))
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def _classify_icmp(origin, icmp_type, code):
+    """Rodzaj odpowiedzi (HOP, PORT_UNREACHABLE, PROHIBITED, UNREACHABLE) albo None"""
+    if origin == SO_EE_ORIGIN_ICMP:
+        time_exceeded, dest_unreach, port_unreach, prohibited = (
+            ICMP_TIME_EXCEEDED, ICMP_DEST_UNREACH, ICMP_PORT_UNREACH, ICMP_ADMIN_PROHIBITED)
+    elif origin == SO_EE_ORIGIN_ICMP6:
+        time_exceeded, dest_unreach, port_unreach, prohibited = (
+            ICMP6_TIME_EXCEEDED, ICMP6_DEST_UNREACH, ICMP6_PORT_UNREACH, ICMP6_ADMIN_PROHIBITED)
+    else:
+        return None
+    if icmp_type == time_exceeded:
+        return HOP
+    if icmp_type == dest_unreach:
+        if code == port_unreach:
+            return PORT_UNREACHABLE
+        return PROHIBITED if code in prohibited else UNREACHABLE
+    return None
+
+
+def _read_icmp_error(sock):
+    """Zwraca (rodzaj odpowiedzi, adres nadawcy) z kolejki błędów gniazda albo None"""
+    try:
+        _, ancdata, _, _ = sock.recvmsg(512, 512, MSG_ERRQUEUE)
+    except (BlockingIOError, InterruptedError):
+        return None
+    except OSError:
+        return None
+    offset = SOCK_EXTENDED_ERR.size
+    for level, kind, data in ancdata:
+        if (level, kind) == (socket.IPPROTO_IP, IP_RECVERR) and len(data) >= offset + 8:
+            offender = socket.inet_ntop(socket.AF_INET, data[offset + 4:offset + 8])
+        elif (level, kind) == (socket.IPPROTO_IPV6, IPV6_RECVERR) and len(data) >= offset + 24:
+            offender = socket.inet_ntop(socket.AF_INET6, data[offset + 8:offset + 24])
+        else:
+            continue
+        _, origin, icmp_type, code, _, _, _ = SOCK_EXTENDED_ERR.unpack_from(data)
+        response = _classify_icmp(origin, icmp_type, code)
+        if response is not None:
+            return response, offender
+    return None
+
+
+def trace_flows(flows, max_hops=30, timeout=3.0, max_sockets=MAX_SOCKETS):
+    """
+    flows: {klucz: (protokół "TCP"/"UDP", dst_ip, port, source_ip lub None)}.
+    Zwraca {klucz: TraceResult}. Całość trwa najwyżej jedno okno timeout: jeśli prób jest więcej
+    niż max_sockets gniazd (limit deskryptorów), są otwierane w kolejności TTL (najpierw TTL 1
+    wszystkich przepływów) w miarę zwalniania gniazd, a każda czeka na odpowiedź timeout / liczba rund.
+    Próby z TTL większym niż TTL, przy którym cel już odpowiedział, są pomijane.
+    """
+    pending = deque((key, ttl) for ttl in range(1, max_hops + 1) for key in flows)
+    rounds = max(1, math.ceil(len(pending) / max_sockets))
+    probe_timeout = timeout / rounds
+    probes = {}        # fd -> (klucz, ttl, gniazdo)
+    expiries = deque()  # (koniec oczekiwania, gniazdo) w kolejności otwarcia
+    failed = set()     # przepływy, dla których nie udało się otworzyć próby
+    state = {key: {"hops": {}, "reached": None, "blocked": None} for key in flows}
+    poller = select.poll()
+
+    def close_probe(fd, sock):
+        poller.unregister(fd)
+        del probes[fd]
+        sock.close()
+
+    try:
+        deadline = time.monotonic() + timeout
+        while pending or probes:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            while pending and len(probes) < max_sockets:
+                key, ttl = pending.popleft()
+                reached = state[key]["reached"]
+                if key in failed or (reached is not None and ttl > reached):
+                    continue
+                protocol, dst_ip, port, source_ip = flows[key]
+                try:
+                    sock = _open_probe(protocol, dst_ip, int(port), ttl, source_ip)
+                except (OSError, ValueError):
+                    failed.add(key)
+                    continue
+                probes[sock.fileno()] = (key, ttl, sock)
+                expiries.append((min(deadline, now + probe_timeout), sock))
+                # TCP: zapis możliwy po nawiązaniu połączenia, UDP: odpowiedź celu; błąd (RST/ICMP) jako POLLERR
+                events = select.POLLERR | (select.POLLOUT if protocol == "TCP" else select.POLLIN)
+                poller.register(sock, events)
+
+            # Zamknięte gniazda (po odpowiedzi) mają fileno() == -1
+            while expiries and expiries[0][1].fileno() == -1:
+                expiries.popleft()
+            if not expiries:
+                continue
+            wait = max(0.0, expiries[0][0] - time.monotonic())
+            for fd, event in poller.poll(wait * 1000):
+                if fd not in probes:
+                    continue
+                key, ttl, sock = probes[fd]
+                flow = state[key]
+                icmp = _read_icmp_error(sock) if event & select.POLLERR else None
+                if icmp is not None:
+                    response, offender = icmp
+                    if response == PORT_UNREACHABLE and offender == flows[key][1]:
+                        flow["reached"] = min(ttl, flow["reached"] or ttl)
+                    else:
+                        flow["hops"][ttl] = offender
+                        if response == PROHIBITED:
+                            flow["blocked"] = offender
+                else:
+                    # TCP: połączenie nawiązane lub odrzucone (RST), UDP: odpowiedź celu - cel osiągnięty przy tym TTL
+                    error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if error == errno.ECONNREFUSED or (error == 0 and not event & select.POLLERR):
+                        flow["reached"] = min(ttl, flow["reached"] or ttl)
+                # Jedna próba na gniazdo - po pierwszej odpowiedzi gniazdo nie jest już potrzebne
+                close_probe(fd, sock)
+
+            # Próby bez odpowiedzi w swoim czasie zwalniają gniazda dla kolejnych
+            now = time.monotonic()
+            while expiries and expiries[0][0] <= now:
+                _, sock = expiries.popleft()
+                if sock.fileno() != -1:
+                    close_probe(sock.fileno(), sock)
+    finally:
+        for _, _, sock in probes.values():
+            sock.close()
+
+    results = {}
+    for key, flow in state.items():
+        reached = flow["reached"]
+        hops = {ttl: address for ttl, address in flow["hops"].items() if reached is None or ttl < reached}
+        last_hop_ttl = max(hops) if hops else None
+        results[key] = TraceResult(reached, hops.get(last_hop_ttl), last_hop_ttl, flow["blocked"], dict(sorted(hops.items())))
+    return results
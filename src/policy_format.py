@@ -0,0 +1,357 @@
+"""
+Skompilowany, binarny format polityki sieciowej (*.npol) wczytywany przez mmap.
+
+Układ pliku (little-endian):
+    nagłówek       HEADER_FORMAT (z identyfikatorem polityki - skrótem źródłowego pliku CSV)
+    tablica napisów  string_count x (offset u32, długość u32) + dane UTF-8
+    rekordy        record_count x RECORD_FORMAT (stała szerokość 64 B)
+    indeks źródeł  posortowane wpisy INDEX_ENTRY_FORMAT (rodzaj klucza, klucz, początek, liczba)
+    listy rekordów u32 - numery rekordów wskazywane przez wpisy indeksu
+
+Adresy IPv4/IPv6 i zakresy portów są zapisane binarnie, FQDN-y, opisy i protokoły
+trafiają do tablicy napisów bez duplikatów. Wartości, których nie da się zapisać
+binarnie bez straty (np. nazwa zamiast adresu), są przechowywane jako napisy,
+więc odczytany rekord zwraca dokładnie te same teksty co plik CSV.
+
+Kompilacja z linii poleceń:
+    python policy_format.py network_policy.csv network_policy.npol
+"""
+import io
+import os
+import csv
+import sys
+import mmap
+import struct
+import hashlib
+import ipaddress
+
+MAGIC = b"NPOL"
+VERSION = 2
+
+HEADER_FORMAT = "<4sHHIIIIIII16s"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+STRING_ENTRY_FORMAT = "<II"
+STRING_ENTRY_SIZE = struct.calcsize(STRING_ENTRY_FORMAT)
+# row, src(kind, addr), src_fqdn, src_port(kind, lo, hi), protocol,
+# dst(kind, addr), dst_fqdn, dst_port(kind, lo, hi), description
+RECORD_FORMAT = "<IB16sIBHHIB16sIBHHI"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+INDEX_ENTRY_FORMAT = "<B16sII"
+INDEX_ENTRY_SIZE = struct.calcsize(INDEX_ENTRY_FORMAT)
+
+# Rodzaje wartości adresów i portów
+KIND_EMPTY = 0
+KIND_WILDCARD = 1
+KIND_STRING = 2
+KIND_IPV4 = 4
+KIND_IPV6 = 6
+KIND_PORT = 3
+
+# Rodzaje kluczy indeksu źródeł
+INDEX_KEY_WILDCARD = 1
+INDEX_KEY_FQDN = 2
+INDEX_KEY_IPV4 = 4
+INDEX_KEY_IPV6 = 6
+
+FIELDS = ("src_ip", "src_fqdn", "src_port", "protocol", "dst_ip", "dst_fqdn", "dst_port", "description", "row")
+
+
+class _StringTable:
+    def __init__(self):
+        self.strings = []
+        self.ids = {}
+
+    def intern(self, value):
+        if value not in self.ids:
+            self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return self.ids[value]
+
+
+def _pack_string_ref(strings, value):
+    return strings.intern(value).to_bytes(4, "little").ljust(16, b"\0")
+
+
+def _encode_address(strings, value):
+    if value == "":
+        return KIND_EMPTY, b"\0" * 16
+    if value == "*":
+        return KIND_WILDCARD, b"\0" * 16
+    try:
+        address = ipaddress.ip_address(value)
+    except ValueError:
+        return KIND_STRING, _pack_string_ref(strings, value)
+    if str(address) != value:
+        # Zapis niekanoniczny (np. wiodące zera) - zachowujemy oryginalny tekst
+        return KIND_STRING, _pack_string_ref(strings, value)
+    if address.version == 4:
+        return KIND_IPV4, address.packed.ljust(16, b"\0")
+    return KIND_IPV6, address.packed
+
+
+def _encode_port(strings, value):
+    if value == "":
+        return KIND_EMPTY, 0, 0
+    if value == "*":
+        return KIND_WILDCARD, 0, 0
+    low, _, high = value.partition("-")
+    try:
+        low_port = int(low)
+        high_port = int(high) if high else low_port
+        if 0 <= low_port <= 0xFFFF and 0 <= high_port <= 0xFFFF:
+            canonical = str(low_port) if not high else f"{low_port}-{high_port}"
+            if canonical == value:
+                return KIND_PORT, low_port, high_port
+    except ValueError:
+        pass
+    index = strings.intern(value)
+    return KIND_STRING, index & 0xFFFF, index >> 16
+
+
+def _fqdn_key(fqdn):
+    return hashlib.md5(fqdn.lower().encode("utf-8")).digest()
+
+
+def _source_keys(record):
+    """Zwraca klucze indeksu źródeł, pod którymi należy znaleźć dany wiersz."""
+    src_ip = record["src_ip"]
+    src_fqdn = record["src_fqdn"]
+    if src_ip == "*" or src_fqdn == "*":
+        return [(INDEX_KEY_WILDCARD, b"\0" * 16)]
+    keys = []
+    try:
+        address = ipaddress.ip_address(src_ip)
+        keys.append((INDEX_KEY_IPV4 if address.version == 4 else INDEX_KEY_IPV6,
+                     address.packed.ljust(16, b"\0")))
+    except ValueError:
+        pass
+    if src_fqdn:
+        keys.append((INDEX_KEY_FQDN, _fqdn_key(src_fqdn)))
+    return keys
+
+
+def policy_id(csv_content):
+    """Identyfikator polityki: początek skrótu SHA-256 pliku CSV (jak utils.policy_id w aplikacji WEB)"""
+    return hashlib.sha256(csv_content).hexdigest()[:16]
+
+
+def compile_policy(rows, output_path, source_policy_id=""):
+    """
+    Kompiluje wiersze polityki (słowniki jak z csv.DictReader) do pliku *.npol.
+    source_policy_id: identyfikator źródłowego pliku CSV (policy_id) zapisywany w nagłówku,
+    aby wyniki testów z polityki skompilowanej trafiały pod tę samą politykę co z CSV.
+    Plik jest zapisywany obok i podmieniany przez os.replace - klient (np. --daemon),
+    który ma starą wersję zmapowaną w pamięci, czyta ją dalej bez zmian.
+    Zwraca liczbę zapisanych rekordów.
+    """
+    strings = _StringTable()
+    records = []
+    postings = {}
+
+    for number, row in enumerate(rows):
+        # Teksty bez zmian (także spacje) - rekord ma zwracać to samo co csv.DictReader
+        row = {field: row.get(field) or "" for field in FIELDS}
+        row_number = int(row["row"]) if row["row"] else number + 1
+        src_kind, src_addr = _encode_address(strings, row["src_ip"])
+        dst_kind, dst_addr = _encode_address(strings, row["dst_ip"])
+        records.append(struct.pack(
+            RECORD_FORMAT,
+            row_number,
+            src_kind, src_addr,
+            strings.intern(row["src_fqdn"]),
+            *_encode_port(strings, row["src_port"]),
+            strings.intern(row["protocol"]),
+            dst_kind, dst_addr,
+            strings.intern(row["dst_fqdn"]),
+            *_encode_port(strings, row["dst_port"]),
+            strings.intern(row["description"]),
+        ))
+        for key in _source_keys(row):
+            postings.setdefault(key, []).append(number)
+
+    encoded = [value.encode("utf-8") for value in strings.strings]
+    string_entries = bytearray()
+    string_data = bytearray()
+    for value in encoded:
+        string_entries += struct.pack(STRING_ENTRY_FORMAT, len(string_data), len(value))
+        string_data += value
+
+    index_entries = bytearray()
+    posting_data = bytearray()
+    for (kind, key) in sorted(postings):
+        numbers = postings[(kind, key)]
+        index_entries += struct.pack(INDEX_ENTRY_FORMAT, kind, key, len(posting_data) // 4, len(numbers))
+        posting_data += struct.pack(f"<{len(numbers)}I", *numbers)
+
+    strings_offset = HEADER_SIZE
+    records_offset = strings_offset + len(string_entries) + len(string_data)
+    index_offset = records_offset + RECORD_SIZE * len(records)
+    postings_offset = index_offset + len(index_entries)
+
+    header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, 0, len(records), len(encoded),
+                         strings_offset, records_offset, index_offset, len(postings), postings_offset,
+                         source_policy_id.encode("ascii"))
+    temp_path = output_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(header)
+        f.write(string_entries)
+        f.write(string_data)
+        f.writelines(records)
+        f.write(index_entries)
+        f.write(posting_data)
+    os.replace(temp_path, output_path)
+    return len(records)
+
+
+class PolicyRecord:
+    """
+    Widok jednego rekordu w pliku zmapowanym w pamięci. Rekord jest rozpakowywany
+    raz, przy pierwszym odczycie pola, a pola są dekodowane dopiero przy odczycie
+    i zwracane jako napisy, tak jak z csv.DictReader.
+    """
+    __slots__ = ("_policy", "_offset", "_values")
+
+    def __init__(self, policy, offset):
+        self._policy = policy
+        self._offset = offset
+        self._values = None
+
+    def __getitem__(self, field):
+        if self._values is None:
+            self._values = struct.unpack_from(RECORD_FORMAT, self._policy._buffer, self._offset)
+        return self._policy._field(self._values, field)
+
+    def get(self, field, default=None):
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return FIELDS
+
+    def __repr__(self):
+        return f"PolicyRecord({dict(self)!r})"
+
+
+# Pozycje pól w krotce zwracanej przez struct.unpack_from(RECORD_FORMAT)
+_FIELD_SLOTS = {
+    "row": 0,
+    "src_ip": 1, "src_fqdn": 3, "src_port": 4, "protocol": 7,
+    "dst_ip": 8, "dst_fqdn": 10, "dst_port": 11, "description": 14,
+}
+
+
+class CompiledPolicy:
+    """Polityka w formacie *.npol otwarta przez mmap (tylko do odczytu)."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, _flags, self.record_count, self.string_count, self._strings_offset,
+         self._records_offset, self._index_offset, self._index_count,
+         self._postings_offset, source_policy_id) = struct.unpack_from(HEADER_FORMAT, self._buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            self._buffer.close()
+            raise ValueError(f"Nieobsługiwany format pliku polityki: {path}")
+        # Identyfikator źródłowego pliku CSV (None, jeśli nie został podany przy kompilacji)
+        self.policy_id = source_policy_id.rstrip(b"\0").decode("ascii") or None
+        self._string_data_offset = self._strings_offset + self.string_count * STRING_ENTRY_SIZE
+        self._string_cache = {}
+
+    def close(self):
+        self._buffer.close()
+
+    def __len__(self):
+        return self.record_count
+
+    def __iter__(self):
+        for number in range(self.record_count):
+            yield PolicyRecord(self, self._records_offset + number * RECORD_SIZE)
+
+    def _string(self, index):
+        value = self._string_cache.get(index)
+        if value is None:
+            offset, length = struct.unpack_from(
+                STRING_ENTRY_FORMAT, self._buffer, self._strings_offset + index * STRING_ENTRY_SIZE)
+            start = self._string_data_offset + offset
+            value = self._buffer[start:start + length].decode("utf-8")
+            self._string_cache[index] = value
+        return value
+
+    def _address(self, kind, payload):
+        if kind == KIND_IPV4:
+            return str(ipaddress.IPv4Address(payload[:4]))
+        if kind == KIND_IPV6:
+            return str(ipaddress.IPv6Address(payload))
+        if kind == KIND_WILDCARD:
+            return "*"
+        if kind == KIND_STRING:
+            return self._string(int.from_bytes(payload[:4], "little"))
+        return ""
+
+    def _port(self, kind, low, high):
+        if kind == KIND_PORT:
+            return str(low) if low == high else f"{low}-{high}"
+        if kind == KIND_WILDCARD:
+            return "*"
+        if kind == KIND_STRING:
+            return self._string(low | (high << 16))
+        return ""
+
+    def _field(self, values, field):
+        slot = _FIELD_SLOTS[field]
+        if field in ("src_ip", "dst_ip"):
+            return self._address(values[slot], values[slot + 1])
+        if field in ("src_port", "dst_port"):
+            return self._port(values[slot], values[slot + 1], values[slot + 2])
+        if field == "row":
+            return str(values[slot])
+        return self._string(values[slot])
+
+    def _postings(self, kind, key):
+        # Wyszukiwanie binarne bezpośrednio w zmapowanym indeksie: pierwsze 17 bajtów
+        # wpisu (rodzaj + klucz) porównywane jako bajty dają kolejność sortowania
+        target = bytes([kind]) + key
+        low, high = 0, self._index_count
+        while low < high:
+            middle = (low + high) // 2
+            start = self._index_offset + middle * INDEX_ENTRY_SIZE
+            if self._buffer[start:start + 17] < target:
+                low = middle + 1
+            else:
+                high = middle
+        start = self._index_offset + low * INDEX_ENTRY_SIZE
+        if low == self._index_count or self._buffer[start:start + 17] != target:
+            return []
+        _, _, first, count = struct.unpack_from(INDEX_ENTRY_FORMAT, self._buffer, start)
+        return struct.unpack_from(f"<{count}I", self._buffer, self._postings_offset + first * 4)
+
+    def select(self, local_ips, local_fqdn):
+        """
+        Zwraca rekordy, których źródłem może być lokalny host (dopasowanie IP, FQDN
+        lub wildcard), korzystając z indeksu źródeł - bez przeglądania całej polityki.
+        """
+        numbers = set(self._postings(INDEX_KEY_WILDCARD, b"\0" * 16))
+        for ip in local_ips:
+            try:
+                address = ipaddress.ip_address(ip)
+            except ValueError:
+                continue
+            kind = INDEX_KEY_IPV4 if address.version == 4 else INDEX_KEY_IPV6
+            numbers.update(self._postings(kind, address.packed.ljust(16, b"\0")))
+        if local_fqdn:
+            numbers.update(self._postings(INDEX_KEY_FQDN, _fqdn_key(local_fqdn)))
+        return [PolicyRecord(self, self._records_offset + number * RECORD_SIZE) for number in sorted(numbers)]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Użycie: python policy_format.py <polityka.csv> <polityka.npol>")
+        sys.exit(2)
+    with open(sys.argv[1], mode="rb") as file:
+        content = file.read()
+    count = compile_policy(csv.DictReader(io.StringIO(content.decode("utf-8"), newline="")), sys.argv[2],
+                           policy_id(content))
+    print(f"[INFO] Skompilowano {count} wierszy polityki do {sys.argv[2]}")
@@ -0,0 +1,173 @@
+"""
+Raporty wyników w formatach maszynowych (opcje --report-format, --report-file).
+
+Każdy wynik jest zapisywany zaraz po zakończeniu testu przez buforowany zapis do pliku
+(pamięć nie rośnie z liczbą wyników). Bufor jest opróżniany co FLUSH_SECONDS, więc
+przerwane uruchomienie zostawia w pliku wyniki wykonanych testów:
+- ndjson: jeden obiekt JSON w linii,
+- csv: nagłówek i jeden wiersz na wynik,
+- junit: XML JUnit (jeden testcase na wiersz polityki) - znaczniki zamykające
+  są dopisywane przy zamknięciu, także po przerwaniu programu (Ctrl+C).
+"""
+import csv
+import json
+import time
+from abc import ABC, abstractmethod
+from xml.sax.saxutils import quoteattr
+
+REPORT_FORMATS = ("ndjson", "junit", "csv")
+
+# Co ile sekund bufor raportu trafia do pliku
+FLUSH_SECONDS = 1.0
+
+REPORT_FIELDS = ["row", "description", "protocol", "dst_ip", "dst_port", "src_ip", "connected_ip", "outcome", "status",
+                 "error_class", "cached", "reused", "dns_ms", "connect_ms", "handshake_ms", "rtt_ms", "ts"]
+
+# Klasy błędów rozpoznawane w opisie statusu (pierwsze dopasowanie wygrywa)
+ERROR_CLASSES = [
+    ("HOST_UNREACHABLE", "host_unreachable"),
+    ("ERROR: TLS:", "tls"),
+    ("ERROR: HTTP:", "http"),
+    ("timed out", "timeout"),
+    ("refused", "refused"),
+    ("reset", "reset"),
+    ("unreachable", "unreachable"),
+    ("no route", "unreachable"),
+    ("name or service", "dns"),
+    ("nodename nor servname", "dns"),
+    ("getaddrinfo", "dns"),
+]
+
+
+def error_class(result):
+    """Klasa błędu wyniku (np. timeout, refused, tls) - pusta dla udanych testów"""
+    if result.outcome == "success":
+        return ""
+    status = result.status.lower()
+    for marker, name in ERROR_CLASSES:
+        if marker.lower() in status:
+            return name
+    return "failed" if result.outcome == "failed" else "error"
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def result_record(result):
+    return {
+        "row": result.row,
+        "description": result.description,
+        "protocol": result.protocol,
+        "dst_ip": result.ip,
+        "dst_port": str(result.port),
+        "src_ip": result.source or "",
+        "connected_ip": result.connected_ip or "",
+        "outcome": result.outcome,
+        "status": result.status,
+        "error_class": error_class(result),
+        "cached": result.cached,
+        "reused": result.reused,
+        "dns_ms": _round(result.dns_ms),
+        "connect_ms": _round(result.connect_ms),
+        "handshake_ms": _round(result.handshake_ms),
+        "rtt_ms": _round(result.rtt_ms),
+        "ts": round(time.time(), 3),
+    }
+
+
+class ReportWriter(ABC):
+    """
+    Wspólna obsługa pliku: buforowany zapis i okresowe opróżnianie bufora.
+    Format definiuje write_record (wymagane) oraz opcjonalnie start i finish.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, mode="w", encoding="utf-8", newline="")
+        self.last_flush = time.monotonic()
+        self.count = 0
+        self.start()
+
+    def start(self):
+        pass
+
+    def finish(self):
+        pass
+
+    @abstractmethod
+    def write_record(self, record):
+        """Zapisuje jeden rekord (słownik z result_record) do pliku"""
+
+    def write(self, result):
+        self.write_record(result_record(result))
+        self.count += 1
+        now = time.monotonic()
+        if now - self.last_flush >= FLUSH_SECONDS:
+            self.file.flush()
+            self.last_flush = now
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.finish()
+        self.file.close()
+
+
+class NdjsonReportWriter(ReportWriter):
+    def write_record(self, record):
+        self.file.write(json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n")
+
+
+class CsvReportWriter(ReportWriter):
+    def start(self):
+        self.writer = csv.DictWriter(self.file, fieldnames=REPORT_FIELDS)
+        self.writer.writeheader()
+
+    def write_record(self, record):
+        self.writer.writerow(record)
+
+
+class JunitReportWriter(ReportWriter):
+    """
+    Liczby testów i błędów nie są znane przed zakończeniem, więc nie ma ich w atrybutach
+    testsuite - narzędzia CI (Jenkins, GitLab) liczą je z elementów testcase.
+    """
+
+    def start(self):
+        self.file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self.file.write('<testsuites name="network-policy">\n<testsuite name="network-policy">\n')
+
+    def write_record(self, record):
+        name = f"row {record['row']}: {record['dst_ip']}:{record['dst_port']} ({record['protocol']})"
+        if record["description"]:
+            name += f" {record['description']}"
+        latency = record["rtt_ms"] if record["protocol"] == "UDP" else record["connect_ms"]
+        seconds = (latency or 0) / 1000
+        self.file.write(f'  <testcase classname={quoteattr(record["protocol"])} name={quoteattr(name)} '
+                        f'time="{seconds:.3f}">\n')
+        properties = {key: record[key] for key in ("src_ip", "connected_ip", "cached", "reused", "dns_ms",
+                                                   "connect_ms", "handshake_ms", "rtt_ms")
+                      if record[key] not in (None, "")}
+        if properties:
+            self.file.write("    <properties>\n")
+            for key, value in properties.items():
+                self.file.write(f"      <property name={quoteattr(key)} value={quoteattr(str(value))}/>\n")
+            self.file.write("    </properties>\n")
+        if record["outcome"] == "failed":
+            self.file.write(f'    <failure type={quoteattr(record["error_class"])} '
+                            f'message={quoteattr(record["status"])}/>\n')
+        elif record["outcome"] != "success":
+            self.file.write(f'    <error type={quoteattr(record["error_class"])} '
+                            f'message={quoteattr(record["status"])}/>\n')
+        self.file.write("  </testcase>\n")
+
+    def finish(self):
+        self.file.write("</testsuite>\n</testsuites>\n")
+
+
+WRITERS = {"ndjson": NdjsonReportWriter, "csv": CsvReportWriter, "junit": JunitReportWriter}
+
+
+def open_report_writer(report_format, path):
+    """Otwiera raport w danym formacie; write(wynik) zapisuje ProbeResult, close() kończy plik"""
+    return WRITERS[report_format](path)
@@ -0,0 +1,101 @@
+"""
+Pamięć podręczna wyników testów zapisywana na dysku jako dziennik NDJSON (tylko dopisywanie).
+
+Każda linia to jeden wynik: {"k": klucz, "o": outcome, "s": status, "t": czas}.
+Klucz to (źródłowe IP, dst_ip, dst_port, protokół, src_port). Przy odczycie obowiązuje
+ostatni wpis dla klucza, a niekompletna ostatnia linia (przerwany zapis) jest pomijana,
+więc awaria programu nie uszkadza pamięci podręcznej. Dziennik jest kompaktowany
+przy otwarciu (zapis do pliku tymczasowego i atomowa podmiana), gdy urośnie.
+"""
+import os
+import json
+import time
+import logging
+
+# Tryby użycia pamięci podręcznej
+MODE_TTL = "ttl"                  # pomijaj wiersze, których wynik jest jeszcze ważny (TTL)
+MODE_FRESH = "fresh"              # testuj wszystko, tylko zapisuj wyniki
+MODE_ONLY_FAILED = "only_failed"  # testuj tylko nowe wiersze i te, które ostatnio nie przeszły
+
+# Kompaktowanie, gdy dziennik ma tyle razy więcej linii niż kluczy
+COMPACT_RATIO = 4
+
+
+def cache_key(entry):
+    return "|".join((
+        entry["src_ip"],
+        entry["dst_ip"],
+        entry["dst_port"],
+        entry["protocol"].upper(),
+        entry["src_port"],
+    ))
+
+
+class ResultCache:
+    def __init__(self, path, ttl_success=600, ttl_failed=0):
+        """
+        ttl_success/ttl_failed: czas ważności (s) wyników udanych i nieudanych;
+        0 oznacza, że wyniki z tej klasy nigdy nie są brane z pamięci podręcznej.
+        """
+        self.path = path
+        self.ttl = {"success": ttl_success, "failed": ttl_failed, "error": ttl_failed}
+        self.entries = {}
+        self._load()
+        self._file = open(self.path, mode="a", encoding="utf-8")
+
+    def _load(self):
+        logger = logging.getLogger('NetworkTester')
+        if not os.path.exists(self.path):
+            return
+        lines = 0
+        skipped = 0
+        with open(self.path, mode="r", encoding="utf-8") as file:
+            for line in file:
+                lines += 1
+                try:
+                    record = json.loads(line)
+                    self.entries[record["k"]] = (record["o"], record["s"], record["t"])
+                except (ValueError, KeyError, TypeError):
+                    skipped += 1
+        logger.debug(f"Wczytano pamięć podręczną wyników {self.path}: {len(self.entries)} kluczy, "
+                     f"{lines} linii, pominięto {skipped} uszkodzonych")
+        if lines > COMPACT_RATIO * len(self.entries) + 100 or skipped:
+            self._compact()
+
+    def _compact(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, mode="w", encoding="utf-8") as file:
+            for key, (outcome, status, timestamp) in self.entries.items():
+                file.write(json.dumps({"k": key, "o": outcome, "s": status, "t": timestamp},
+                                      separators=(",", ":"), ensure_ascii=False) + "\n")
+        os.replace(temp_path, self.path)
+
+    def lookup(self, entry, mode=MODE_TTL):
+        """
+        Zwraca (outcome, status) z pamięci podręcznej, jeśli wiersza nie trzeba testować
+        w danym trybie, albo None, jeśli należy go przetestować.
+        """
+        if mode == MODE_FRESH:
+            return None
+        cached = self.entries.get(cache_key(entry))
+        if cached is None:
+            return None
+        outcome, status, timestamp = cached
+        if mode == MODE_ONLY_FAILED:
+            return (outcome, status) if outcome == "success" else None
+        ttl = self.ttl.get(outcome, 0)
+        if ttl > 0 and time.time() - timestamp < ttl:
+            return outcome, status
+        return None
+
+    def record(self, entry, result):
+        """Dopisuje wynik testu do dziennika (jedna linia, zapis natychmiastowy)."""
+        key = cache_key(entry)
+        timestamp = round(time.time(), 3)
+        self.entries[key] = (result.outcome, result.status, timestamp)
+        self._file.write(json.dumps({"k": key, "o": result.outcome, "s": result.status, "t": timestamp},
+                                    separators=(",", ":"), ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,129 @@
+"""
+Harmonogram testów połączeń: równoległe testy z ograniczeniem tempa.
+
+- globalny limit tempa (token bucket, testy/s),
+- limit równoczesnych testów na adres docelowy i na podsieć docelową (/24, /64),
+- przeplatanie round-robin między adresami docelowymi, aby żaden host
+  nie dostawał serii testów pod rząd (np. kolejnych portów).
+
+Dzięki temu równoległe testy nie wyzwalają progów IDS/IPS ani ochrony przed SYN flood
+na zaporach, co dawałoby fałszywe wyniki FAILED.
+"""
+import time
+import ipaddress
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class TokenBucket:
+    """Limit tempa: średnio rate zdarzeń na sekundę, najwyżej burst naraz"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Pobiera jeden żeton, czekając, aż będzie dostępny"""
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                time.sleep((1 - self.tokens) / self.rate)
+
+
+def destination_subnet(ip, prefix_v4=24, prefix_v6=64):
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return ip
+    prefix = prefix_v4 if address.version == 4 else prefix_v6
+    return ipaddress.ip_network(f"{address}/{prefix}", strict=False)
+
+
+class ProbeScheduler:
+    def __init__(self, concurrency=1, rate=0, per_host=1, per_subnet=0):
+        """
+        concurrency: liczba równoczesnych testów (wątków),
+        rate: limit testów na sekundę (0 = bez limitu),
+        per_host / per_subnet: limit równoczesnych testów na adres / podsieć docelową (0 = bez limitu).
+        """
+        self.concurrency = max(1, concurrency)
+        self.bucket = TokenBucket(rate) if rate > 0 else None
+        self.per_host = per_host
+        self.per_subnet = per_subnet
+
+    def _allowed(self, active_hosts, active_subnets, host, subnet):
+        if self.per_host and active_hosts.get(host, 0) >= self.per_host:
+            return False
+        if self.per_subnet and active_subnets.get(subnet, 0) >= self.per_subnet:
+            return False
+        return True
+
+    def run(self, entries, probe, group=None):
+        """
+        Wykonuje probe(entry) dla wszystkich wierszy i zwraca pary (entry, wynik)
+        w kolejności zakończenia testów (generator).
+        group: opcjonalna funkcja entry -> klucz grupy (np. lokalny adres źródłowy). Każda grupa
+        ma własną pulę `concurrency` wątków, a limity na adres i podsieć docelową liczone są
+        osobno w każdej grupie (inna ścieżka sieciowa). Limit tempa jest wspólny.
+        """
+        # Kolejki per adres docelowy, w każdej grupie obsługiwane round-robin
+        queues = {}
+        for entry in entries:
+            key = (group(entry) if group is not None else None, entry["dst_ip"])
+            queues.setdefault(key, deque()).append(entry)
+        rings = {}
+        for key in queues:
+            rings.setdefault(key[0], deque()).append(key)
+        subnets = {key: (key[0], destination_subnet(key[1])) for key in queues}
+
+        active_hosts = {}
+        active_subnets = {}
+        active_groups = {}
+        executors = {}
+        in_flight = {}
+        try:
+            while rings or in_flight:
+                # Uruchom tyle testów, ile pozwalają limity - każdy kolejny z innego adresu docelowego
+                for source, ring in list(rings.items()):
+                    skipped = 0
+                    while ring and active_groups.get(source, 0) < self.concurrency and skipped < len(ring):
+                        key = ring.popleft()
+                        if not self._allowed(active_hosts, active_subnets, key, subnets[key]):
+                            ring.append(key)
+                            skipped += 1
+                            continue
+                        skipped = 0
+                        entry = queues[key].popleft()
+                        if queues[key]:
+                            ring.append(key)
+                        if self.bucket is not None:
+                            self.bucket.acquire()
+                        if source not in executors:
+                            executors[source] = ThreadPoolExecutor(max_workers=self.concurrency,
+                                                                   thread_name_prefix=f"probe-{source or 'default'}")
+                        active_hosts[key] = active_hosts.get(key, 0) + 1
+                        active_subnets[subnets[key]] = active_subnets.get(subnets[key], 0) + 1
+                        active_groups[source] = active_groups.get(source, 0) + 1
+                        in_flight[executors[source].submit(probe, entry)] = (key, entry)
+                    if not ring:
+                        del rings[source]
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, entry = in_flight.pop(future)
+                    active_hosts[key] -= 1
+                    active_subnets[subnets[key]] -= 1
+                    active_groups[key[0]] -= 1
+                    yield entry, future.result()
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
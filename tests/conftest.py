@@ -0,0 +1,11 @@
+# conftest.py
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Moduły WEB i klienta są importowane bez pakietu (jak w kontenerze i w PyInstallerze)
+for directory in ("web", "src"):
+    path = os.path.join(ROOT_DIR, directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
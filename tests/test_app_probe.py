@@ -0,0 +1,46 @@
+# test_app_probe.py
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import client
+from app_probe import AppProber
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_reused_connection_is_recorded(caplog):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = str(server.server_address[1])
+    prober = AppProber({port: "http"})
+    results = []
+    try:
+        for row in (1, 2):
+            entry = {"row": str(row), "protocol": "TCP", "dst_ip": "127.0.0.1", "dst_port": port,
+                     "dst_fqdn": "", "description": f"wiersz {row}"}
+            results.append(client.probe_entry(entry, timeout=2, app_prober=prober))
+    finally:
+        prober.close()
+        server.shutdown()
+        server.server_close()
+
+    cold, warm = results
+    assert cold.outcome == warm.outcome == "success"
+    assert not cold.reused and cold.connect_ms > 0
+    assert warm.reused and warm.connect_ms == 0
+    assert client.result_latency(warm) == warm.rtt_ms
+
+    with caplog.at_level("INFO", logger="NetworkTester"):
+        client.show_latency_summary(results)
+    assert "TCP: n=1 " in caplog.text
+    assert "Połączenia keep-alive użyte ponownie (odpowiedź HTTP): n=1 " in caplog.text
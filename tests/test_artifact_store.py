@@ -0,0 +1,50 @@
+# test_artifact_store.py
+import os
+import time
+
+import utils
+from artifact_store import ArtifactStore
+
+
+def build_artifact(tmp_path, monkeypatch, name):
+    monkeypatch.setattr(utils, "STAGING_DIR", str(tmp_path / "staging"))
+    executable = tmp_path / "check_network_policies_acme"
+    executable.write_bytes(b"\x7fELF" + b"client" * 1000)
+    # Kolejne budowanie tworzy plik wykonywalny na nowo - z inną datą modyfikacji
+    stamp = time.time() - len(os.listdir(tmp_path)) * 3600
+    os.utime(executable, (stamp, stamp))
+    return utils.create_zip_file(str(executable), name, "ACME", "Linux")
+
+
+def test_same_build_shares_one_blob(tmp_path, monkeypatch):
+    store = ArtifactStore(tmp_path / "output", max_bytes=0, ttl_seconds=0)
+
+    first = store.put(build_artifact(tmp_path, monkeypatch, "first.zip"), "first.zip", "key-1")
+    time.sleep(1.1)  # druga sekunda - data generowania nie może zmienić archiwum
+    second = store.put(build_artifact(tmp_path, monkeypatch, "second.zip"), "second.zip", "key-2")
+
+    assert len(os.listdir(store.blobs_dir)) == 1
+    assert os.stat(first).st_ino == os.stat(second).st_ino
+
+
+def test_reupload_under_same_name_drops_previous_blob(tmp_path):
+    store = ArtifactStore(tmp_path / "output", max_bytes=0, ttl_seconds=0)
+
+    for version in range(3):
+        source = tmp_path / f"client_{version}.zip"
+        source.write_bytes(b"policy-%d" % version * 100)
+        path = store.put(str(source), "client_linux.zip", f"key-{version}")
+
+    assert os.listdir(store.blobs_dir) == [store._file_digest(path)]
+    assert open(path, "rb").read() == b"policy-2" * 100
+
+
+def test_reupload_keeps_blob_shared_with_other_name(tmp_path):
+    store = ArtifactStore(tmp_path / "output", max_bytes=0, ttl_seconds=0)
+    for name, content in (("a.zip", b"shared"), ("b.zip", b"shared"), ("a.zip", b"changed")):
+        source = tmp_path / "upload.zip"
+        source.write_bytes(content * 100)
+        store.put(str(source), name)
+
+    assert len(os.listdir(store.blobs_dir)) == 2
+    assert open(store.path_for_download("b.zip"), "rb").read() == b"shared" * 100
@@ -0,0 +1,82 @@
+# test_build_binary.py
+import json
+
+import build_binary
+from build_binary import docker_build_command, pyinstaller_command
+
+
+def make_build_dir(tmp_path, split_by_host=True):
+    (tmp_path / "network_policy.csv").write_text("src_ip,src_fqdn,src_port,protocol,dst_ip,dst_fqdn,dst_port,description\n")
+    if split_by_host:
+        (tmp_path / "policy_index.json").write_text(json.dumps({"version": 1, "any": [], "by_ip": {}, "by_fqdn": {}}))
+        (tmp_path / "policy_slices").mkdir()
+        (tmp_path / "policy_slices" / "slice_any.csv").write_text("")
+    else:
+        (tmp_path / "network_policy.npol").write_bytes(b"NPOL")
+    return tmp_path
+
+
+def test_linux_build_bundles_policy_slices(tmp_path):
+    cmd = pyinstaller_command(make_build_dir(tmp_path), "linux")
+
+    assert "--add-data network_policy.csv:." in cmd
+    assert "--add-data policy_index.json:." in cmd
+    assert "--add-data policy_slices:policy_slices" in cmd
+    assert "network_policy.npol" not in cmd
+    assert cmd.endswith(" client.py")
+
+
+def test_windows_build_bundles_policy_slices(tmp_path):
+    cmd = docker_build_command(make_build_dir(tmp_path), "windows")
+
+    assert "cdrx/pyinstaller-windows:python3" in cmd
+    assert "'network_policy.csv;.'" in cmd[-1]
+    assert "'policy_index.json;.'" in cmd[-1]
+    assert "'policy_slices;policy_slices'" in cmd[-1]
+    assert "network_policy.npol" not in cmd[-1]
+
+
+def test_unsplit_policy_has_no_slices(tmp_path):
+    cmd = pyinstaller_command(make_build_dir(tmp_path, split_by_host=False), "linux")
+
+    assert "network_policy.csv:." in cmd
+    assert "policy_index.json" not in cmd
+    assert "policy_slices" not in cmd
+    assert "--add-data network_policy.npol:." in cmd
+
+
+def run_build(tmp_path, monkeypatch, split_by_host):
+    source_dir = tmp_path / "web"
+    source_dir.mkdir()
+    make_build_dir(source_dir, split_by_host)
+    build_dir = tmp_path / "src"
+    build_dir.mkdir()
+    (build_dir / "network_policy.npol").write_bytes(b"stale")
+    (build_dir / "network_policy.csv").write_text("")
+
+    copy_bundle = build_binary.copy_policy_bundle
+    compiled = []
+    monkeypatch.setattr(build_binary, "BUILD_BASE_DIR", str(build_dir))
+    monkeypatch.setattr(build_binary, "STAGING_DIR", str(tmp_path / "staging"))
+    monkeypatch.setattr(build_binary, "copy_policy_bundle", lambda _, build: copy_bundle(str(source_dir), build))
+    monkeypatch.setattr(build_binary, "compile_policy", compiled.append)
+    monkeypatch.setattr(build_binary, "build_windows", lambda name: None)
+    monkeypatch.setattr(build_binary, "build_linux", lambda name: None)
+
+    build_binary.build_executables("acme")
+    return build_dir, compiled
+
+
+def test_split_build_ships_slices_without_compiled_policy(tmp_path, monkeypatch):
+    build_dir, compiled = run_build(tmp_path, monkeypatch, split_by_host=True)
+
+    assert compiled == []
+    assert not (build_dir / "network_policy.npol").exists()
+    assert (build_dir / "policy_slices" / "slice_any.csv").exists()
+
+
+def test_unsplit_build_compiles_policy(tmp_path, monkeypatch):
+    build_dir, compiled = run_build(tmp_path, monkeypatch, split_by_host=False)
+
+    assert compiled == [str(build_dir)]
+    assert not (build_dir / "policy_index.json").exists()
@@ -0,0 +1,121 @@
+# test_client.py
+import csv
+
+import client
+from policy_format import compile_policy
+
+POLICY = """src_ip,src_fqdn,src_port,protocol,dst_ip,dst_fqdn,dst_port,description
+10.0.0.1,host-a,*,TCP,10.0.1.1,,5432,tylko host-a
+10.0.0.2,host-b,*,TCP,10.0.1.2,,22,tylko host-b
+"""
+
+
+def write_policy(tmp_path):
+    csv_path = tmp_path / "network_policy.csv"
+    csv_path.write_text(POLICY, encoding="utf-8")
+    with open(csv_path, encoding="utf-8") as file:
+        compile_policy(csv.DictReader(file), str(tmp_path / "network_policy.npol"))
+    return str(csv_path)
+
+
+def test_compiled_policy_selects_local_rows(tmp_path):
+    rows = client.load_client_data(write_policy(tmp_path), ["10.0.0.1"], "host-a")
+
+    assert [row["description"] for row in rows] == ["tylko host-a"]
+    assert not isinstance(rows[0], dict)
+
+
+def test_full_policy_reads_csv_next_to_compiled_policy(tmp_path):
+    rows = client.load_client_data(write_policy(tmp_path), ["10.0.0.1"], "host-a", full_policy=True)
+
+    assert [row["description"] for row in rows] == ["tylko host-a", "tylko host-b"]
+    assert all(isinstance(row, dict) for row in rows)
+
+
+class StopDaemon(Exception):
+    pass
+
+
+def test_daemon_rejects_options_it_cannot_honour():
+    parser = client.setup_argument_parser()
+
+    assert client.daemon_unsupported_options(parser.parse_args(["--daemon"])) == []
+    args = parser.parse_args(["--daemon", "--workers", "4", "--concurrency", "8", "--precheck"])
+    assert client.daemon_unsupported_options(args) == ["--workers", "--concurrency", "--precheck"]
+
+
+def test_daemon_emits_cached_results(tmp_path, monkeypatch):
+    from result_cache import ResultCache
+
+    policy = tmp_path / "network_policy.csv"
+    policy.write_text("src_ip,src_fqdn,src_port,protocol,dst_ip,dst_fqdn,dst_port,description\n"
+                      "*,,*,TCP,127.0.0.1,,9,z pamięci podręcznej\n", encoding="utf-8")
+    rows = client.load_client_data(str(policy))
+    cache = ResultCache(str(tmp_path / "cache.ndjson"))
+    cache.record(rows[0], client.make_result(rows[0], "9", "TCP", "SUCCESS", "success"))
+    args = client.setup_argument_parser().parse_args(
+        ["--daemon", "--config", str(policy), "--metrics-port", "0", "--interval", "60"])
+    registries = []
+    emitted = []
+
+    def stop(seconds):
+        raise StopDaemon()
+
+    monkeypatch.setattr(client.time, "sleep", stop)
+    monkeypatch.setattr("metrics.MetricsRegistry.end_cycle", lambda registry, *_: registries.append(registry))
+    try:
+        client.run_daemon(args, rows, ["127.0.0.1"], "host-a", cache, on_result=emitted.append)
+    except StopDaemon:
+        pass
+
+    assert [result.cached for result in emitted] == [True]
+    metrics = registries[0].render()
+    assert 'network_policy_up{row="1",protocol="TCP",dst_ip="127.0.0.1",dst_port="9"} 1' in metrics
+    assert 'network_policy_cached_results_total{protocol="TCP",outcome="success"} 1' in metrics
+    assert "network_policy_probes_total{" not in metrics
+
+
+def test_daemon_and_one_shot_share_dns_check(tmp_path, monkeypatch, capsys):
+    policy = tmp_path / "network_policy.csv"
+    policy.write_text("src_ip,src_fqdn,src_port,protocol,dst_ip,dst_fqdn,dst_port,description\n"
+                      "*,,*,TCP,127.0.0.1,db.test,9,zła nazwa\n", encoding="utf-8")
+    rows = client.load_client_data(str(policy))
+    monkeypatch.setattr(client, "resolve_addresses", lambda hostname: ["10.9.9.9"])
+
+    assert client.verify_dns_resolution(rows[0]) == (False, "db.test rozwiązuje się na 10.9.9.9, oczekiwano 127.0.0.1")
+    assert capsys.readouterr().out == ""
+
+    _, stats = client.test_connections(rows, ["127.0.0.1"], "host-a", timeout=1)
+    assert [warning["error"] for warning in stats["dns_warnings"]] == [
+        "db.test rozwiązuje się na 10.9.9.9, oczekiwano 127.0.0.1"]
+    assert "[WARNING] Ostrzeżenie DNS: db.test" in capsys.readouterr().out
+
+    args = client.setup_argument_parser().parse_args(
+        ["--daemon", "--config", str(policy), "--metrics-port", "0", "--interval", "60", "--timeout", "1"])
+    registries = []
+
+    def stop(seconds):
+        raise StopDaemon()
+
+    monkeypatch.setattr(client.time, "sleep", stop)
+    monkeypatch.setattr("metrics.MetricsRegistry.end_cycle", lambda registry, *_: registries.append(registry))
+    try:
+        client.run_daemon(args, rows, ["127.0.0.1"], "host-a")
+    except StopDaemon:
+        pass
+
+    assert "network_policy_dns_mismatches_total 1" in registries[0].render()
+    assert "[WARNING]" not in capsys.readouterr().out
+
+
+def test_import_defers_mode_specific_modules():
+    import subprocess
+    import sys
+
+    deferred = ("argparse", "ipaddress", "policy_format", "result_cache", "app_probe", "scheduler")
+    code = f"import sys, client; print(','.join(name for name in {deferred!r} if name in sys.modules))"
+    # -S: bez site-packages (jak w pliku z PyInstallera), które same mogą importować np. ipaddress
+    output = subprocess.run([sys.executable, "-S", "-c", code], cwd=client.os.path.dirname(client.__file__),
+                            capture_output=True, text=True, check=True).stdout
+
+    assert output.strip() == ""
@@ -0,0 +1,67 @@
+# test_event_log.py
+import json
+import atexit
+import logging
+
+from event_log import BufferingHandler, NdjsonFormatter, log_event, start_background_handlers
+
+
+class Unformattable:
+    def __str__(self):
+        raise AssertionError("argumenty wyłączonego zdarzenia nie powinny być formatowane")
+
+
+def make_logger(name, level=logging.DEBUG):
+    logger = logging.getLogger(name)
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.setLevel(level)
+    return logger
+
+
+def test_event_is_one_json_line_with_fields():
+    record = logging.LogRecord("NetworkTester", logging.WARNING, __file__, 1, "Ostrzeżenie DNS dla %s: %s",
+                               ("db.test", "brak"), None)
+    record.event = "dns_warning"
+    record.fields = {"row": 7, "fqdn": "db.test"}
+
+    line = NdjsonFormatter().format(record)
+
+    assert "\n" not in line
+    event = json.loads(line)
+    assert event == {"ts": round(record.created, 6), "level": "WARNING", "event": "dns_warning",
+                     "msg": "Ostrzeżenie DNS dla db.test: brak", "row": 7, "fqdn": "db.test"}
+
+
+def test_plain_log_record_has_log_event_name():
+    record = logging.LogRecord("NetworkTester", logging.INFO, __file__, 1, "zwykły wpis", (), None)
+
+    assert json.loads(NdjsonFormatter().format(record))["event"] == "log"
+
+
+def test_disabled_event_is_not_built():
+    logger = make_logger("test_event_log.disabled", logging.INFO)
+    handler = BufferingHandler()
+    logger.addHandler(handler)
+
+    log_event(logger, logging.DEBUG, "probe", "%s", Unformattable(), row=1)
+
+    assert handler.drain() == []
+
+
+def test_background_writer_produces_ndjson_file(tmp_path):
+    logger = make_logger("test_event_log.background")
+    path = tmp_path / "events.ndjson"
+    file_handler = logging.FileHandler(path, encoding="utf-8")
+    file_handler.setFormatter(NdjsonFormatter())
+
+    listener = start_background_handlers(logger, [file_handler], logging.DEBUG)
+    log_event(logger, logging.INFO, "probe", "Test %s:%s", "10.0.0.1", 443, row=3, status="SUCCESS")
+    listener.stop()
+    atexit.unregister(listener.stop)
+    file_handler.close()
+
+    events = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [(event["event"], event["msg"], event["row"], event["status"]) for event in events] == [
+        ("probe", "Test 10.0.0.1:443", 3, "SUCCESS")]
+
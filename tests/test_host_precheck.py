@@ -0,0 +1,62 @@
+# test_host_precheck.py
+import client
+import host_precheck
+
+POLICY = [
+    {"row": "1", "src_ip": "*", "src_fqdn": "", "src_port": "*", "protocol": "TCP",
+     "dst_ip": "10.99.0.1", "dst_fqdn": "", "dst_port": "443", "description": "martwy host"},
+    {"row": "2", "src_ip": "*", "src_fqdn": "", "src_port": "*", "protocol": "ICMP",
+     "dst_ip": "10.99.0.1", "dst_fqdn": "", "dst_port": "*", "description": "martwy host"},
+]
+
+
+def parse_args(*options):
+    return client.setup_argument_parser().parse_args(list(options))
+
+
+def fake_dead_network(monkeypatch):
+    pings = []
+    monkeypatch.setattr(host_precheck, "read_neighbor_table", lambda: {})
+    monkeypatch.setattr(host_precheck, "tcp_alive", lambda ip, port, timeout: False)
+    monkeypatch.setattr(client, "test_ping", lambda ip, source_ip=None, timeout=1: pings.append(timeout) or False)
+    return pings
+
+
+def test_precheck_passes_timeout_to_ping(monkeypatch):
+    pings = fake_dead_network(monkeypatch)
+
+    unreachable = client.precheck_unreachable_hosts(
+        parse_args("--precheck", "--precheck-timeout", "0.5"), POLICY, ["10.0.0.1"], "host-a")
+
+    assert unreachable == {"10.99.0.1"}
+    assert pings == [0.5]
+
+
+def test_force_full_check_skips_precheck(monkeypatch):
+    pings = fake_dead_network(monkeypatch)
+
+    assert client.precheck_unreachable_hosts(
+        parse_args("--precheck", "--force-full-check"), POLICY, ["10.0.0.1"], "host-a") is None
+    assert client.precheck_unreachable_hosts(parse_args(), POLICY, ["10.0.0.1"], "host-a") is None
+    assert pings == []
+
+
+def test_unreachable_host_rows_are_not_probed(monkeypatch):
+    def unexpected_probe(*args, **kwargs):
+        raise AssertionError("wiersz nieosiągalnego hosta nie powinien być testowany")
+
+    monkeypatch.setattr(client, "test_tcp_connection", unexpected_probe)
+    monkeypatch.setattr(client, "test_ping", unexpected_probe)
+
+    results, _ = client.test_connections(POLICY, ["10.0.0.1"], "host-a", unreachable_hosts={"10.99.0.1"})
+
+    assert [(result.row, result.status) for result in results] == [(1, client.HOST_UNREACHABLE),
+                                                                    (2, client.HOST_UNREACHABLE)]
+
+
+def test_ping_uses_given_timeout(monkeypatch):
+    commands = []
+    monkeypatch.setattr(client.os, "system", lambda command: commands.append(command) or 1)
+
+    assert not client.test_ping("10.99.0.1", timeout=2.5)
+    assert " -W 3 " in commands[0] or " -w 2500 " in commands[0]
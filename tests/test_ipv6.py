@@ -0,0 +1,137 @@
+# test_ipv6.py
+import time
+import socket
+
+import pytest
+
+import client
+import happy_eyeballs
+from happy_eyeballs import interleave_families, race_connect
+
+
+def ipv6_loopback_available():
+    try:
+        with socket.socket(socket.AF_INET6) as sock:
+            sock.bind(("::1", 0))
+        return True
+    except OSError:
+        return False
+
+
+needs_ipv6 = pytest.mark.skipif(not ipv6_loopback_available(), reason="brak adresu ::1")
+
+
+def entry(src_ip="*", dst_ip="fd00::2", dst_fqdn=""):
+    return {"row": "1", "src_ip": src_ip, "src_fqdn": "", "src_port": "*", "protocol": "TCP",
+            "dst_ip": dst_ip, "dst_fqdn": dst_fqdn, "dst_port": "443", "description": ""}
+
+
+def test_ipv6_source_matches_in_any_notation():
+    local_ips = ["127.0.0.1", "fd00::1"]
+
+    assert client.should_test_connection(entry("FD00:0000::0001"), local_ips, "host-a")
+    assert client.should_test_connection(entry("fd00::1"), local_ips, "host-a")
+    assert not client.should_test_connection(entry("fd00::3"), local_ips, "host-a")
+    assert client.normalize_ip("2001:DB8:0:0::1") == "2001:db8::1"
+    assert client.normalize_ip("*") == "*"
+
+
+def test_dns_check_accepts_any_resolved_family(monkeypatch):
+    monkeypatch.setattr(client, "resolve_addresses", lambda hostname: ["10.0.0.2", "fd00::2"])
+
+    assert client.verify_dns_resolution(entry(dst_ip="FD00::0002", dst_fqdn="db.test")) == (True, None)
+    assert client.verify_dns_resolution(entry(dst_ip="10.0.0.2", dst_fqdn="db.test")) == (True, None)
+    assert client.verify_dns_resolution(entry(dst_ip="fd00::9", dst_fqdn="db.test"))[0] is False
+
+
+def test_families_are_interleaved_starting_with_ipv6():
+    addresses = ["10.0.0.1", "10.0.0.2", "10.0.0.3", "fd00::1", "fd00::2"]
+
+    assert interleave_families(addresses) == ["fd00::1", "10.0.0.1", "fd00::2", "10.0.0.2", "10.0.0.3"]
+
+
+def hung_listener(family, ip, port=0):
+    """Gniazdo z zapełnioną kolejką accept - kolejne SYN są odrzucane, połączenie wisi"""
+    listener = socket.socket(family)
+    listener.bind((ip, port))
+    listener.listen(0)
+    port = listener.getsockname()[1]
+    fillers = []
+    for _ in range(4):
+        filler = socket.socket(family)
+        filler.setblocking(False)
+        filler.connect_ex((ip, port))
+        fillers.append(filler)
+    time.sleep(0.05)
+    return [listener] + fillers, port
+
+
+@pytest.fixture
+def tracked_sockets(monkeypatch):
+    created = []
+    original = socket.socket
+
+    class TrackedSocket(original):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            created.append(self)
+
+    monkeypatch.setattr(happy_eyeballs.socket, "socket", TrackedSocket)
+    return created
+
+
+@needs_ipv6
+def test_race_falls_back_to_ipv4_and_closes_loser(tracked_sockets):
+    hung, port = hung_listener(socket.AF_INET6, "::1")
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", port))
+        listener.listen(5)
+        before = len(tracked_sockets)
+        started = time.monotonic()
+
+        sock, ip = race_connect(["127.0.0.1", "::1"], port, timeout=2, attempt_delay=0.1)
+        elapsed = time.monotonic() - started
+        attempts = tracked_sockets[before:]
+        assert attempts[0].fileno() == -1
+        sock.close()
+    for item in hung:
+        item.close()
+
+    assert ip == "127.0.0.1"
+    assert 0.1 <= elapsed < 1
+    assert [attempt.family for attempt in attempts] == [socket.AF_INET6, socket.AF_INET]
+
+
+@needs_ipv6
+def test_race_times_out_within_budget(tracked_sockets):
+    hung, port = hung_listener(socket.AF_INET6, "::1")
+    hung += hung_listener(socket.AF_INET, "127.0.0.1", port)[0]
+    before = len(tracked_sockets)
+    started = time.monotonic()
+
+    with pytest.raises(socket.timeout):
+        race_connect(["::1", "127.0.0.1"], port, timeout=0.5, attempt_delay=0.1)
+    elapsed = time.monotonic() - started
+    for item in hung:
+        item.close()
+
+    assert 0.5 <= elapsed < 1
+    assert len(tracked_sockets[before:]) == 2
+    assert all(attempt.fileno() == -1 for attempt in tracked_sockets[before:])
+
+
+def test_race_reports_refusal_without_waiting():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    started = time.monotonic()
+
+    with pytest.raises(OSError):
+        race_connect(["127.0.0.1", "127.0.0.2"], port, timeout=2, attempt_delay=1)
+
+    assert time.monotonic() - started < 0.5
+
+
+def test_race_keeps_to_source_family():
+    with pytest.raises(OSError):
+        race_connect(["fd00::1"], 443, timeout=1, source_ip="127.0.0.1")
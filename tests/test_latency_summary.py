@@ -0,0 +1,62 @@
+# test_latency_summary.py
+import logging
+import socket
+
+import client
+
+
+def entry(row, dst_ip="127.0.0.1", port="9", protocol="TCP"):
+    return {"row": str(row), "src_ip": "*", "src_fqdn": "", "src_port": "*", "protocol": protocol,
+            "dst_ip": dst_ip, "dst_fqdn": "", "dst_port": port, "description": f"wiersz {row}"}
+
+
+def success(row, connect_ms, dst_ip="127.0.0.1"):
+    return client.make_result(entry(row, dst_ip), "9", "TCP", "SUCCESS", "success",
+                              {"connect_ms": connect_ms}, timeout=5)
+
+
+def test_tcp_probe_records_connect_time_and_budget():
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(1)
+        port = str(listener.getsockname()[1])
+
+        result = client.probe_entry(entry(1, port=port), timeout=2)
+
+    assert result.status == "SUCCESS"
+    assert result.connect_ms is not None and 0 <= result.connect_ms < 2000
+    assert result.timeout == 2
+    assert result.rtt_ms is None
+
+
+def test_histogram_buckets_and_percentiles():
+    values = [0.5, 3, 7, 20, 70, 200, 700, 1500, 5000]
+
+    assert client.latency_histogram(values) == [1, 1, 1, 1, 1, 1, 1, 1, 1]
+    assert client.latency_histogram([1, 5]) == [1, 1, 0, 0, 0, 0, 0, 0, 0]
+    assert client.latency_percentile(values, 0.5) == 70
+    assert client.latency_percentile(values, 0.99) == 5000
+
+
+def test_subnet_grouping():
+    assert client.latency_subnet("10.1.2.3") == "10.1.2.0/24"
+    assert client.latency_subnet("fd00::1:2") == "fd00::/64"
+    assert client.latency_subnet("db.example.com") == "db.example.com"
+
+
+def test_summary_groups_by_protocol_subnet_and_lists_slowest(caplog):
+    results = [success(1, 2.0), success(2, 40.0), success(3, 900.0, dst_ip="10.0.5.1"),
+               client.make_result(entry(4), "9", "TCP", "ERROR: timed out", "failed", timeout=5),
+               success(5, 1.0)._replace(cached=True)]
+
+    with caplog.at_level(logging.INFO, logger="NetworkTester"):
+        client.show_latency_summary(results, slowest=1)
+    lines = [record.getMessage() for record in caplog.records]
+
+    assert "  TCP: n=3 p50=40.0 p90=900.0 p99=900.0 max=900.0 ms" in lines
+    subnets = [line.split()[0] for line in lines if line.startswith("    ") and "/24" in line]
+    assert subnets == ["10.0.5.0/24", "127.0.0.0/24"]
+    slowest = lines[lines.index("  Najwolniejsze przepływy (top 1):") + 1:]
+    assert len(slowest) == 1
+    assert "10.0.5.1:9 (TCP) wiersz 3" in slowest[0]
+    assert "połączenie 900.0 ms" in slowest[0] and "limit 5 s" in slowest[0]
@@ -0,0 +1,62 @@
+# test_local_addresses.py
+import sys
+import socket
+import struct
+
+import pytest
+
+import local_addresses
+from local_addresses import _sockaddr_to_ip, get_local_addresses
+
+
+def linux_sockaddr_in(ip):
+    return struct.pack("=HH", socket.AF_INET, 0) + socket.inet_aton(ip) + bytes(16)
+
+
+def linux_sockaddr_in6(ip):
+    return struct.pack("=HHI", socket.AF_INET6, 0, 0) + socket.inet_pton(socket.AF_INET6, ip)
+
+
+def test_linux_sockaddr_parsing():
+    assert _sockaddr_to_ip(linux_sockaddr_in("10.1.2.3"), False) == (socket.AF_INET, "10.1.2.3")
+    assert _sockaddr_to_ip(linux_sockaddr_in6("fd00::1"), False) == (socket.AF_INET6, "fd00::1")
+    # AF_PACKET (adres sprzętowy) i inne rodziny są pomijane
+    assert _sockaddr_to_ip(struct.pack("=H", 17) + bytes(22), False) is None
+
+
+def test_bsd_sockaddr_parsing():
+    # sa_len + sa_family (po jednym bajcie); AF_INET6 na macOS ma wartość 30
+    ipv4 = bytes([16, socket.AF_INET]) + bytes(2) + socket.inet_aton("192.168.1.5") + bytes(16)
+    assert _sockaddr_to_ip(ipv4, True) == (socket.AF_INET, "192.168.1.5")
+    ipv6 = bytes([28, socket.AF_INET6]) + bytes(6) + socket.inet_pton(socket.AF_INET6, "2001:db8::5")
+    assert _sockaddr_to_ip(ipv6, True) == (socket.AF_INET6, "2001:db8::5")
+
+
+def test_family_filter_and_duplicates(monkeypatch):
+    addresses = [(socket.AF_INET, "127.0.0.1"), (socket.AF_INET6, "::1"), (socket.AF_INET, "10.0.0.1"),
+                 (socket.AF_INET, "10.0.0.1")]
+    monkeypatch.setattr(local_addresses.sys, "platform", "linux")
+    monkeypatch.setattr(local_addresses, "_getifaddrs_addresses", lambda: addresses)
+
+    assert get_local_addresses() == ["127.0.0.1", "10.0.0.1"]
+    assert get_local_addresses(socket.AF_INET6) == ["::1"]
+    assert get_local_addresses(None) == ["127.0.0.1", "::1", "10.0.0.1"]
+
+
+def test_falls_back_when_system_call_fails(monkeypatch):
+    def failing():
+        raise OSError("brak getifaddrs")
+
+    monkeypatch.setattr(local_addresses.sys, "platform", "linux")
+    monkeypatch.setattr(local_addresses, "_getifaddrs_addresses", failing)
+    monkeypatch.setattr(local_addresses, "_psutil_addresses", failing)
+    monkeypatch.setattr(local_addresses, "_resolver_addresses", lambda: [(socket.AF_INET, "127.0.0.1")])
+
+    assert get_local_addresses() == ["127.0.0.1"]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="getifaddrs() tylko na Linux/macOS")
+def test_getifaddrs_lists_loopback():
+    addresses = local_addresses._getifaddrs_addresses()
+
+    assert (socket.AF_INET, "127.0.0.1") in addresses
@@ -0,0 +1,40 @@
+# test_path_trace.py
+import socket
+import time
+
+import pytest
+
+import path_trace
+
+pytestmark = pytest.mark.skipif(not path_trace.is_supported(), reason="śledzenie trasy działa tylko na Linux")
+
+
+def test_many_flows_fit_in_one_timeout_window():
+    # Cel, który nigdy nie odpowiada: każda próba czeka do końca swojego czasu
+    silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    silent.bind(("127.0.0.1", 0))
+    port = silent.getsockname()[1]
+    flows = {row: ("UDP", "127.0.0.1", port, None) for row in range(60)}
+    timeout = 0.5
+    try:
+        started = time.monotonic()
+        results = path_trace.trace_flows(flows, max_hops=30, timeout=timeout, max_sockets=100)
+        elapsed = time.monotonic() - started
+    finally:
+        silent.close()
+
+    # 1800 prób przy 100 gniazdach - dawniej osobne okno na każdą partię (ok. 30 x timeout)
+    assert elapsed < timeout + 0.5
+    assert set(results) == set(flows)
+
+
+def test_closed_port_is_reached_at_first_hop():
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+
+    results = path_trace.trace_flows({"udp": ("UDP", "127.0.0.1", port, None)}, max_hops=5, timeout=1.0)
+
+    assert results["udp"].reached_ttl == 1
+    assert results["udp"].hops == {}
@@ -0,0 +1,85 @@
+# test_pipeline_metrics.py
+import pytest
+
+import pipeline_metrics
+from pipeline_metrics import PipelineMetrics, job_stage
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(pipeline_metrics.time, "perf_counter", fake)
+    return fake
+
+
+def test_stages_are_timed_and_accumulated(clock):
+    job = PipelineMetrics().start_job("upload")
+
+    with job.stage("read"):
+        clock.now += 0.25
+    with job_stage(job, "build_linux"):
+        clock.now += 30
+    with job.stage("read"):
+        clock.now += 0.5
+    with job_stage(None, "ignored"):
+        clock.now += 1
+    job.finish("success")
+
+    assert list(job.stages) == ["read", "build_linux"]
+    assert job.as_dict()["stages"] == {"read": 0.75, "build_linux": 30.0}
+    assert job.as_dict()["total_seconds"] == 31.75
+    assert job.server_timing() == "read;dur=750.0, build_linux;dur=30000.0"
+
+
+def test_failed_stage_is_still_recorded(clock):
+    job = PipelineMetrics().start_job("upload")
+
+    with pytest.raises(ValueError):
+        with job.stage("validate"):
+            clock.now += 0.1
+            raise ValueError("zła polityka")
+    job.finish("error")
+    job.finish("success")
+
+    assert job.as_dict()["outcome"] == "error"
+    assert job.as_dict()["stages"] == {"validate": 0.1}
+
+
+def test_jobs_listing_is_newest_first_and_bounded(clock):
+    metrics = PipelineMetrics(recent_jobs=2)
+    jobs = [metrics.start_job("upload") for _ in range(3)]
+    jobs[-1].finish("cached")
+
+    listed = metrics.list_jobs()
+
+    assert [job["job_id"] for job in listed] == [jobs[2].job_id, jobs[1].job_id]
+    assert set(listed[0]) == {"job_id", "kind", "outcome", "started_at", "total_seconds", "stages"}
+    assert listed[0]["outcome"] == "cached"
+    assert listed[1]["outcome"] == "running" and listed[1]["total_seconds"] is None
+    assert metrics.get_job(jobs[0].job_id) is None
+    assert metrics.get_job(jobs[2].job_id) == listed[0]
+
+
+def test_finished_job_feeds_histograms(clock):
+    metrics = PipelineMetrics()
+    job = metrics.start_job("upload")
+    with job.stage("zip"):
+        clock.now += 0.02
+    job.finish("success")
+    metrics.observe_request("POST", "/upload/", 200, 6.0, slow=True)
+
+    text = metrics.render()
+
+    assert 'network_policy_web_stage_duration_seconds_bucket{kind="upload",stage="zip",le="0.05"} 1' in text
+    assert 'network_policy_web_stage_duration_seconds_bucket{kind="upload",stage="zip",le="0.01"} 0' in text
+    assert 'network_policy_web_job_duration_seconds_count{kind="upload",outcome="success"} 1' in text
+    assert 'network_policy_web_request_duration_seconds_bucket{method="POST",route="/upload/",status="200",le="+Inf"} 1' in text
+    assert 'network_policy_web_slow_requests_total{method="POST",route="/upload/"} 1' in text
@@ -0,0 +1,79 @@
+# test_policy_format.py
+import csv
+import sys
+import struct
+import subprocess
+
+import policy_format
+from policy_format import CompiledPolicy, RECORD_FORMAT, compile_policy
+
+POLICY = """src_ip,src_fqdn,src_port,protocol,dst_ip,dst_fqdn,dst_port,description
+10.0.0.1,host-a,*,TCP,10.0.1.1,db.example.com,5432,Baza danych
+*,,*,udp, 10.0.1.2 ,,53, DNS z odstępami 
+fd00::1,host-b,1024-2048,tcp,fd00::2,,443,
+"""
+
+
+def compile_sample(tmp_path):
+    csv_path = tmp_path / "network_policy.csv"
+    csv_path.write_text(POLICY, encoding="utf-8")
+    npol_path = tmp_path / "network_policy.npol"
+    with open(csv_path, encoding="utf-8") as file:
+        compile_policy(csv.DictReader(file), str(npol_path))
+    with open(csv_path, encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))
+    return rows, CompiledPolicy(str(npol_path))
+
+
+def test_records_match_csv_verbatim(tmp_path):
+    rows, policy = compile_sample(tmp_path)
+
+    records = [dict(record) for record in policy]
+
+    for number, (row, record) in enumerate(zip(rows, records), 1):
+        assert record == dict(row, row=str(number))
+    assert records[1]["dst_ip"] == " 10.0.1.2 "
+    assert records[1]["description"] == " DNS z odstępami "
+
+
+def test_record_is_unpacked_once(tmp_path, monkeypatch):
+    _, policy = compile_sample(tmp_path)
+    record = next(iter(policy))
+    calls = []
+    unpack_from = struct.unpack_from
+
+    def counting_unpack_from(fmt, *args):
+        if fmt == RECORD_FORMAT:
+            calls.append(fmt)
+        return unpack_from(fmt, *args)
+
+    monkeypatch.setattr(policy_format.struct, "unpack_from", counting_unpack_from)
+    dict(record)
+    record["dst_port"]
+
+    assert len(calls) == 1
+
+
+def test_compiled_policy_keeps_csv_policy_id(tmp_path):
+    import client
+
+    csv_path = tmp_path / "network_policy.csv"
+    csv_path.write_text(POLICY, encoding="utf-8")
+    npol_path = tmp_path / "network_policy.npol"
+    # Tak jak przy budowaniu w aplikacji WEB (build_binary.compile_policy)
+    subprocess.run([sys.executable, policy_format.__file__, str(csv_path), str(npol_path)], check=True)
+
+    assert client.get_policy_id(str(npol_path)) == client.get_policy_id(str(csv_path))
+    assert client.get_policy_id(str(csv_path)) == policy_format.policy_id(csv_path.read_bytes())
+
+
+def test_recompiling_keeps_mapped_policy_readable(tmp_path):
+    rows, policy = compile_sample(tmp_path)
+    before = [dict(record) for record in policy]
+
+    # Ponowna kompilacja (np. po zmianie polityki w trakcie --daemon) krótszej polityki
+    compile_policy(rows[:1], policy.path)
+
+    assert [dict(record) for record in policy] == before
+    assert len(CompiledPolicy(policy.path)) == 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["network_policy.csv", "network_policy.npol"]
@@ -0,0 +1,31 @@
+# test_report_writer.py
+import json
+
+import pytest
+
+from report_writer import ReportWriter, open_report_writer
+
+
+class IncompleteWriter(ReportWriter):
+    pass
+
+
+def test_incomplete_writer_fails_on_construction(tmp_path):
+    path = tmp_path / "report.txt"
+
+    with pytest.raises(TypeError):
+        IncompleteWriter(str(path))
+    assert not path.exists()
+
+
+def test_ndjson_report_has_one_record_per_result(tmp_path):
+    import client
+
+    entry = {"row": "4", "dst_ip": "10.0.0.1", "description": "opis"}
+    path = tmp_path / "report.ndjson"
+    writer = open_report_writer("ndjson", str(path))
+    writer.write(client.make_result(entry, "443", "TCP", "ERROR: timed out", "failed"))
+    writer.close()
+
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [(record["row"], record["error_class"]) for record in records] == [(4, "timeout")]
@@ -0,0 +1,67 @@
+# test_result_cache.py
+import client
+import result_cache
+from result_cache import ResultCache, MODE_TTL, MODE_FRESH, MODE_ONLY_FAILED
+
+OK_ENTRY = {"row": "1", "src_ip": "*", "src_fqdn": "", "src_port": "*", "protocol": "tcp",
+            "dst_ip": "127.0.0.1", "dst_fqdn": "", "dst_port": "22", "description": ""}
+FAILED_ENTRY = dict(OK_ENTRY, row="2", dst_port="23")
+
+
+def fill_cache(path):
+    cache = ResultCache(str(path), ttl_success=600, ttl_failed=0)
+    cache.record(OK_ENTRY, client.make_result(OK_ENTRY, "22", "TCP", "SUCCESS", "success"))
+    cache.record(FAILED_ENTRY, client.make_result(FAILED_ENTRY, "23", "TCP", "ERROR: refused", "failed"))
+    return cache
+
+
+def test_ttl_per_outcome(tmp_path, monkeypatch):
+    cache = fill_cache(tmp_path / "cache.ndjson")
+
+    assert cache.lookup(OK_ENTRY, MODE_TTL) == ("success", "SUCCESS")
+    # Wyniki nieudane z TTL 0 nigdy nie są brane z pamięci podręcznej
+    assert cache.lookup(FAILED_ENTRY, MODE_TTL) is None
+    assert cache.lookup(OK_ENTRY, MODE_FRESH) is None
+
+    now = result_cache.time.time()
+    monkeypatch.setattr(result_cache.time, "time", lambda: now + 601)
+    assert cache.lookup(OK_ENTRY, MODE_TTL) is None
+
+
+def test_only_failed_reuses_successes_regardless_of_ttl(tmp_path, monkeypatch):
+    cache = fill_cache(tmp_path / "cache.ndjson")
+    now = result_cache.time.time()
+    monkeypatch.setattr(result_cache.time, "time", lambda: now + 86400)
+
+    assert cache.lookup(OK_ENTRY, MODE_ONLY_FAILED) == ("success", "SUCCESS")
+    assert cache.lookup(FAILED_ENTRY, MODE_ONLY_FAILED) is None
+    assert cache.lookup(dict(OK_ENTRY, dst_port="24"), MODE_ONLY_FAILED) is None
+
+
+def test_only_failed_run_probes_only_failed_rows(tmp_path, monkeypatch):
+    cache = fill_cache(tmp_path / "cache.ndjson")
+    probed = []
+
+    def fake_probe(entry, *args, **kwargs):
+        probed.append(entry["row"])
+        return client.make_result(entry, entry["dst_port"], "TCP", "SUCCESS", "success")
+
+    monkeypatch.setattr(client, "probe_entry", fake_probe)
+    results, stats = client.test_connections([OK_ENTRY, FAILED_ENTRY], ["127.0.0.1"], "host-a",
+                                             result_cache=cache, cache_mode=MODE_ONLY_FAILED)
+
+    assert probed == ["2"]
+    assert [(result.row, result.cached) for result in results] == [(1, True), (2, False)]
+    assert cache.lookup(FAILED_ENTRY, MODE_ONLY_FAILED) == ("success", "SUCCESS")
+
+
+def test_torn_last_line_is_skipped_and_compacted(tmp_path):
+    path = tmp_path / "cache.ndjson"
+    fill_cache(path).close()
+    with open(path, "a", encoding="utf-8") as file:
+        file.write('{"k":"*|127.0.0.1|24|TCP|*","o":"succ')
+
+    cache = ResultCache(str(path), ttl_success=600)
+
+    assert cache.lookup(OK_ENTRY) == ("success", "SUCCESS")
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 2
@@ -0,0 +1,20 @@
+# test_results_store.py
+from results_store import ResultsStore
+
+RECORD = {
+    "policy": "0123456789abcdef", "row": 3, "src_host": "host-a", "dst_ip": "10.0.1.1", "dst_port": "443",
+    "protocol": "TCP", "src_ip": "10.0.0.1", "status": "SUCCESS", "error": "", "connect_ms": 1.25,
+    "rtt_ms": None, "handshake_ms": 4.5, "connected_ip": "10.0.1.1", "reused": True, "ts": 1700000000.0,
+}
+
+
+def test_client_details_are_persisted(tmp_path):
+    store = ResultsStore(tmp_path / "results.db")
+
+    assert store.add_batch([RECORD]) == 1
+
+    row = store._db.execute(
+        "SELECT src_ip, connected_ip, connect_ms, handshake_ms, rtt_ms, reused FROM results").fetchone()
+    assert row == ("10.0.0.1", "10.0.1.1", 1.25, 4.5, None, 1)
+    assert store.matrix(RECORD["policy"])["totals"]["SUCCESS"] == 1
+
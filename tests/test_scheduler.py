@@ -0,0 +1,100 @@
+# test_scheduler.py
+import time
+import threading
+
+import client
+from scheduler import ProbeScheduler, TokenBucket, destination_subnet
+
+
+def entry(row, dst_ip, port=80):
+    return {"row": str(row), "src_ip": "*", "src_fqdn": "", "src_port": "*", "protocol": "TCP",
+            "dst_ip": dst_ip, "dst_fqdn": "", "dst_port": str(port), "description": ""}
+
+
+class ConcurrencyProbe:
+    """Test zastępczy: zapamiętuje największą liczbę równoczesnych testów per klucz"""
+
+    def __init__(self, key, duration=0.02):
+        self.key = key
+        self.duration = duration
+        self.lock = threading.Lock()
+        self.active = {}
+        self.peak = {}
+        self.started = []
+
+    def __call__(self, entry):
+        key = self.key(entry)
+        with self.lock:
+            self.active[key] = self.active.get(key, 0) + 1
+            self.peak[key] = max(self.peak.get(key, 0), self.active[key])
+            self.started.append(entry["row"])
+        time.sleep(self.duration)
+        with self.lock:
+            self.active[key] -= 1
+        return entry["row"]
+
+
+def test_round_robin_across_destinations():
+    rows = [entry(1, "10.0.1.1"), entry(2, "10.0.1.1"), entry(3, "10.0.1.1"),
+            entry(4, "10.0.2.1"), entry(5, "10.0.2.1")]
+    probe = ConcurrencyProbe(lambda row: row["dst_ip"], duration=0)
+
+    list(ProbeScheduler(concurrency=1, per_host=1).run(rows, probe))
+
+    assert probe.started == ["1", "4", "2", "5", "3"]
+
+
+def test_per_host_cap():
+    rows = [entry(number, f"10.0.{number % 2}.1") for number in range(12)]
+    probe = ConcurrencyProbe(lambda row: row["dst_ip"])
+
+    done = list(ProbeScheduler(concurrency=8, per_host=2, per_subnet=0).run(rows, probe))
+
+    assert len(done) == 12
+    assert probe.peak == {"10.0.0.1": 2, "10.0.1.1": 2}
+
+
+def test_per_subnet_cap():
+    rows = [entry(number, f"10.0.0.{number}") for number in range(1, 9)]
+    rows += [entry(number, f"10.0.9.{number}") for number in range(9, 13)]
+    probe = ConcurrencyProbe(lambda row: str(destination_subnet(row["dst_ip"])))
+
+    list(ProbeScheduler(concurrency=8, per_host=1, per_subnet=3).run(rows, probe))
+
+    assert probe.peak == {"10.0.0.0/24": 3, "10.0.9.0/24": 3}
+
+
+def test_groups_have_separate_pools():
+    rows = [entry(number, f"10.0.{number}.1") for number in range(8)]
+    for row in rows:
+        row["src_ip"] = "192.0.2.1" if int(row["row"]) % 2 else "192.0.2.2"
+    probe = ConcurrencyProbe(lambda row: row["src_ip"])
+
+    list(ProbeScheduler(concurrency=2, per_host=1).run(rows, probe, group=lambda row: row["src_ip"]))
+
+    assert probe.peak == {"192.0.2.1": 2, "192.0.2.2": 2}
+
+
+def test_token_bucket_paces_probes():
+    bucket = TokenBucket(rate=50)
+    started = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+
+    # Pierwszy żeton od razu, kolejne co 1/50 s
+    assert time.monotonic() - started >= 5 / 50 * 0.9
+
+
+def test_scheduled_results_keep_policy_order(monkeypatch):
+    rows = [entry(number, f"10.0.{number % 3}.1") for number in range(1, 10)]
+
+    def fake_probe(row, *args, **kwargs):
+        time.sleep(0.001 * (10 - int(row["row"])))
+        return client.make_result(row, row["dst_port"], "TCP", "SUCCESS", "success")
+
+    monkeypatch.setattr(client, "probe_entry", fake_probe)
+    results, stats = client.test_connections(rows, ["127.0.0.1"], "host-a",
+                                             scheduler=client.create_scheduler(4, 0, 1, 0))
+
+    assert [result.row for result in results] == list(range(1, 10))
+    assert stats["success"] == 9
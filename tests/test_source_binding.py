@@ -0,0 +1,96 @@
+# test_source_binding.py
+import socket
+import threading
+
+import client
+
+LOCAL_IPS = {"127.0.0.1", "127.0.0.2", "fd00::1"}
+
+
+def entry(src_ip, dst_ip="127.0.0.1", port="9", protocol="TCP"):
+    return {"row": "1", "src_ip": src_ip, "src_fqdn": "", "src_port": "*", "protocol": protocol,
+            "dst_ip": dst_ip, "dst_fqdn": "", "dst_port": port, "description": ""}
+
+
+def test_probe_source_only_for_local_addresses():
+    assert client.probe_source(entry("127.0.0.2"), LOCAL_IPS) == "127.0.0.2"
+    assert client.probe_source(entry("FD00:0::1"), LOCAL_IPS) == "fd00::1"
+    assert client.probe_source(entry("10.0.0.1"), LOCAL_IPS) is None
+    assert client.probe_source(entry("*"), LOCAL_IPS) is None
+
+
+def test_tcp_probe_leaves_from_row_source():
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(1)
+        port = str(listener.getsockname()[1])
+        peers = []
+        accepting = threading.Thread(target=lambda: peers.append(listener.accept()[1][0]))
+        accepting.start()
+
+        result = client.probe_entry(entry("127.0.0.2", port=port), timeout=2,
+                                    source_ip=client.probe_source(entry("127.0.0.2"), LOCAL_IPS))
+        accepting.join(2)
+
+    assert result.status == "SUCCESS"
+    assert result.source == "127.0.0.2"
+    assert peers == ["127.0.0.2"]
+
+
+def test_udp_probe_leaves_from_row_source():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as receiver:
+        receiver.bind(("127.0.0.1", 0))
+        receiver.settimeout(2)
+        port = receiver.getsockname()[1]
+        senders = []
+
+        def answer():
+            data, address = receiver.recvfrom(1024)
+            senders.append(address[0])
+            receiver.sendto(b"PONG", address)
+
+        answering = threading.Thread(target=answer)
+        answering.start()
+        timings = {}
+        ok, error = client.test_udp_connection("127.0.0.1", port, 2, timings, source_ip="127.0.0.2")
+        answering.join(2)
+
+    assert (ok, error) == (True, None)
+    assert senders == ["127.0.0.2"]
+    assert timings["rtt_ms"] is not None
+
+
+def test_ping_binds_source_interface(monkeypatch):
+    commands = []
+    monkeypatch.setattr(client.sys, "platform", "linux")
+    monkeypatch.setattr(client.os, "system", lambda command: commands.append(command) or 0)
+
+    assert client.test_ping("127.0.0.1", source_ip="127.0.0.2")
+    assert " -I 127.0.0.2 " in commands[0]
+
+
+def test_unusable_source_is_an_error_not_a_silent_reroute():
+    result = client.probe_entry(entry("192.0.2.77"), timeout=1, source_ip="192.0.2.77")
+
+    assert result.outcome != "success"
+    assert result.source == "192.0.2.77"
+
+
+def test_scheduler_groups_probes_by_source(monkeypatch):
+    import scheduler
+
+    groups = []
+    run = scheduler.ProbeScheduler.run
+
+    def recording_run(self, entries, probe, group=None):
+        groups.extend(group(row) for row in entries)
+        return run(self, entries, probe, group)
+
+    monkeypatch.setattr(scheduler.ProbeScheduler, "run", recording_run)
+    monkeypatch.setattr(client, "probe_entry",
+                        lambda row, *args, **kwargs: client.make_result(row, row["dst_port"], "TCP", "SUCCESS", "success"))
+    rows = [dict(entry("127.0.0.1"), row="1"), dict(entry("127.0.0.2"), row="2"), dict(entry("*"), row="3")]
+
+    client.test_connections(rows, sorted(LOCAL_IPS), "host-a", scheduler=client.create_scheduler(2, 0, 1, 0))
+
+    assert groups == ["127.0.0.1", "127.0.0.2", None]
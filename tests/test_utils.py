@@ -0,0 +1,38 @@
+# test_utils.py
+import os
+import stat
+import zipfile
+
+import utils
+
+
+def build_zip(tmp_path, monkeypatch, name, mtime):
+    monkeypatch.setattr(utils, "STAGING_DIR", str(tmp_path / "staging"))
+    executable = tmp_path / "check_network_policies_acme"
+    executable.write_bytes(b"\x7fELF" + bytes(range(256)) * 64)
+    os.utime(executable, (mtime, mtime))
+    os.chmod(executable, 0o600)
+    return utils.create_zip_file(str(executable), name, "ACME", "Linux")
+
+
+def test_zip_is_byte_identical_for_the_same_executable(tmp_path, monkeypatch):
+    first = build_zip(tmp_path, monkeypatch, "first.zip", 1_600_000_000)
+    second = build_zip(tmp_path, monkeypatch, "second.zip", 1_700_000_000)
+
+    with open(first, "rb") as a, open(second, "rb") as b:
+        assert a.read() == b.read()
+
+
+def test_zip_entries_have_fixed_dates_and_modes(tmp_path, monkeypatch):
+    path = build_zip(tmp_path, monkeypatch, "client.zip", 1_600_000_000)
+
+    with zipfile.ZipFile(path) as archive:
+        entries = {info.filename: info for info in archive.infolist()}
+        readme = archive.read("README.txt").decode("utf-8")
+
+    assert list(entries) == ["check_network_policies_acme", "README.txt"]
+    assert {info.date_time for info in entries.values()} == {utils.ZIP_ENTRY_DATE}
+    assert stat.S_IMODE(entries["check_network_policies_acme"].external_attr >> 16) == 0o755
+    assert stat.S_IMODE(entries["README.txt"].external_attr >> 16) == 0o644
+    assert "Generated for: ACME" in readme
+
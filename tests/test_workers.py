@@ -0,0 +1,47 @@
+# test_workers.py
+import socket
+
+import client
+from result_cache import ResultCache
+
+
+def entry(row, dst_ip, port):
+    return {"row": str(row), "src_ip": "*", "src_fqdn": "", "src_port": "*", "protocol": "TCP",
+            "dst_ip": dst_ip, "dst_fqdn": "", "dst_port": str(port), "description": f"wiersz {row}"}
+
+
+def test_destination_shard_keeps_one_host_in_one_worker():
+    rows = [entry(number, f"10.0.{number % 3}.1", 80 + number) for number in range(30)]
+
+    shards = {}
+    for row in rows:
+        shards.setdefault(row["dst_ip"], set()).add(client.destination_shard(row, 4))
+
+    assert all(len(assigned) == 1 for assigned in shards.values())
+    assert all(0 <= client.destination_shard(row, 4) < 4 for row in rows)
+
+
+def test_parallel_results_are_merged_in_policy_order(tmp_path):
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(16)
+        open_port = listener.getsockname()[1]
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            closed_port = probe.getsockname()[1]
+
+        rows = [entry(1, "127.0.0.1", open_port), entry(2, "127.0.0.2", closed_port),
+                entry(3, "127.0.0.3", closed_port), entry(4, "127.0.0.1", closed_port),
+                entry(5, "127.0.0.4", closed_port)]
+        cache = ResultCache(str(tmp_path / "cache.ndjson"))
+        cache.record(rows[4], client.make_result(rows[4], str(closed_port), "TCP", "SUCCESS", "success"))
+        streamed = []
+
+        results, stats = client.test_connections_parallel(rows, ["127.0.0.1"], "host-a", workers=2, timeout=2,
+                                                          result_cache=cache, on_result=streamed.append)
+
+    assert [result.row for result in results] == [1, 2, 3, 4, 5]
+    assert [result.outcome for result in results] == ["success", "failed", "failed", "failed", "success"]
+    assert sorted(result.row for result in streamed) == [1, 2, 3, 4, 5]
+    assert (stats["success"], stats["failed"], stats["cached"]) == (2, 3, 1)
+    assert [result.cached for result in results] == [False, False, False, False, True]
@@ -0,0 +1,170 @@
+# artifact_store.py
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactStore:
+    """
+    Magazyn artefaktów (plików ZIP) w katalogu OUTPUT_DIR z indeksem SQLite.
+
+    Każdy artefakt ma nazwę widoczną pod /download/{name}. Zawartość leży
+    w katalogu blobs/ pod nazwą skrótu SHA-256, a plik widoczny dla użytkownika
+    jest do niej twardym dowiązaniem - identyczne artefakty zajmują miejsce tylko raz.
+    Eviction: najpierw TTL, potem LRU aż łączny rozmiar blobów zmieści się w budżecie.
+    """
+
+    def __init__(self, root_dir, max_bytes, ttl_seconds):
+        self.root_dir = str(root_dir)
+        self.blobs_dir = os.path.join(self.root_dir, "blobs")
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(self.root_dir, "artifacts.db"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS artifacts (
+                name TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                cache_key TEXT,
+                created_at REAL NOT NULL,
+                last_download REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_artifacts_digest ON artifacts(digest);
+            CREATE INDEX IF NOT EXISTS idx_artifacts_cache_key ON artifacts(cache_key);
+        """)
+        self._db.commit()
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blobs_dir, digest)
+
+    def _name_path(self, name):
+        return os.path.join(self.root_dir, name)
+
+    @staticmethod
+    def _file_digest(path):
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def put(self, source_path, name, cache_key=None):
+        """
+        Dodaje plik do magazynu pod nazwą `name`. Plik źródłowy jest przenoszony
+        (lub usuwany, jeśli identyczna zawartość już istnieje). Zwraca ścieżkę do artefaktu.
+        """
+        digest = self._file_digest(source_path)
+        size = os.path.getsize(source_path)
+        blob_path = self._blob_path(digest)
+        name_path = self._name_path(name)
+
+        with self._lock:
+            previous = self._db.execute("SELECT digest FROM artifacts WHERE name = ?", (name,)).fetchone()
+            if os.path.exists(blob_path):
+                logger.debug(f"Artefakt {name} jest duplikatem bloba {digest} - pomijam zapis")
+                os.remove(source_path)
+            else:
+                shutil.move(source_path, blob_path)
+
+            if os.path.lexists(name_path):
+                os.remove(name_path)
+            os.link(blob_path, name_path)
+
+            self._db.execute(
+                "INSERT OR REPLACE INTO artifacts (name, digest, size, cache_key, created_at, last_download) "
+                "VALUES (?, ?, ?, ?, ?, NULL)",
+                (name, digest, size, cache_key, time.time())
+            )
+            # Ponowny zapis pod tą samą nazwą - poprzedni blob nie jest już widoczny w indeksie
+            if previous and previous[0] != digest:
+                self._remove_blob_if_unused(previous[0])
+            self._db.commit()
+            logger.info(f"Zapisano artefakt {name} ({size} B, sha256={digest[:12]})")
+
+        self.evict(keep=name)
+        return name_path
+
+    def lookup(self, cache_key):
+        """Zwraca nazwę istniejącego artefaktu dla klucza cache lub None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT name FROM artifacts WHERE cache_key = ? ORDER BY created_at DESC LIMIT 1",
+                (cache_key,)
+            ).fetchone()
+        if row and os.path.exists(self._name_path(row[0])):
+            return row[0]
+        return None
+
+    def path_for_download(self, name):
+        """Zwraca ścieżkę artefaktu i aktualizuje czas ostatniego pobrania (LRU) lub None."""
+        with self._lock:
+            row = self._db.execute("SELECT name FROM artifacts WHERE name = ?", (name,)).fetchone()
+            if not row:
+                return None
+            self._db.execute("UPDATE artifacts SET last_download = ? WHERE name = ?", (time.time(), name))
+            self._db.commit()
+        path = self._name_path(name)
+        return path if os.path.exists(path) else None
+
+    def _remove(self, name, digest):
+        self._db.execute("DELETE FROM artifacts WHERE name = ?", (name,))
+        name_path = self._name_path(name)
+        if os.path.lexists(name_path):
+            os.remove(name_path)
+        self._remove_blob_if_unused(digest)
+
+    def _remove_blob_if_unused(self, digest):
+        still_used = self._db.execute("SELECT 1 FROM artifacts WHERE digest = ? LIMIT 1", (digest,)).fetchone()
+        if not still_used and os.path.exists(self._blob_path(digest)):
+            os.remove(self._blob_path(digest))
+
+    def evict(self, keep=None):
+        """
+        Usuwa artefakty starsze niż TTL, a następnie najdawniej używane ponad budżet bajtów.
+        Artefakt `keep` (właśnie zapisany) nigdy nie jest usuwany.
+        """
+        with self._lock:
+            removed = []
+            if self.ttl_seconds > 0:
+                cutoff = time.time() - self.ttl_seconds
+                for name, digest in self._db.execute(
+                    "SELECT name, digest FROM artifacts WHERE COALESCE(last_download, created_at) < ?",
+                    (cutoff,)
+                ).fetchall():
+                    if name == keep:
+                        continue
+                    self._remove(name, digest)
+                    removed.append(name)
+
+            if self.max_bytes > 0:
+                total = self._db.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM artifacts)"
+                ).fetchone()[0]
+                if total > self.max_bytes:
+                    for name, digest, size in self._db.execute(
+                        "SELECT name, digest, size FROM artifacts ORDER BY COALESCE(last_download, created_at) ASC"
+                    ).fetchall():
+                        if total <= self.max_bytes:
+                            break
+                        if name == keep:
+                            continue
+                        self._remove(name, digest)
+                        removed.append(name)
+                        # Miejsce zwalnia się dopiero po usunięciu ostatniego dowiązania do bloba
+                        if not os.path.exists(self._blob_path(digest)):
+                            total -= size
+            self._db.commit()
+
+        if removed:
+            logger.info(f"Usunięto artefakty (TTL/LRU): {', '.join(removed)}")
+        return removed
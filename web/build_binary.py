@@ -1,22 +1,69 @@
 import os
+import sys
+import shlex
 import subprocess
 import shutil
 import logging
 from fastapi import HTTPException
-from config import BUILD_BASE_DIR
+from config import BUILD_BASE_DIR, STAGING_DIR
+from policy_bundle import POLICY_INDEX_FILENAME, POLICY_SLICES_DIRNAME
+from pipeline_metrics import job_stage
 
 logger = logging.getLogger(__name__)
 
+COMPILED_POLICY_FILENAME = "network_policy.npol"
+
+PYINSTALLER_IMAGES = {
+    "windows": "cdrx/pyinstaller-windows:python3",
+    "linux": "cdrx/pyinstaller-linux:python3",
+}
+DOCKER_RUN = ["docker", "run", "-v", "/var/run/docker.sock:/var/run/docker.sock",
+              "--volumes-from", "network_policies_container", "--privileged", "--network", "host", "--rm"]
+
+def bundled_data(build_dir):
+    """
+    Pliki polityki dołączane do pliku wykonywalnego: lista (ścieżka względem build_dir, katalog docelowy).
+    Pomijane są pliki, których nie ma (np. indeks fragmentów, gdy polityka nie była dzielona).
+    """
+    candidates = [
+        ("network_policy.csv", "."),
+        (POLICY_INDEX_FILENAME, "."),
+        (POLICY_SLICES_DIRNAME, POLICY_SLICES_DIRNAME),
+        (COMPILED_POLICY_FILENAME, "."),
+    ]
+    return [(path, target) for path, target in candidates if os.path.exists(os.path.join(build_dir, path))]
+
+def pyinstaller_command(build_dir, platform):
+    """
+    Polecenie PyInstallera (uruchamiane w /src przez entrypoint obrazu cdrx) z plikami polityki
+    dołączonymi przez --add-data. Windows (PyInstaller pod Wine) oddziela cel średnikiem.
+    """
+    separator = ";" if platform == "windows" else ":"
+    cmd = ["pyinstaller", "--clean", "-y", "--onefile", "--name", "client_x86",
+           "--distpath", f"./dist/{platform}", "--workpath", "/tmp"]
+    for path, target in bundled_data(build_dir):
+        cmd += ["--add-data", f"{path}{separator}{target}"]
+    cmd.append("client.py")
+    return shlex.join(cmd)
+
+def docker_build_command(build_dir, platform):
+    """Polecenie docker run budujące klienta dla danego systemu (windows/linux)."""
+    pyinstaller = pyinstaller_command(build_dir, platform)
+    if platform == "windows":
+        return DOCKER_RUN + ["--entrypoint", "/bin/bash", PYINSTALLER_IMAGES[platform], "-c",
+                             f"python -m pip install --upgrade pip && /entrypoint.sh {shlex.quote(pyinstaller)}"]
+    return DOCKER_RUN + [PYINSTALLER_IMAGES[platform], pyinstaller]
+
 def build_windows(safe_client_name):
     """Generuje plik wykonywalny dla Windows."""
     logger.info(f"Rozpoczęcie generowania pliku wykonywalnego Windows dla klienta: {safe_client_name}")
     
     try:
         # Generowanie dla Windows
-        cmd_windows = 'docker run -v /var/run/docker.sock:/var/run/docker.sock --volumes-from network_policies_container --privileged --network host --rm --entrypoint /bin/bash cdrx/pyinstaller-windows:python3 -c "python -m pip install --upgrade pip && /entrypoint.sh"'
-        logger.debug(f"Wykonywanie komendy Docker dla Windows: {cmd_windows}")
+        cmd_windows = docker_build_command(BUILD_BASE_DIR, "windows")
+        logger.debug(f"Wykonywanie komendy Docker dla Windows: {shlex.join(cmd_windows)}")
         
-        process_windows = subprocess.run(cmd_windows, shell=True, check=True, capture_output=True, text=True)
+        process_windows = subprocess.run(cmd_windows, check=True, capture_output=True, text=True)
         logger.debug(f"Wynik procesu Windows - stdout: {process_windows.stdout}")
         logger.debug(f"Wynik procesu Windows - stderr: {process_windows.stderr}")
         
@@ -31,7 +78,7 @@ def build_windows(safe_client_name):
             
         # Przygotowanie nazw plików dla Windows
         output_filename_windows = f"check_network_policies_{safe_client_name}.exe"
-        output_exe_path_windows = os.path.join("output", output_filename_windows)
+        output_exe_path_windows = os.path.join(STAGING_DIR, output_filename_windows)
         try:
             shutil.copy2(exe_path, output_exe_path_windows)
             logger.info(f'Poprawnie skopiowano plik: {output_exe_path_windows}')
@@ -55,10 +102,10 @@ def build_linux(safe_client_name):
     
     try:
         # Generowanie dla Linux
-        cmd_linux = 'docker run -v /var/run/docker.sock:/var/run/docker.sock --volumes-from network_policies_container --privileged --network host --rm cdrx/pyinstaller-linux:python3'
-        logger.debug(f"Wykonywanie komendy Docker dla Linux: {cmd_linux}")
+        cmd_linux = docker_build_command(BUILD_BASE_DIR, "linux")
+        logger.debug(f"Wykonywanie komendy Docker dla Linux: {shlex.join(cmd_linux)}")
         
-        process_linux = subprocess.run(cmd_linux, shell=True, check=True, capture_output=True, text=True)
+        process_linux = subprocess.run(cmd_linux, check=True, capture_output=True, text=True)
         logger.debug(f"Wynik procesu Linux - stdout: {process_linux.stdout}")
         logger.debug(f"Wynik procesu Linux - stderr: {process_linux.stderr}")
         
@@ -73,7 +120,7 @@ def build_linux(safe_client_name):
             
         # Przygotowanie nazw plików dla Linux
         output_filename_linux = f"check_network_policies_{safe_client_name}"
-        output_linux_path = os.path.join("output", output_filename_linux)
+        output_linux_path = os.path.join(STAGING_DIR, output_filename_linux)
         try:
             shutil.copy2(linux_path, output_linux_path)
             logger.info(f'Poprawnie skopiowano plik: {output_linux_path}')
@@ -91,22 +138,90 @@ def build_linux(safe_client_name):
         logger.error(error_msg, exc_info=True)
         raise HTTPException(status_code=500, detail=error_msg)
 
-def build_executables(safe_client_name):
-    """Generuje pliki wykonywalne dla obu systemów operacyjnych."""
-    logger.info(f"Rozpoczęcie procesu generowania plików wykonywalnych dla klienta: {safe_client_name}")
+def copy_policy_bundle(source_dir, build_dir):
+    """
+    Kopiuje indeks i fragmenty polityki per host do katalogu budowania.
+    Jeśli polityka nie była dzielona, usuwa pozostałości po poprzednim budowaniu.
+    Zwraca True, gdy fragmenty zostały skopiowane.
+    """
+    source_index = os.path.join(source_dir, POLICY_INDEX_FILENAME)
+    build_index = os.path.join(build_dir, POLICY_INDEX_FILENAME)
+    build_slices = os.path.join(build_dir, POLICY_SLICES_DIRNAME)
+
+    shutil.rmtree(build_slices, ignore_errors=True)
+    if os.path.exists(build_index):
+        os.remove(build_index)
 
-    # Utworzenie katalogu output jeśli nie istnieje
-    os.makedirs("output", exist_ok=True)    
+    if not os.path.exists(source_index):
+        logger.debug("Polityka nie jest podzielona na fragmenty per host")
+        return False
 
     try:
-        shutil.copy2("/web/network_policy.csv", "/src/network_policy.csv")
-        logger.info(f'Poprawnie skopiowano plik: network_policy.csv')
+        shutil.copytree(os.path.join(source_dir, POLICY_SLICES_DIRNAME), build_slices)
+        shutil.copy2(source_index, build_index)
+        logger.info(f'Poprawnie skopiowano fragmenty polityki: {POLICY_INDEX_FILENAME}, {POLICY_SLICES_DIRNAME}/')
+        return True
     except Exception as e:
-        logger.error(f"Błąd podczas kopiowania pliku network_policy.csv : {str(e)}")
+        logger.error(f"Błąd podczas kopiowania fragmentów polityki : {str(e)}")
+        shutil.rmtree(build_slices, ignore_errors=True)
+        if os.path.exists(build_index):
+            os.remove(build_index)
+        return False
+
+def remove_compiled_policy(build_dir):
+    """Usuwa network_policy.npol po poprzednim budowaniu."""
+    compiled_path = os.path.join(build_dir, COMPILED_POLICY_FILENAME)
+    if os.path.exists(compiled_path):
+        os.remove(compiled_path)
+
+def compile_policy(build_dir):
+    """
+    Kompiluje network_policy.csv do binarnego formatu network_policy.npol (policy_format.py z katalogu klienta).
+    W razie błędu usuwa nieaktualny plik, aby klient wczytał politykę z CSV.
+    """
+    csv_path = os.path.join(build_dir, "network_policy.csv")
+    compiled_path = os.path.join(build_dir, COMPILED_POLICY_FILENAME)
+    cmd_compile = [sys.executable, os.path.join(build_dir, "policy_format.py"), csv_path, compiled_path]
+    logger.debug(f"Kompilacja polityki: {' '.join(cmd_compile)}")
+
+    try:
+        process_compile = subprocess.run(cmd_compile, check=True, capture_output=True, text=True)
+        logger.info(f"Skompilowano politykę do {compiled_path}: {process_compile.stdout.strip()}")
+    except Exception as e:
+        logger.error(f"Błąd podczas kompilacji polityki do formatu binarnego : {str(e)}")
+        remove_compiled_policy(build_dir)
+
+def build_executables(safe_client_name, job=None):
+    """
+    Generuje pliki wykonywalne dla obu systemów operacyjnych.
+    Klient dostaje jeden format polityki: fragmenty per host (przy podziale polityki)
+    albo politykę skompilowaną network_policy.npol - obok pełnego pliku CSV.
+    job: opcjonalny JobTiming - mierzony jest czas przygotowania polityki i każdego budowania.
+    """
+    logger.info(f"Rozpoczęcie procesu generowania plików wykonywalnych dla klienta: {safe_client_name}")
+
+    # Utworzenie katalogu tymczasowego na pliki wykonywalne (sprzątany po spakowaniu)
+    os.makedirs(STAGING_DIR, exist_ok=True)
+
+    with job_stage(job, "policy_copy"):
+        try:
+            shutil.copy2("/web/network_policy.csv", "/src/network_policy.csv")
+            logger.info(f'Poprawnie skopiowano plik: network_policy.csv')
+        except Exception as e:
+            logger.error(f"Błąd podczas kopiowania pliku network_policy.csv : {str(e)}")
+
+        sliced = copy_policy_bundle("/web", BUILD_BASE_DIR)
+    with job_stage(job, "policy_compile"):
+        if sliced:
+            remove_compiled_policy(BUILD_BASE_DIR)
+        else:
+            compile_policy(BUILD_BASE_DIR)
 
     try:
-        windows_file = build_windows(safe_client_name)
-        linux_file = build_linux(safe_client_name)
+        with job_stage(job, "build_windows"):
+            windows_file = build_windows(safe_client_name)
+        with job_stage(job, "build_linux"):
+            linux_file = build_linux(safe_client_name)
         
         logger.info(f"Pomyślnie wygenerowano wszystkie pliki wykonywalne dla klienta: {safe_client_name}")
         return (windows_file, linux_file)
@@ -1,4 +1,5 @@
 # config.py
+import os
 from pathlib import Path
 
 BUILD_BASE_DIR = "/src"
@@ -6,6 +7,18 @@ BASE_DIR = Path(__file__).resolve().parent
 TEMPLATES_DIR = BASE_DIR / "templates"
 OUTPUT_DIR = BASE_DIR / "output"
 STATIC_DIR = BASE_DIR / "static"
+STAGING_DIR = OUTPUT_DIR / "staging"
+
+# Limity magazynu artefaktów (0 wyłącza dany limit)
+ARTIFACT_MAX_BYTES = int(os.environ.get("ARTIFACT_MAX_BYTES", 2 * 1024 ** 3))
+ARTIFACT_TTL_SECONDS = int(os.environ.get("ARTIFACT_TTL_SECONDS", 7 * 24 * 3600))
+
+# Baza wyników przesyłanych przez klientów
+RESULTS_DB_PATH = os.environ.get("RESULTS_DB_PATH", str(BASE_DIR / "results.db"))
+RESULTS_MAX_BATCH = int(os.environ.get("RESULTS_MAX_BATCH", 50000))
+
+# Żądania dłuższe niż ten próg (w sekundach) są zapisywane w logu wolnych żądań
+SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_SECONDS", 5))
 
 import logging
 
@@ -1,9 +1,11 @@
 # main.py
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import config
 import routes
+import service
 
 logger = config.setup_logging()
 
@@ -20,5 +22,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Czas obsługi żądań: histogram w /metrics i log wolnych żądań
+@app.middleware("http")
+async def request_timing(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        seconds = time.perf_counter() - started
+        # Szablon ścieżki zamiast adresu (np. /download/{filename}) - ograniczona liczba serii metryk
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "nieznana")
+        slow = seconds >= config.SLOW_REQUEST_SECONDS
+        service.pipeline_metrics.observe_request(request.method, route_path, status, seconds, slow)
+        if slow:
+            logger.warning(f"Wolne żądanie: {request.method} {request.url.path} -> {status} w {seconds:.2f} s")
+
 # Include routers
 app.include_router(routes.router)
\ No newline at end of file
@@ -0,0 +1,170 @@
+# pipeline_metrics.py
+import time
+import uuid
+import bisect
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+# Granice przedziałów histogramów w sekundach (od odczytu pliku do budowania w Dockerze)
+DURATION_BUCKETS_SECONDS = [0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600]
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Ile ostatnich zadań jest dostępnych pod /jobs/{job_id}
+RECENT_JOBS = 200
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class Histogram:
+    """Histogram Prometheus z etykietami: {krotka etykiet: [liczności przedziałów..., suma, liczba]}"""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.series = {}
+
+    def observe(self, seconds, *label_values):
+        series = self.series.setdefault(label_values, [0] * (len(DURATION_BUCKETS_SECONDS) + 3))
+        series[bisect.bisect_left(DURATION_BUCKETS_SECONDS, seconds)] += 1
+        series[-2] += seconds
+        series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, series in sorted(self.series.items()):
+            labels = dict(zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS_SECONDS, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(**labels, le='+Inf')} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(**labels)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_labels(**labels)} {series[-1]}")
+        return lines
+
+
+class JobTiming:
+    """
+    Pomiar czasu etapów jednego zadania (np. przesłanie polityki i budowanie programów).
+    Etapy są mierzone blokami `with job.stage("nazwa"):`, a po finish() zadanie trafia
+    do histogramów i listy ostatnich zadań.
+    """
+
+    def __init__(self, metrics, kind):
+        self.metrics = metrics
+        self.kind = kind
+        self.job_id = uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.stages = OrderedDict()
+        self.outcome = "running"
+        self.total_seconds = None
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+            logger.debug(f"Zadanie {self.job_id}: etap {name} trwał {seconds:.3f} s")
+
+    def finish(self, outcome="success"):
+        if self.total_seconds is not None:
+            return
+        self.outcome = outcome
+        self.total_seconds = time.perf_counter() - self.started
+        self.metrics.observe_job(self)
+        breakdown = ", ".join(f"{name} {seconds:.2f} s" for name, seconds in self.stages.items())
+        logger.info(f"Zadanie {self.job_id} ({self.kind}): {outcome} w {self.total_seconds:.2f} s [{breakdown}]")
+
+    def as_dict(self):
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "outcome": self.outcome,
+            "started_at": round(self.started_at, 3),
+            "total_seconds": None if self.total_seconds is None else round(self.total_seconds, 3),
+            "stages": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+        }
+
+    def server_timing(self):
+        """Wartość nagłówka Server-Timing (czasy etapów w ms, widoczne w narzędziach przeglądarki)"""
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items())
+
+
+def job_stage(job, name):
+    """Etap zadania albo pusty kontekst, gdy pomiar nie jest prowadzony (job=None)"""
+    return job.stage(name) if job is not None else nullcontext()
+
+
+class PipelineMetrics:
+    """
+    Metryki aplikacji WEB w formacie tekstowym Prometheus: czasy etapów zadań,
+    czasy całych zadań i czasy obsługi żądań HTTP. Ostatnie zadania są
+    przechowywane w pamięci dla /jobs/{job_id}.
+    """
+
+    def __init__(self, recent_jobs=RECENT_JOBS):
+        self._lock = threading.Lock()
+        self.recent_jobs = recent_jobs
+        self.jobs = OrderedDict()
+        self.stage_seconds = Histogram("network_policy_web_stage_duration_seconds",
+                                       "Czas etapu zadania (odczyt, parsowanie, budowanie, pakowanie...).",
+                                       ("kind", "stage"))
+        self.job_seconds = Histogram("network_policy_web_job_duration_seconds",
+                                     "Czas całego zadania.", ("kind", "outcome"))
+        self.request_seconds = Histogram("network_policy_web_request_duration_seconds",
+                                         "Czas obsługi żądania HTTP.", ("method", "route", "status"))
+        self.slow_requests = {}
+
+    def start_job(self, kind):
+        job = JobTiming(self, kind)
+        with self._lock:
+            self.jobs[job.job_id] = job
+            while len(self.jobs) > self.recent_jobs:
+                self.jobs.popitem(last=False)
+        return job
+
+    def observe_job(self, job):
+        with self._lock:
+            for name, seconds in job.stages.items():
+                self.stage_seconds.observe(seconds, job.kind, name)
+            self.job_seconds.observe(job.total_seconds, job.kind, job.outcome)
+
+    def observe_request(self, method, route, status, seconds, slow=False):
+        with self._lock:
+            self.request_seconds.observe(seconds, method, route, str(status))
+            if slow:
+                self.slow_requests[(method, route)] = self.slow_requests.get((method, route), 0) + 1
+
+    def get_job(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return None if job is None else job.as_dict()
+
+    def list_jobs(self):
+        with self._lock:
+            return [job.as_dict() for job in reversed(self.jobs.values())]
+
+    def render(self):
+        with self._lock:
+            lines = self.stage_seconds.render() + self.job_seconds.render() + self.request_seconds.render()
+            lines += ["# HELP network_policy_web_slow_requests_total Liczba żądań dłuższych niż SLOW_REQUEST_SECONDS.",
+                      "# TYPE network_policy_web_slow_requests_total counter"]
+            for (method, route), count in sorted(self.slow_requests.items()):
+                lines.append(f"network_policy_web_slow_requests_total{_labels(method=method, route=route)} {count}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,84 @@
+# policy_bundle.py
+import os
+import json
+import ipaddress
+import shutil
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+POLICY_INDEX_FILENAME = "policy_index.json"
+POLICY_SLICES_DIRNAME = "policy_slices"
+ANY_SLICE_FILENAME = "slice_any.csv"
+
+
+def _host_key(value) -> str:
+    if pd.isna(value):
+        return ""
+    return str(value).strip()
+
+
+def _ip_key(value: str) -> str:
+    """Adres IPv6 w postaci kanonicznej (jak adresy interfejsów zgłaszane przez klienta)."""
+    try:
+        return ipaddress.ip_address(value).compressed
+    except ValueError:
+        return value
+
+
+def partition_policy(df: pd.DataFrame, output_dir: str, source_name: str = "network_policy.csv") -> dict:
+    """
+    Dzieli politykę na fragmenty per host źródłowy (para src_ip/src_fqdn) w jednym przebiegu.
+
+    Tworzy katalog policy_slices/ z plikami CSV oraz indeks policy_index.json,
+    który mapuje adres IP i FQDN hosta na listę fragmentów do wczytania.
+    Reguły z wildcardem '*' trafiają do wspólnego fragmentu wczytywanego przez każdy host.
+    Każdy fragment zawiera dodatkową kolumnę `row` z numerem wiersza w pełnej polityce,
+    a indeks - nazwę pliku polityki, z którego powstał (`source`).
+    """
+    slices_dir = os.path.join(output_dir, POLICY_SLICES_DIRNAME)
+    shutil.rmtree(slices_dir, ignore_errors=True)
+    os.makedirs(slices_dir)
+
+    groups = {}
+    any_rows = []
+    for position, (src_ip, src_fqdn) in enumerate(zip(df["src_ip"], df["src_fqdn"])):
+        src_ip = _ip_key(_host_key(src_ip))
+        src_fqdn = _host_key(src_fqdn)
+        if src_ip == "*" or src_fqdn == "*":
+            any_rows.append(position)
+        else:
+            groups.setdefault((src_ip, src_fqdn.lower()), []).append(position)
+
+    sliced = df.copy()
+    sliced.insert(len(sliced.columns), "row", range(1, len(sliced) + 1))
+
+    index = {"version": 1, "source": source_name, "rows": len(df), "any": [], "by_ip": {}, "by_fqdn": {}}
+    if any_rows:
+        sliced.iloc[any_rows].to_csv(os.path.join(slices_dir, ANY_SLICE_FILENAME), index=False)
+        index["any"].append(ANY_SLICE_FILENAME)
+
+    for number, ((src_ip, src_fqdn), positions) in enumerate(sorted(groups.items()), 1):
+        slice_name = f"slice_{number:04d}.csv"
+        sliced.iloc[positions].to_csv(os.path.join(slices_dir, slice_name), index=False)
+        if src_ip:
+            index["by_ip"].setdefault(src_ip, []).append(slice_name)
+        if src_fqdn:
+            index["by_fqdn"].setdefault(src_fqdn, []).append(slice_name)
+
+    index_path = os.path.join(output_dir, POLICY_INDEX_FILENAME)
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+
+    logger.info(f"Podzielono politykę ({len(df)} wierszy) na {len(groups)} fragmentów per host "
+                f"i {len(any_rows)} reguł wspólnych")
+    return index
+
+
+def remove_partition(output_dir: str) -> None:
+    """Usuwa fragmenty polityki, aby klient nie wczytał nieaktualnego indeksu."""
+    index_path = os.path.join(output_dir, POLICY_INDEX_FILENAME)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    shutil.rmtree(os.path.join(output_dir, POLICY_SLICES_DIRNAME), ignore_errors=True)
@@ -0,0 +1,186 @@
+# results_store.py
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+RESULT_STATUSES = ("SUCCESS", "FAILED", "ERROR")
+
+
+class ResultsStore:
+    """
+    Magazyn wyników uruchomień klienta w SQLite.
+
+    Tabela `results` przechowuje każdy przesłany wynik (historia), a tabela
+    `result_matrix` jest agregatem aktualizowanym przy zapisie: jeden wiersz na
+    (polityka, wiersz polityki, host źródłowy) z ostatnim statusem i licznikami.
+    Macierz pass/fail jest czytana wyłącznie z agregatu, bez przeglądania historii.
+    """
+
+    def __init__(self, db_path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY,
+                policy TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                src_host TEXT NOT NULL,
+                dst_ip TEXT,
+                dst_port TEXT,
+                protocol TEXT,
+                status TEXT NOT NULL,
+                error TEXT,
+                ts REAL NOT NULL,
+                received_at REAL NOT NULL,
+                src_ip TEXT,
+                connected_ip TEXT,
+                connect_ms REAL,
+                handshake_ms REAL,
+                rtt_ms REAL,
+                reused INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_policy_row ON results(policy, row);
+            CREATE INDEX IF NOT EXISTS idx_results_src_host ON results(src_host);
+            CREATE INDEX IF NOT EXISTS idx_results_status ON results(status);
+
+            CREATE TABLE IF NOT EXISTS result_matrix (
+                policy TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                src_host TEXT NOT NULL,
+                dst_ip TEXT,
+                dst_port TEXT,
+                protocol TEXT,
+                last_status TEXT NOT NULL,
+                last_error TEXT,
+                last_ts REAL NOT NULL,
+                success_count INTEGER NOT NULL DEFAULT 0,
+                failed_count INTEGER NOT NULL DEFAULT 0,
+                error_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (policy, row, src_host)
+            );
+            CREATE INDEX IF NOT EXISTS idx_matrix_status ON result_matrix(policy, last_status);
+            CREATE INDEX IF NOT EXISTS idx_matrix_src_host ON result_matrix(src_host);
+        """)
+        self._db.commit()
+
+    @staticmethod
+    def _milliseconds(value):
+        return None if value is None or value == "" else float(value)
+
+    @staticmethod
+    def validate(record):
+        """
+        Zwraca znormalizowaną krotkę wyniku lub rzuca ValueError przy niepoprawnym rekordzie.
+        Pierwsze dziewięć pól trafia też do agregatu, pozostałe (adresy i czasy) tylko do historii.
+        """
+        try:
+            status = str(record["status"]).upper()
+            if status not in RESULT_STATUSES:
+                raise ValueError(f"Nieznany status: {status}")
+            return (
+                str(record["policy"]),
+                int(record["row"]),
+                str(record["src_host"]),
+                str(record.get("dst_ip", "")),
+                str(record.get("dst_port", "")),
+                str(record.get("protocol", "")).upper(),
+                status,
+                str(record.get("error", "")),
+                float(record.get("ts") or time.time()),
+                str(record.get("src_ip") or ""),
+                str(record.get("connected_ip") or ""),
+                ResultsStore._milliseconds(record.get("connect_ms")),
+                ResultsStore._milliseconds(record.get("handshake_ms")),
+                ResultsStore._milliseconds(record.get("rtt_ms")),
+                int(bool(record.get("reused"))),
+            )
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Niepoprawny rekord wyniku: {e}")
+
+    def add_batch(self, records):
+        """Zapisuje paczkę wyników w jednej transakcji i aktualizuje agregat. Zwraca liczbę rekordów."""
+        rows = [self.validate(record) for record in records]
+        if not rows:
+            return 0
+        received_at = time.time()
+        with self._lock:
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO results (policy, row, src_host, dst_ip, dst_port, protocol, status, error, ts, "
+                    "src_ip, connected_ip, connect_ms, handshake_ms, rtt_ms, reused, received_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [row + (received_at,) for row in rows]
+                )
+                self._db.executemany(
+                    """
+                    INSERT INTO result_matrix (policy, row, src_host, dst_ip, dst_port, protocol,
+                                               last_status, last_error, last_ts,
+                                               success_count, failed_count, error_count)
+                    VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9,
+                            ?7 = 'SUCCESS', ?7 = 'FAILED', ?7 = 'ERROR')
+                    ON CONFLICT (policy, row, src_host) DO UPDATE SET
+                        success_count = success_count + (excluded.last_status = 'SUCCESS'),
+                        failed_count = failed_count + (excluded.last_status = 'FAILED'),
+                        error_count = error_count + (excluded.last_status = 'ERROR'),
+                        dst_ip = CASE WHEN excluded.last_ts >= last_ts THEN excluded.dst_ip ELSE dst_ip END,
+                        dst_port = CASE WHEN excluded.last_ts >= last_ts THEN excluded.dst_port ELSE dst_port END,
+                        protocol = CASE WHEN excluded.last_ts >= last_ts THEN excluded.protocol ELSE protocol END,
+                        last_status = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last_status ELSE last_status END,
+                        last_error = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last_error ELSE last_error END,
+                        last_ts = MAX(last_ts, excluded.last_ts)
+                    """,
+                    [row[:9] for row in rows]
+                )
+        logger.debug(f"Zapisano paczkę {len(rows)} wyników")
+        return len(rows)
+
+    def list_policies(self):
+        """Zwraca listę polityk z liczbą hostów i statusów (z agregatu)."""
+        with self._lock:
+            cursor = self._db.execute("""
+                SELECT policy, COUNT(DISTINCT src_host), COUNT(DISTINCT row),
+                       SUM(last_status = 'SUCCESS'), SUM(last_status = 'FAILED'), SUM(last_status = 'ERROR'),
+                       MAX(last_ts)
+                FROM result_matrix GROUP BY policy ORDER BY MAX(last_ts) DESC
+            """)
+            return [
+                {"policy": policy, "hosts": hosts, "rows": policy_rows,
+                 "success": success, "failed": failed, "errors": errors, "last_ts": last_ts}
+                for policy, hosts, policy_rows, success, failed, errors, last_ts in cursor.fetchall()
+            ]
+
+    def matrix(self, policy, status=None):
+        """
+        Zwraca macierz pass/fail dla polityki: wiersze polityki x hosty źródłowe
+        z ostatnim statusem w każdej komórce. Opcjonalnie tylko komórki o danym statusie.
+        """
+        query = ("SELECT row, src_host, dst_ip, dst_port, protocol, last_status, last_error, last_ts, "
+                 "success_count, failed_count, error_count FROM result_matrix WHERE policy = ?")
+        params = [policy]
+        if status:
+            query += " AND last_status = ?"
+            params.append(status.upper())
+        query += " ORDER BY row, src_host"
+
+        with self._lock:
+            cursor = self._db.execute(query, params)
+            cells = cursor.fetchall()
+
+        hosts = sorted({cell[1] for cell in cells})
+        rows = {}
+        totals = {status_name: 0 for status_name in RESULT_STATUSES}
+        for (row, src_host, dst_ip, dst_port, protocol, last_status, last_error, last_ts,
+             success_count, failed_count, error_count) in cells:
+            entry = rows.setdefault(row, {"row": row, "dst_ip": dst_ip, "dst_port": dst_port,
+                                          "protocol": protocol, "cells": {}})
+            entry["cells"][src_host] = {
+                "status": last_status, "error": last_error, "ts": last_ts,
+                "success": success_count, "failed": failed_count, "errors": error_count,
+            }
+            totals[last_status] += 1
+        return {"policy": policy, "hosts": hosts, "rows": list(rows.values()), "totals": totals}
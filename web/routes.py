@@ -1,6 +1,7 @@
 # routes.py
 from fastapi import APIRouter, Request, UploadFile, HTTPException, Form, File
 from fastapi.responses import FileResponse, HTMLResponse
+from typing import Optional
 
 import service
 from config import templates, setup_logging
@@ -27,6 +28,31 @@ async def download_file(filename: str):
 async def upload_policy(
     request: Request,
     client_name: str = Form(...),
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    split_by_host: bool = Form(False)
 ):
-    return await service.process_upload_file(request, client_name, file)
\ No newline at end of file
+    return await service.process_upload_file(request, client_name, file, split_by_host)
+
+@router.get("/jobs/")
+async def list_jobs():
+    return await service.process_jobs()
+
+@router.get("/jobs/{job_id}")
+async def job_timing(job_id: str):
+    return await service.process_job_timing(job_id)
+
+@router.get("/metrics")
+async def metrics():
+    return await service.process_metrics()
+
+@router.post("/results/")
+async def upload_results(request: Request):
+    return await service.process_results_upload(request)
+
+@router.get("/results/")
+async def list_results_policies():
+    return await service.process_results_policies()
+
+@router.get("/results/matrix")
+async def results_matrix(policy: str, status: Optional[str] = None):
+    return await service.process_results_matrix(policy, status)
\ No newline at end of file
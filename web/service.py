@@ -1,18 +1,30 @@
 # service.py
 import pandas as pd
 import io
+import json
+import gzip
 from fastapi import HTTPException
-from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
 import utils
-from config import OUTPUT_DIR, BASE_DIR
+from config import OUTPUT_DIR, BASE_DIR, BUILD_BASE_DIR, ARTIFACT_MAX_BYTES, ARTIFACT_TTL_SECONDS
+from config import RESULTS_DB_PATH, RESULTS_MAX_BATCH
 from config import templates
 import os
 import routes
 import logging
 from build_binary import build_executables
+from artifact_store import ArtifactStore
+from results_store import ResultsStore
+from pipeline_metrics import PipelineMetrics, PROMETHEUS_CONTENT_TYPE
+import policy_bundle
 
 logger = logging.getLogger(__name__)
 
+artifact_store = ArtifactStore(OUTPUT_DIR, ARTIFACT_MAX_BYTES, ARTIFACT_TTL_SECONDS)
+results_store = ResultsStore(RESULTS_DB_PATH)
+pipeline_metrics = PipelineMetrics()
+
 async def validate_csv_structure(df: pd.DataFrame) -> bool:
     """
     Sprawdza poprawność struktury pliku CSV.
@@ -37,12 +49,15 @@ async def validate_csv_structure(df: pd.DataFrame) -> bool:
     return True
 
 
-async def process_upload_file(request, client_name, file):
+async def process_upload_file(request, client_name, file, split_by_host=False):
     """
     Przetwarza przesłany plik CSV i generuje pliki wykonywalne.
+    Przy split_by_host polityka jest dodatkowo dzielona na fragmenty per host źródłowy.
+    Czas każdego etapu jest mierzony (zadanie widoczne pod /jobs/{job_id} i w /metrics).
     """
-    logger.info(f"Rozpoczęto przetwarzanie pliku dla klienta: {client_name}")
-    
+    job = pipeline_metrics.start_job("upload")
+    logger.info(f"Rozpoczęto przetwarzanie pliku dla klienta: {client_name} (zadanie {job.job_id})")
+
     try:
         # Walidacja nazwy klienta
         if not client_name or len(client_name.strip()) == 0:
@@ -53,20 +68,23 @@ async def process_upload_file(request, client_name, file):
         logger.debug(f"Rozpoczęto odczyt pliku: {file.filename}")
         
         try:
-            content = await file.read()
+            with job.stage("upload_read"):
+                content = await file.read()
             logger.debug(f"Odczytano {len(content)} bajtów")
         except Exception as e:
             logger.error(f"Błąd podczas odczytu pliku: {str(e)}")
             raise HTTPException(status_code=400, detail=f"Błąd odczytu pliku: {str(e)}")
 
         try:
-            csv_data = io.StringIO(content.decode('utf-8'))
+            with job.stage("decode"):
+                csv_data = io.StringIO(content.decode('utf-8'))
         except UnicodeDecodeError as e:
             logger.error(f"Błąd dekodowania pliku CSV: {str(e)}")
             raise HTTPException(status_code=400, detail="Plik musi być zakodowany w UTF-8")
 
         try:
-            df = pd.read_csv(csv_data)
+            with job.stage("parse"):
+                df = pd.read_csv(csv_data)
             logger.info(f"Wczytano CSV z {len(df)} wierszami i {len(df.columns)} kolumnami")
         except pd.errors.EmptyDataError:
             logger.error("Przesłano pusty plik CSV")
@@ -77,71 +95,181 @@ async def process_upload_file(request, client_name, file):
 
         # Walidacja struktury CSV
         try:
-            await validate_csv_structure(df)
+            with job.stage("validate"):
+                await validate_csv_structure(df)
         except ValueError as e:
             raise HTTPException(status_code=400, detail=str(e))
         
         # Zapis CSV
         csv_path = os.path.join(BASE_DIR, 'network_policy.csv')
         try:
-            df.to_csv(csv_path, index=False)
+            with job.stage("csv_write"):
+                df.to_csv(csv_path, index=False)
             logger.info(f"Zapisano plik CSV do {csv_path}")
         except Exception as e:
             logger.error(f"Błąd podczas zapisu CSV: {str(e)}")
             raise HTTPException(status_code=500, detail="Nie udało się zapisać pliku CSV")
 
+        # Fragmenty polityki per host źródłowy
+        try:
+            with job.stage("partition"):
+                if split_by_host:
+                    policy_bundle.partition_policy(df, BASE_DIR)
+                else:
+                    policy_bundle.remove_partition(BASE_DIR)
+        except Exception as e:
+            logger.error(f"Błąd podczas dzielenia polityki na fragmenty: {str(e)}")
+            raise HTTPException(status_code=500, detail="Nie udało się podzielić polityki na fragmenty per host")
+
         # Sanityzacja nazwy klienta
         safe_client_name = utils.sanitize_client_name(client_name)
         logger.debug(f"Nazwa klienta po sanityzacji: {safe_client_name}")
 
-        # Budowanie plików wykonywalnych
-        try:
-            logger.info("Rozpoczęto budowanie plików wykonywalnych")
-            windows_path, linux_path = build_executables(safe_client_name)
-            logger.info(f"Pomyślnie zbudowano pliki wykonywalne: Windows: {windows_path}, Linux: {linux_path}")
-        except Exception as e:
-            logger.error(f"Błąd podczas budowania plików wykonywalnych: {str(e)}")
-            raise HTTPException(status_code=500, detail="Błąd podczas generowania plików wykonywalnych")
+        # Klucze cache - ta sama polityka dla tego samego klienta nie wymaga ponownego budowania
+        with job.stage("cache_lookup"):
+            with open(csv_path, 'rb') as f:
+                csv_content = f.read()
+            build_options = "split_by_host" if split_by_host else ""
+            cache_key_windows = utils.build_cache_key(csv_content, safe_client_name, "Windows", BUILD_BASE_DIR, build_options)
+            cache_key_linux = utils.build_cache_key(csv_content, safe_client_name, "Linux", BUILD_BASE_DIR, build_options)
+            zip_filename_windows = artifact_store.lookup(cache_key_windows)
+            zip_filename_linux = artifact_store.lookup(cache_key_linux)
 
-        # Tworzenie plików ZIP
-        try:
-            zip_filename_windows = f"check_network_policies_{safe_client_name}_windows.zip"
-            zip_filename_linux = f"check_network_policies_{safe_client_name}_linux.zip"
-            
-            zip_path_windows = utils.create_zip_file(windows_path, zip_filename_windows, client_name, "Windows")
-            zip_path_linux = utils.create_zip_file(linux_path, zip_filename_linux, client_name, "Linux")
-            
-            logger.info(f"Utworzono pliki ZIP: {zip_path_windows}, {zip_path_linux}")
-        except Exception as e:
-            logger.error(f"Błąd podczas tworzenia plików ZIP: {str(e)}")
-            raise HTTPException(status_code=500, detail="Błąd podczas pakowania plików")
+        cached = bool(zip_filename_windows and zip_filename_linux)
+        if cached:
+            logger.info(f"Znaleziono gotowe artefakty w cache: {zip_filename_windows}, {zip_filename_linux}")
+        else:
+            # Budowanie plików wykonywalnych
+            try:
+                logger.info("Rozpoczęto budowanie plików wykonywalnych")
+                windows_path, linux_path = build_executables(safe_client_name, job)
+                logger.info(f"Pomyślnie zbudowano pliki wykonywalne: Windows: {windows_path}, Linux: {linux_path}")
+            except Exception as e:
+                logger.error(f"Błąd podczas budowania plików wykonywalnych: {str(e)}")
+                raise HTTPException(status_code=500, detail="Błąd podczas generowania plików wykonywalnych")
+
+            # Tworzenie plików ZIP i przekazanie ich do magazynu artefaktów
+            try:
+                zip_filename_windows = f"check_network_policies_{safe_client_name}_windows.zip"
+                zip_filename_linux = f"check_network_policies_{safe_client_name}_linux.zip"
+
+                with job.stage("zip"):
+                    zip_path_windows = utils.create_zip_file(windows_path, zip_filename_windows, client_name, "Windows")
+                    zip_path_linux = utils.create_zip_file(linux_path, zip_filename_linux, client_name, "Linux")
+
+                with job.stage("store"):
+                    zip_path_windows = artifact_store.put(zip_path_windows, zip_filename_windows, cache_key_windows)
+                    zip_path_linux = artifact_store.put(zip_path_linux, zip_filename_linux, cache_key_linux)
+
+                logger.info(f"Utworzono pliki ZIP: {zip_path_windows}, {zip_path_linux}")
+            except Exception as e:
+                logger.error(f"Błąd podczas tworzenia plików ZIP: {str(e)}")
+                raise HTTPException(status_code=500, detail="Błąd podczas pakowania plików")
+            finally:
+                # Pliki wykonywalne są już w archiwach ZIP
+                for staged_path in (windows_path, linux_path):
+                    if os.path.exists(staged_path):
+                        os.remove(staged_path)
 
         # Przygotowanie odpowiedzi
         logger.info("Zakończono przetwarzanie pliku pomyślnie")
+        job.finish("cached" if cached else "success")
         return templates.TemplateResponse(
             "upload.html",
             {
                 "request": request,
+                "policy_id": utils.policy_id(csv_content),
                 "download_link_windows": f"/download/{zip_filename_windows}",
                 "filename_windows": zip_filename_windows,
                 "download_link_linux": f"/download/{zip_filename_linux}",
-                "filename_linux": zip_filename_linux
-            }
+                "filename_linux": zip_filename_linux,
+                "timing": job.as_dict()
+            },
+            headers={"X-Job-Id": job.job_id, "Server-Timing": job.server_timing()}
         )
     except HTTPException:
+        job.finish("error")
         raise
     except Exception as e:
+        job.finish("error")
         logger.error(f"Nieoczekiwany błąd podczas przetwarzania pliku: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Wystąpił nieoczekiwany błąd: {str(e)}")
 
 
+async def process_job_timing(job_id: str):
+    """Zwraca czasy etapów zadania (jednego z ostatnich)."""
+    job = pipeline_metrics.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Zadanie nie zostało znalezione")
+    return job
+
+
+async def process_jobs():
+    """Zwraca czasy etapów ostatnich zadań (od najnowszego)."""
+    return pipeline_metrics.list_jobs()
+
+
+async def process_metrics():
+    """Metryki aplikacji WEB w formacie Prometheus."""
+    return Response(pipeline_metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 async def process_download_file(filename: str):
     """Endpoint do pobierania wygenerowanego pliku"""
-    file_path = os.path.join("output", filename)
-    if not os.path.exists(file_path):
+    file_path = artifact_store.path_for_download(filename)
+    if file_path is None:
         raise HTTPException(status_code=404, detail="Plik nie został znaleziony")
     return FileResponse(
         file_path,
         media_type='application/zip',
         filename=filename
-    )
\ No newline at end of file
+    )
+
+
+def parse_results_payload(body: bytes, content_encoding: str = ""):
+    """
+    Dekoduje paczkę wyników: tablica JSON lub NDJSON (jeden rekord w linii),
+    opcjonalnie skompresowana gzip.
+    """
+    if content_encoding.lower() == "gzip":
+        body = gzip.decompress(body)
+    text = body.decode("utf-8").strip()
+    if not text:
+        return []
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+async def process_results_upload(request):
+    """Przyjmuje paczkę wyników klienta i zapisuje ją w bazie wyników."""
+    body = await request.body()
+    try:
+        records = parse_results_payload(body, request.headers.get("content-encoding", ""))
+    except (ValueError, OSError) as e:
+        logger.warning(f"Odrzucono niepoprawną paczkę wyników: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Niepoprawny format wyników: {str(e)}")
+
+    if len(records) > RESULTS_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"Paczka przekracza {RESULTS_MAX_BATCH} rekordów")
+
+    try:
+        stored = await run_in_threadpool(results_store.add_batch, records)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logger.info(f"Przyjęto {stored} wyników od {request.client.host if request.client else 'nieznany'}")
+    return {"stored": stored}
+
+
+async def process_results_policies():
+    """Zwraca listę polityk, dla których przesłano wyniki."""
+    return await run_in_threadpool(results_store.list_policies)
+
+
+async def process_results_matrix(policy: str, status: str = None):
+    """Zwraca zagregowaną macierz pass/fail dla polityki."""
+    matrix = await run_in_threadpool(results_store.matrix, policy, status)
+    if not matrix["rows"] and not status:
+        raise HTTPException(status_code=404, detail="Brak wyników dla podanej polityki")
+    return matrix
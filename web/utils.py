@@ -15,25 +15,37 @@ def sanitize_client_name(client_name: str) -> str:
 
 
 import os
+import shutil
 import zipfile
-from datetime import datetime
-from config import OUTPUT_DIR
+from config import STAGING_DIR
+
+# Stała data wpisów ZIP - to samo budowanie daje bajtowo identyczne archiwum (deduplikacja w magazynie artefaktów)
+ZIP_ENTRY_DATE = (1980, 1, 1, 0, 0, 0)
+
+def _zip_entry(name: str, mode: int) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name, date_time=ZIP_ENTRY_DATE)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = mode << 16
+    return info
 
 def create_zip_file(source_file: str, zip_filename: str, client_name: str, os_type: str) -> str:
     """
-    Tworzy plik ZIP zawierający plik wykonywalny i dodatkowe informacje
+    Tworzy plik ZIP zawierający plik wykonywalny i dodatkowe informacje.
+    Plik powstaje w katalogu tymczasowym - do OUTPUT_DIR trafia przez magazyn artefaktów.
+    Archiwum jest deterministyczne (stałe daty i uprawnienia wpisów, bez daty generowania),
+    więc ten sam plik wykonywalny daje ten sam skrót SHA-256.
     """
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    zip_path = os.path.join(OUTPUT_DIR, zip_filename)
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    zip_path = os.path.join(STAGING_DIR, zip_filename)
     
     with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
         # Dodaj plik wykonywalny
-        zipf.write(source_file, os.path.basename(source_file))
+        with open(source_file, 'rb') as src, zipf.open(_zip_entry(os.path.basename(source_file), 0o755), 'w') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
         
         # Dodaj plik README z informacjami
         readme_content = f"""Network Policy Checker ({os_type})
 Generated for: {client_name}
-Generation date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 System: {os_type}
 
 Instructions:
@@ -44,6 +56,30 @@ Instructions:
 
 For support contact your system administrator.
 """
-        zipf.writestr('README.txt', readme_content)
+        zipf.writestr(_zip_entry('README.txt', 0o644), readme_content)
     
-    return zip_path
\ No newline at end of file
+    return zip_path
+
+
+import hashlib
+import glob
+
+def build_cache_key(csv_content: bytes, safe_client_name: str, os_type: str, source_dir: str, options: str = "") -> str:
+    """
+    Wylicza klucz cache artefaktu: ta sama polityka, nazwa klienta, system, opcje budowania
+    i kod źródłowy klienta dają ten sam plik wykonywalny.
+    """
+    sha = hashlib.sha256()
+    sha.update(csv_content)
+    sha.update(safe_client_name.encode('utf-8'))
+    sha.update(os_type.encode('utf-8'))
+    sha.update(options.encode('utf-8'))
+    for source_file in sorted(glob.glob(os.path.join(source_dir, '*.py'))):
+        with open(source_file, 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+def policy_id(csv_content: bytes) -> str:
+    """Identyfikator polityki (ten sam wylicza klient przy wysyłaniu wyników)."""
+    return hashlib.sha256(csv_content).hexdigest()[:16]